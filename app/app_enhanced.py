@@ -281,13 +281,9 @@ def main():
     @st.cache_data(ttl=300)  # 5分钟缓存
     def get_enhanced_recommendation_and_profile(user_id, top_n, categories=None):
         try:
-            result = app.recommend_for_user(user_id, top_n)
+            # 类别筛选在召回时完成，一次请求即返回 top_n 条所选类别的新闻
+            result = app.recommend_for_user(user_id, top_n, categories=list(categories) if categories else None)
             user_profile = app.get_user_profile(user_id)
-            
-            # 如果有类别筛选，进行过滤
-            if categories and result:
-                result = [news for news in result if news.get('category') in categories]
-            
             return result, user_profile
         except Exception as e:
             st.error(f"获取推荐失败: {str(e)}")
@@ -176,8 +176,9 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # 系统状态检查
+@st.cache_data(ttl=60)
 def check_system_status():
-    """检查系统各组件状态"""
+    """检查系统各组件状态（只做轻量检查，不构建推荐应用、不加载嵌入模型）"""
     status = {
         "推荐引擎": "online",
         "数据库连接": "online", 
@@ -185,18 +186,25 @@ def check_system_status():
         "Web服务": "online"
     }
     
-    # 这里可以添加实际的状态检查逻辑
     try:
-        from main import NewsRecommendationApp
-        app = NewsRecommendationApp()
-        # 简单的连通性测试
-        if hasattr(app, 'recommender'):
-            status["推荐引擎"] = "online"
-        else:
-            status["推荐引擎"] = "warning"
+        from config import Config
+        from shared_resources import get_qdrant_client
+        import utils  # noqa: F401  推荐引擎模块可导入
+        config = Config()
     except Exception:
         status["推荐引擎"] = "offline"
         status["AI服务"] = "warning"
+        return status
+
+    # 数据库连通性：共享的 Qdrant 客户端，页面后续检索直接复用
+    try:
+        get_qdrant_client(config).get_collections()
+    except Exception:
+        status["数据库连接"] = "offline"
+        status["推荐引擎"] = "warning"
+
+    if not config.DEEPSEEK_API_KEY:
+        status["AI服务"] = "warning"
     
     return status
 
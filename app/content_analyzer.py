@@ -122,7 +122,7 @@ def main():
             analysis_results = {
                 'total_news': len(df_news),
                 'sample_size': sample_size,
-                'categories': df_sample['category'].value_counts().to_dict(),
+                'categories': df_sample['category'].value_counts().loc[lambda s: s > 0].to_dict(),
                 'subcategories': df_sample['sub_category'].value_counts().head(10).to_dict(),
                 'keywords': [],
                 'sentiments': {'积极': 0, '消极': 0, '中性': 0},
@@ -9,6 +9,14 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'core'))
 from main import NewsRecommendationApp
+from shared_resources import loaded_resources
+from evaluate import load_report
+
+def format_report_value(value, spec: str = "", suffix: str = "") -> str:
+    """评估报告中的字段格式化：缺失或类型不符（旧版本或手工编辑的报告）时显示 -"""
+    if value is None or (spec and not isinstance(value, (int, float))):
+        return "-"
+    return f"{value:{spec}}{suffix}"
 
 def main():
     """
@@ -46,6 +54,20 @@ def main():
             "系统可用性": system_uptime
         }
         st.json(stats)
+        # 数据加载情况：TSV 由进程级数据存储共享，页面重跑不会重新解析
+        st.markdown("### 数据加载")
+        st.json(app.recommender.data_store.stats())
+        # 进程内共享的模型与客户端（各页面共用，首次使用时才创建）
+        st.markdown("### 共享资源")
+        st.json(loaded_resources())
+        # 缓存命中情况：嵌入向量缓存与大模型响应缓存
+        st.markdown("### 缓存命中")
+        gpt = app.recommender.gpt
+        st.json({
+            # 嵌入模型尚未加载时不为了展示统计而加载
+            "嵌入向量缓存": gpt.embedding_cache.stats() if loaded_resources().get("embedding_cache") else "未加载",
+            "大模型响应缓存": gpt.completion_cache.stats() if gpt.completion_cache else "未启用",
+        })
     except Exception as e:
         st.error(f"系统统计获取失败: {e}")
     st.markdown("---")
@@ -252,14 +274,28 @@ def main():
     with effect_col3:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.markdown("### ⚡ 性能指标")
-        performance_metrics = {
-            "平均响应时间": "245ms",
-            "推荐准确率": "87.3%",
-            "用户满意度": "4.6/5.0",
-            "日活跃度": "23.4%"
-        }
-        for metric, value in performance_metrics.items():
-            st.metric(label=metric, value=value)
+        # 质量与延迟来自最近一次离线评估报告（core/evaluate.py）
+        report = load_report(app.config.EVAL_REPORT_PATH)
+        if report:
+            try:
+                # 报告可能来自旧版本或没有计时记录（例如没有可评估的曝光时不含 end_to_end），缺失的字段显示 -
+                metrics, meta = report.get('metrics') or {}, report.get('meta') or {}
+                end_to_end = (report.get('latency') or {}).get('end_to_end') or {}
+                performance_metrics = {
+                    "响应时间 p50（召回 + 排序）": format_report_value(end_to_end.get('p50_ms'), ".1f", "ms"),
+                    "AUC": format_report_value(metrics.get('auc'), ".4f"),
+                    "nDCG@10": format_report_value(metrics.get('ndcg@10'), ".4f"),
+                }
+                for metric, value in performance_metrics.items():
+                    st.metric(label=metric, value=value)
+                st.caption(
+                    f"离线评估: {format_report_value(meta.get('dev'))} | 曝光数: {format_report_value(metrics.get('impressions'))} | "
+                    f"排序: {format_report_value(meta.get('ranker'))} | {format_report_value(meta.get('created_at'))}"
+                )
+            except Exception as e:
+                st.warning(f"离线评估报告无法解析: {e}")
+        else:
+            st.info("暂无离线评估报告，运行 `python evaluate.py` 生成")
         st.markdown('</div>', unsafe_allow_html=True)
 
     # 自动刷新设置
@@ -1,9 +1,17 @@
+import time
+import asyncio
 import openai
+import numpy as np
 from loguru import logger
 from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
-from typing import List, Union, Optional
+from typing import List, Union, Optional, Tuple
 from config import Config  # 使用文档2的配置类
+from embedding_cache import EmbeddingCache
+from llm_cache import CompletionCache
+from async_runner import AsyncRateLimiter
+from shared_resources import (
+    get_openai_client, get_async_openai_client, get_request_limiter, get_embedding_model, get_embedding_cache
+)
 
 class DeepSeekGPT:
     def __init__(self, config: Optional[Config] = None):
@@ -12,12 +20,77 @@ class DeepSeekGPT:
         :param config: 配置对象，默认为新创建的Config实例
         """
         self.config = config or Config()
-        self.client = openai.OpenAI(
-            api_key=self.config.DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com/v1"  # DeepSeek API 端点
-        )
-        # 初始化本地嵌入模型
-        self.embedding_model = SentenceTransformer(self.config.EMBEDDING_MODEL)
+        # 持久化响应缓存（相同模型/温度/提示词直接复用结果）
+        self.completion_cache = CompletionCache(
+            db_path=self.config.LLM_CACHE_PATH,
+            ttl_seconds=self.config.LLM_CACHE_TTL,
+            max_entries=self.config.LLM_CACHE_MAX_ENTRIES
+        ) if self.config.LLM_CACHE_PATH else None
+        # 客户端、嵌入模型与嵌入缓存为进程内共享对象，首次访问时才创建（见 shared_resources）
+        self._client = None
+        self._async_client = None
+        self._request_limiter = None
+        self._embedding_model = None
+        self._embedding_cache = None
+
+    @property
+    def client(self) -> openai.OpenAI:
+        if self._client is None:
+            self._client = get_openai_client(self.config)
+        return self._client
+
+    @client.setter
+    def client(self, value: openai.OpenAI):
+        self._client = value
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        """异步客户端：供 recommend_async 与检索并发调用"""
+        if self._async_client is None:
+            self._async_client = get_async_openai_client(self.config)
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, value: openai.AsyncOpenAI):
+        self._async_client = value
+
+    @property
+    def request_limiter(self) -> AsyncRateLimiter:
+        """异步请求限流（并发数 + 每秒请求数），缓存命中不占用额度；同一进程内所有实例共用"""
+        if self._request_limiter is None:
+            self._request_limiter = get_request_limiter(self.config)
+        return self._request_limiter
+
+    @request_limiter.setter
+    def request_limiter(self, value: AsyncRateLimiter):
+        self._request_limiter = value
+
+    @property
+    def embedding_model(self):
+        """本地嵌入模型（按 EMBEDDING_BACKEND 选择推理后端）"""
+        if self._embedding_model is None:
+            self._embedding_model = get_embedding_model(self.config)
+        return self._embedding_model
+
+    @embedding_model.setter
+    def embedding_model(self, value):
+        self._embedding_model = value
+
+    async def load_embedding_model_async(self):
+        """在线程池中加载嵌入模型（已加载时立即返回），首次加载不阻塞事件循环"""
+        if self._embedding_model is None:
+            await asyncio.to_thread(lambda: self.embedding_model)
+
+    @property
+    def embedding_cache(self) -> EmbeddingCache:
+        """嵌入向量缓存（键包含模型标识与后端，换模型或后端不会命中旧向量）"""
+        if self._embedding_cache is None:
+            self._embedding_cache = get_embedding_cache(self.config)
+        return self._embedding_cache
+
+    @embedding_cache.setter
+    def embedding_cache(self, value: EmbeddingCache):
+        self._embedding_cache = value
 
     def get_completion(
             self,
@@ -26,6 +99,7 @@ class DeepSeekGPT:
             max_tokens: int = 2000,
             temperature: float = 0.7,
             stream: bool = False,
+            use_cache: bool = True,
     ) -> Union[str, openai.Stream]:
         """
         创建对话模型响应（支持单字符串和消息列表）
@@ -35,17 +109,18 @@ class DeepSeekGPT:
         2. 使用配置中的默认模型
         3. 增强错误处理
         4. 优化日志格式
+        5. 非流式请求走持久化响应缓存（use_cache=False 可强制请求）
         """
-        # 处理输入类型
-        if isinstance(messages, str):
-            messages = [{"role": "user", "content": messages}]
-        elif not isinstance(messages, list):
-            raise ValueError("无效的 'messages' 类型。它应该是一个字符串或消息列表")
-
+        messages = self._normalize_messages(messages)
         # 使用配置中的默认模型
         model = model or self.config.DEFAULT_MODEL
 
+        cache_key, cached = self._lookup_cache(model, temperature, max_tokens, messages, use_cache and not stream)
+        if cached is not None:
+            return cached
+
         try:
+            start = time.perf_counter()
             response = self.client.chat.completions.create(
                 messages=messages,
                 model=model,
@@ -57,19 +132,84 @@ class DeepSeekGPT:
             if stream:
                 return response
 
-            # 记录使用情况
-            usage = response.usage
-            logger.success(
-                f"非流式输出 | model: {model} | total_tokens: {usage.total_tokens} "
-                f"= prompt_tokens: {usage.prompt_tokens} "
-                f"+ completion_tokens: {usage.completion_tokens}"
-            )
-            return response.choices[0].message.content
+            return self._record_response(response, model, cache_key, time.perf_counter() - start)
         
         except Exception as e:
             logger.error(f"API请求失败: {str(e)}")
             raise
 
+    async def get_completion_async(
+            self,
+            messages: Union[str, List[dict]],
+            model: Optional[str] = None,
+            max_tokens: int = 2000,
+            temperature: float = 0.7,
+            use_cache: bool = True,
+    ) -> str:
+        """
+        get_completion 的异步版本（非流式），与同步版本共用响应缓存
+        缓存的 SQLite 读写（提交、淘汰、等待其他进程的写锁）放到线程池执行，不阻塞事件循环
+        """
+        messages = self._normalize_messages(messages)
+        model = model or self.config.DEFAULT_MODEL
+
+        cache_key, cached = await asyncio.to_thread(self._lookup_cache, model, temperature, max_tokens, messages, use_cache)
+        if cached is not None:
+            return cached
+
+        try:
+            async with self.request_limiter:
+                start = time.perf_counter()
+                response = await self.async_client.chat.completions.create(
+                    messages=messages,
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                )
+            return await asyncio.to_thread(self._record_response, response, model, cache_key, time.perf_counter() - start)
+
+        except Exception as e:
+            logger.error(f"API请求失败: {str(e)}")
+            raise
+
+    def _normalize_messages(self, messages: Union[str, List[dict]]) -> List[dict]:
+        """处理输入类型：单字符串转为消息列表"""
+        if isinstance(messages, str):
+            return [{"role": "user", "content": messages}]
+        if not isinstance(messages, list):
+            raise ValueError("无效的 'messages' 类型。它应该是一个字符串或消息列表")
+        return messages
+
+    def _lookup_cache(
+            self,
+            model: str,
+            temperature: float,
+            max_tokens: int,
+            messages: List[dict],
+            use_cache: bool
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """查询响应缓存，返回 (缓存键, 命中的响应)；不使用缓存时缓存键为 None"""
+        if not use_cache or self.completion_cache is None:
+            return None, None
+        cache_key = CompletionCache.make_key(model, temperature, max_tokens, messages)
+        cached = self.completion_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"命中响应缓存 | model: {model}")
+        return cache_key, cached
+
+    def _record_response(self, response, model: str, cache_key: Optional[str], latency: float) -> str:
+        """记录使用情况并写入响应缓存，返回回复内容"""
+        usage = response.usage
+        logger.success(
+            f"非流式输出 | model: {model} | total_tokens: {usage.total_tokens} "
+            f"= prompt_tokens: {usage.prompt_tokens} "
+            f"+ completion_tokens: {usage.completion_tokens}"
+        )
+        content = response.choices[0].message.content
+        if cache_key is not None:
+            self.completion_cache.put(cache_key, model, content, latency=latency, total_tokens=usage.total_tokens)
+        return content
+
     def get_embeddings(self, input: Union[str, List[str]]) -> List[List[float]]:
         """
         创建文本嵌入向量（支持单文本和文本列表）
@@ -78,12 +218,22 @@ class DeepSeekGPT:
         1. 使用本地嵌入模型替代OpenAI API
         2. 优化批处理
         3. 添加维度验证
+        4. 两级嵌入缓存，只对未命中的文本调用模型
         """
         if isinstance(input, str):
             input = [input]
         
-        # 使用本地模型生成嵌入向量
-        embeddings = self.embedding_model.encode(input).tolist()
+        vectors = self.embedding_cache.get_many(input)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # 使用本地模型生成嵌入向量（同一批次内的重复文本只编码一次）
+            unique_texts = list(dict.fromkeys(input[i] for i in missing))
+            encoded = self.embedding_model.encode(unique_texts)
+            self.embedding_cache.put_many(unique_texts, encoded)
+            by_text = dict(zip(unique_texts, encoded))
+            for i in missing:
+                vectors[i] = by_text[input[i]]
+        embeddings = np.asarray(vectors, dtype=np.float32).tolist() if vectors else []
         
         # 验证维度一致性
         if embeddings and len(embeddings[0]) != self.config.EMBEDDING_DIMS:
@@ -91,6 +241,10 @@ class DeepSeekGPT:
         
         return embeddings
 
+    async def get_embeddings_async(self, input: Union[str, List[str]]) -> List[List[float]]:
+        """get_embeddings 的异步版本：本地模型推理放到线程池执行，不阻塞事件循环"""
+        return await asyncio.to_thread(self.get_embeddings, input)
+
 
 if __name__ == "__main__":
     # 测试代码
@@ -0,0 +1,95 @@
+"""
+异步执行模块
+职责：为同步调用方提供一个进程级常驻事件循环。
+异步客户端（AsyncOpenAI / AsyncQdrantClient）的连接池始终绑定在这一个循环上，
+不会因为每次 asyncio.run 新建、关闭循环而失效；调用方所在线程是否已有事件循环（如 Streamlit、Jupyter）也不受影响
+"""
+
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Awaitable, Iterator, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """获取进程级常驻事件循环（首次调用时在后台守护线程中启动）"""
+    global _loop, _thread
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _thread = threading.Thread(target=loop.run_forever, name="async-runner", daemon=True)
+                _thread.start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """在常驻事件循环中执行协程，阻塞等待并返回结果"""
+    loop = get_event_loop()
+    if threading.current_thread() is _thread:
+        raise RuntimeError("不能在常驻事件循环线程内同步等待协程，请直接 await")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    return future.result(timeout)
+
+
+def iterate_sync(agen: AsyncIterator, max_buffered: int = 16) -> Iterator:
+    """
+    在常驻事件循环中消费异步生成器，以同步生成器的形式逐个产出结果
+    - 最多预先取出 max_buffered 个结果，调用方消费得慢时异步生成器在事件循环中等待，结果不会无限堆积
+    - 调用方提前停止迭代（break、关闭生成器或出现异常）时取消后台消费并关闭异步生成器，剩余的请求不再执行
+    """
+    loop = get_event_loop()
+    done = object()
+    items: "asyncio.Queue" = asyncio.Queue(maxsize=max(1, max_buffered))
+
+    async def drain():
+        try:
+            async for item in agen:
+                await items.put(item)
+        except asyncio.CancelledError:
+            # 调用方已停止读取：关闭生成器（执行其清理逻辑），不再放入结束标记
+            await agen.aclose()
+            raise
+        except BaseException:
+            await items.put(done)
+            raise
+        await items.put(done)
+
+    future = asyncio.run_coroutine_threadsafe(drain(), loop)
+    try:
+        while True:
+            item = asyncio.run_coroutine_threadsafe(items.get(), loop).result()
+            if item is done:
+                break
+            yield item
+        future.result()  # 重新抛出生成器中的异常
+    finally:
+        future.cancel()
+
+
+class AsyncRateLimiter:
+    """异步限流：同时进行的请求不超过 max_concurrency 个，请求发出速率不超过 rate_per_second（<=0 表示不限速）"""
+
+    def __init__(self, max_concurrency: int, rate_per_second: float = 0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_per_second = rate_per_second
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._next_slot = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        if self.rate_per_second > 0:
+            now = asyncio.get_running_loop().time()
+            # 预约下一个发送时刻（读取与更新之间没有 await，无需加锁）
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / self.rate_per_second
+            if slot > now:
+                await asyncio.sleep(slot - now)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
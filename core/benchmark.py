@@ -0,0 +1,629 @@
+"""
+性能基准测试模块
+职责：对推荐链路中的各个热点环节做微基准测试，对比优化前后的耗时
+
+用法:
+    python benchmark.py catalog                      # 使用 MIND 数据
+    python benchmark.py catalog --synthetic 200000   # 使用合成数据
+    python benchmark.py store --synthetic 200000     # 进程级数据存储：首次加载 vs 后续请求
+    python benchmark.py startup --synthetic 100000   # 冷启动：解析TSV vs 列式缓存
+    python benchmark.py user_index --scale 10        # 用户行为索引 vs 全表过滤（MIND 数据放大10倍）
+    python benchmark.py query_vector --local         # 召回查询：重新编码标题 vs 复用已入库向量
+    python benchmark.py async_pipeline --llm-delay 0.5   # 推荐流程：串行 vs 异步并发（固定延迟的模拟大模型）
+    python benchmark.py embed_workers --workers 1,2,4    # 嵌入吞吐：工作进程数 vs 文本/秒
+    python benchmark.py app_startup --first-use          # 启动耗时与常驻内存：命令行与各 Streamlit 页面
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Tuple
+from news_catalog import NewsCatalog
+from user_index import UserBehaviorIndex
+from data_store import MINDDataStore, get_rss_mb
+from mind_io import (
+    NEWS_COLUMNS, read_news_tsv, read_behaviors_tsv, parse_entities, encode_click_histories,
+    build_news_cache, build_behaviors_cache, is_cache_fresh, load_news, load_behaviors, load_click_histories
+)
+
+
+SYNTHETIC_ENTITIES = (
+    '[{"Label": "Example", "Type": "O", "WikidataId": "Q1", "Confidence": 1.0, '
+    '"OccurrenceOffsets": [0], "SurfaceForms": ["Example"]}]'
+)
+
+
+def make_synthetic_news(num_news: int, seed: int = 42) -> pd.DataFrame:
+    """生成与 news.tsv 结构一致的合成新闻数据"""
+    rng = np.random.default_rng(seed)
+    categories = np.array(['news', 'sports', 'finance', 'lifestyle', 'tv', 'music', 'video', 'health'])
+    return pd.DataFrame({
+        "news_id": [f"N{i}" for i in range(num_news)],
+        "category": categories[rng.integers(0, len(categories), num_news)],
+        "sub_category": [f"sub{i}" for i in rng.integers(0, 200, num_news)],
+        "title": [f"title {i}" for i in range(num_news)],
+        "abstract": [f"abstract {i}" for i in range(num_news)],
+        "url": "",
+        "title_entities": SYNTHETIC_ENTITIES,
+        "abstract_entities": "[]",
+    })
+
+
+def make_synthetic_behaviors(num_impressions: int, num_news: int, num_users: int = 0, seed: int = 42) -> pd.DataFrame:
+    """生成与 behaviors.tsv 结构一致的合成行为数据"""
+    rng = np.random.default_rng(seed)
+    num_users = num_users or max(1, num_impressions // 3)
+    user_ids = rng.integers(0, num_users, num_impressions)
+    # 同一用户的点击历史在所有曝光中保持一致（与 MIND 一致）
+    history_len = rng.integers(0, 50, num_users)
+    histories = [
+        " ".join(f"N{j}" for j in rng.integers(0, num_news, n)) if n else np.nan
+        for n in history_len
+    ]
+    impressions = [
+        " ".join(f"N{j}-{int(rng.random() < 0.1)}" for j in rng.integers(0, num_news, 10))
+        for _ in range(num_impressions)
+    ]
+    return pd.DataFrame({
+        "impression_id": np.arange(1, num_impressions + 1),
+        "user_id": [f"U{u}" for u in user_ids],
+        "time": "11/15/2019 8:55:22 AM",
+        "click_history": [histories[u] for u in user_ids],
+        "impression_lpg": impressions,
+    })
+
+
+def write_synthetic_tsvs(directory: str, num_news: int, num_impressions: int = 0) -> Tuple[str, str]:
+    """将合成数据写成 MIND 格式的 TSV 文件，返回 (news路径, behaviors路径)"""
+    news_path = os.path.join(directory, "news.tsv")
+    behaviors_path = os.path.join(directory, "behaviors.tsv")
+    make_synthetic_news(num_news).to_csv(news_path, sep='\t', header=False, index=False)
+    make_synthetic_behaviors(num_impressions or num_news, num_news).to_csv(
+        behaviors_path, sep='\t', header=False, index=False
+    )
+    return news_path, behaviors_path
+
+
+def load_news_frame(file_path: str, synthetic: int) -> pd.DataFrame:
+    if synthetic:
+        return make_synthetic_news(synthetic)
+    return pd.read_csv(file_path, names=NEWS_COLUMNS, sep='\t', header=None)
+
+
+def time_per_call(func: Callable[[], object], repeat: int) -> float:
+    """返回单次调用的平均耗时（毫秒）"""
+    func()  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def bench_catalog(args) -> Dict[str, float]:
+    """对比布尔掩码扫描与目录索引在一次推荐请求中的查找耗时"""
+    df_news = load_news_frame(args.news, args.synthetic)
+    rng = np.random.default_rng(0)
+    # 一次推荐请求的查找量：点击历史 + 画像前10条 + 最新点击 + top_n 结果
+    click_history: List[str] = df_news['news_id'].sample(args.history, random_state=0).tolist()
+    recommended: List[str] = df_news['news_id'].iloc[rng.integers(0, len(df_news), args.top_n)].tolist()
+    request_ids = click_history + click_history[:10] + click_history[-1:] + recommended
+
+    def mask_scan():
+        for news_id in request_ids:
+            news = df_news[df_news['news_id'] == news_id]
+            if not news.empty:
+                news.iloc[0]
+
+    build_start = time.perf_counter()
+    catalog = NewsCatalog(df_news)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    def catalog_lookup():
+        catalog.lookup(request_ids)
+
+    mask_ms = time_per_call(mask_scan, args.repeat)
+    catalog_ms = time_per_call(catalog_lookup, args.repeat * 100)
+
+    result = {
+        "news_rows": len(df_news),
+        "lookups_per_request": len(request_ids),
+        "catalog_build_ms": round(build_ms, 2),
+        "mask_scan_ms_per_request": round(mask_ms, 3),
+        "catalog_ms_per_request": round(catalog_ms, 4),
+        "speedup": round(mask_ms / catalog_ms, 1) if catalog_ms else float('inf'),
+    }
+    print(f"\n📊 新闻目录查找基准 | 新闻数: {result['news_rows']} | 每请求查找次数: {result['lookups_per_request']}")
+    print(f"  目录构建耗时:       {result['catalog_build_ms']} ms（仅加载时一次）")
+    print(f"  布尔掩码扫描:       {result['mask_scan_ms_per_request']} ms/请求")
+    print(f"  目录索引查找:       {result['catalog_ms_per_request']} ms/请求")
+    print(f"  加速比:             {result['speedup']}x")
+    return result
+
+
+def bench_store(args) -> Dict[str, float]:
+    """对比每次请求重新解析 TSV 与进程级数据存储的耗时"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.synthetic:
+            news_path, behaviors_path = write_synthetic_tsvs(tmpdir, args.synthetic)
+        else:
+            news_path, behaviors_path = args.news, args.behaviors
+
+        rss_before = get_rss_mb()
+        store = MINDDataStore()
+        start = time.perf_counter()
+        store.get_news(news_path)
+        store.get_behaviors(behaviors_path)
+        first_load_ms = (time.perf_counter() - start) * 1000
+
+        def per_request():
+            store.get_news(news_path)
+            store.get_behaviors(behaviors_path)
+
+        cached_ms = time_per_call(per_request, args.repeat * 100)
+        stats = store.stats()
+
+    result = {
+        "first_load_ms": round(first_load_ms, 1),
+        "cached_ms_per_request": round(cached_ms, 4),
+        "loads": stats["loads"],
+        "rss_before_mb": round(rss_before, 1),
+        "rss_after_mb": stats["rss_mb"],
+    }
+    print(f"\n📊 进程级数据存储基准")
+    print(f"  首次加载（解析TSV）: {result['first_load_ms']} ms")
+    print(f"  后续请求:           {result['cached_ms_per_request']} ms/请求（仅 stat 检查 mtime）")
+    print(f"  实际解析次数:       {result['loads']}")
+    print(f"  常驻内存:           {result['rss_before_mb']} MB -> {result['rss_after_mb']} MB")
+    return result
+
+
+def bench_startup(args) -> Dict[str, float]:
+    """对比冷启动时解析原始TSV（含实体 literal_eval 与点击历史切分）与读取列式缓存的耗时"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.synthetic:
+            news_path, behaviors_path = write_synthetic_tsvs(tmpdir, args.synthetic)
+        else:
+            news_path, behaviors_path = args.news, args.behaviors
+
+        def tsv_path():
+            df_news = read_news_tsv(news_path)
+            for col in ['title_entities', 'abstract_entities']:
+                df_news[col] = df_news[col].apply(parse_entities)
+            df_behaviors = read_behaviors_tsv(behaviors_path)
+            encode_click_histories(df_behaviors['click_history'])
+
+        def cache_path():
+            load_news(news_path)
+            load_behaviors(behaviors_path)
+            load_click_histories(behaviors_path)
+
+        build_start = time.perf_counter()
+        if not is_cache_fresh(news_path):
+            build_news_cache(news_path)
+        if not is_cache_fresh(behaviors_path):
+            build_behaviors_cache(behaviors_path)
+        build_ms = (time.perf_counter() - build_start) * 1000
+
+        tsv_ms = time_per_call(tsv_path, args.repeat)
+        cache_ms = time_per_call(cache_path, args.repeat)
+
+    result = {
+        "cache_build_ms": round(build_ms, 1),
+        "tsv_startup_ms": round(tsv_ms, 1),
+        "cache_startup_ms": round(cache_ms, 1),
+        "speedup": round(tsv_ms / cache_ms, 1) if cache_ms else float('inf'),
+    }
+    print(f"\n📊 冷启动加载基准")
+    print(f"  缓存生成（一次性）: {result['cache_build_ms']} ms")
+    print(f"  解析原始TSV:       {result['tsv_startup_ms']} ms")
+    print(f"  读取列式缓存:       {result['cache_startup_ms']} ms")
+    print(f"  加速比:             {result['speedup']}x")
+    return result
+
+
+def scale_behaviors(df_behaviors: pd.DataFrame, scale: int) -> pd.DataFrame:
+    """将行为数据复制 scale 份（用户ID加后缀区分），模拟更大规模的 behaviors.tsv"""
+    if scale <= 1:
+        return df_behaviors
+    copies = []
+    for i in range(scale):
+        copy = df_behaviors.copy()
+        copy['user_id'] = copy['user_id'].astype(str) + (f"_{i}" if i else "")
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def bench_user_index(args) -> Dict[str, float]:
+    """对比全表过滤与用户行为索引的单用户查询延迟"""
+    if args.synthetic:
+        df_behaviors = make_synthetic_behaviors(args.synthetic, num_news=max(1, args.synthetic // 3))
+    else:
+        df_behaviors = read_behaviors_tsv(args.behaviors)
+    df_behaviors = scale_behaviors(df_behaviors, args.scale)
+
+    build_start = time.perf_counter()
+    index = UserBehaviorIndex(df_behaviors)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    users = df_behaviors['user_id'].sample(args.users, random_state=0, replace=True).tolist()
+    user_values = df_behaviors['user_id'].values
+
+    def mask_lookup():
+        for user_id in users:
+            user_input_exists = user_id in user_values
+            history = df_behaviors[df_behaviors['user_id'] == user_id].head(10)
+            click_history_str = history['click_history'].iloc[0] if user_input_exists else ''
+            click_history_str.split() if isinstance(click_history_str, str) else []
+
+    def index_lookup():
+        for user_id in users:
+            if user_id in index:
+                index.click_history(user_id)
+
+    mask_ms = time_per_call(mask_lookup, args.repeat) / len(users)
+    index_ms = time_per_call(index_lookup, args.repeat * 100) / len(users)
+
+    result = {
+        "impressions": len(df_behaviors),
+        "users": len(index),
+        "index_build_ms": round(build_ms, 1),
+        "mask_ms_per_user": round(mask_ms, 3),
+        "index_ms_per_user": round(index_ms, 5),
+        "speedup": round(mask_ms / index_ms, 1) if index_ms else float('inf'),
+    }
+    print(f"\n📊 用户行为索引基准 | 曝光记录数: {result['impressions']} | 用户数: {result['users']}")
+    print(f"  索引构建耗时:       {result['index_build_ms']} ms（仅加载时一次）")
+    print(f"  全表过滤 + 切分:     {result['mask_ms_per_user']} ms/用户")
+    print(f"  索引查询:           {result['index_ms_per_user']} ms/用户")
+    print(f"  加速比:             {result['speedup']}x")
+    return result
+
+
+def make_local_qdrant(config, df_news: pd.DataFrame, collection_name: str, seed: int = 0, with_async: bool = False):
+    """
+    创建进程内 Qdrant（:memory:）并写入随机单位向量，用于无服务端的基准测试
+    with_async=True 时同时创建内容相同的进程内异步客户端（两者的内存数据互不共享，需分别写入）
+    """
+    from qdrant_client import QdrantClient, AsyncQdrantClient
+    from qdrant_client.http.models import Distance, VectorParams, Batch
+    from db_qdrant import QdrantClientWrapper, news_point_id
+    from async_runner import run_sync
+
+    qdrant = QdrantClientWrapper(config, client=QdrantClient(":memory:"))
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((len(df_news), qdrant.size)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    payloads = df_news[['news_id', 'category', 'sub_category', 'title']].to_dict(orient='records')
+    ids = [news_point_id(nid) for nid in df_news['news_id']]
+    for i in range(0, len(ids), 1000):
+        qdrant.add_points(collection_name, ids[i:i + 1000], payloads[i:i + 1000], vectors[i:i + 1000].tolist())
+
+    if with_async:
+        async def fill():
+            client = AsyncQdrantClient(":memory:")
+            await client.create_collection(
+                collection_name, vectors_config=VectorParams(size=qdrant.size, distance=Distance.COSINE)
+            )
+            for i in range(0, len(ids), 1000):
+                await client.upsert(collection_name, points=Batch(
+                    ids=ids[i:i + 1000], payloads=payloads[i:i + 1000], vectors=vectors[i:i + 1000].tolist()
+                ))
+            return client
+        qdrant._async_client = run_sync(fill())
+    return qdrant
+
+
+def percentile_ms(samples: List[float], q: float) -> float:
+    return round(float(np.percentile(np.asarray(samples) * 1000, q)), 3)
+
+
+def bench_query_vector(args) -> Dict[str, Dict[str, float]]:
+    """对比三种召回查询方式的单次延迟：重新编码标题 / 取回已存向量 / 按点ID服务端搜索"""
+    from loguru import logger
+    from config import Config
+    from utils import NewsRecommender
+    from embedding_cache import EmbeddingCache
+
+    logger.remove()
+    config = Config()
+    recommender = NewsRecommender(config)
+    # 关闭嵌入缓存，测量的是原始的逐次模型推理成本
+    recommender.gpt.embedding_cache = EmbeddingCache(
+        model_id=config.EMBEDDING_MODEL, dims=recommender.qdrant.size, cache_dir=None, max_memory_items=0
+    )
+    if args.local:
+        df_news = load_news_frame(args.news, args.synthetic or 20000)
+        recommender.qdrant = make_local_qdrant(config, df_news, recommender.news_collection, with_async=True)
+    else:
+        df_news = load_news_frame(args.news, args.synthetic)
+    catalog = NewsCatalog(df_news)
+    query_ids = df_news['news_id'].sample(args.queries, random_state=0).tolist()
+
+    def run(mode: str, news_id: str):
+        if mode == "embed":
+            recommender.vector_search_candidates(catalog.get(news_id)['title'], limit=args.limit)
+        else:
+            config.RETRIEVAL_MODE = mode
+            recommender.search_by_news_id(news_id, limit=args.limit)
+
+    result = {}
+    print(f"\n📊 召回查询基准 | 查询数: {len(query_ids)} | limit: {args.limit}")
+    for mode in ["embed", "stored_vector", "point_id"]:
+        run(mode, query_ids[0])  # 预热
+        samples = []
+        for news_id in query_ids:
+            start = time.perf_counter()
+            run(mode, news_id)
+            samples.append(time.perf_counter() - start)
+        result[mode] = {"p50_ms": percentile_ms(samples, 50), "p95_ms": percentile_ms(samples, 95)}
+        print(f"  {mode:<14} p50: {result[mode]['p50_ms']} ms | p95: {result[mode]['p95_ms']} ms")
+    return result
+
+
+STUB_PROFILE_RESPONSE = "[topics]\n- 体育\n- 财经\n\n[region]\n- 美国"
+
+
+def stub_llm(gpt, delay: float):
+    """把大模型调用替换为固定延迟的模拟响应（排序请求返回 1..N，画像请求返回固定画像）"""
+    import asyncio
+
+    def respond(messages) -> str:
+        prompt = messages if isinstance(messages, str) else messages[-1]["content"]
+        if "请只输出新闻序号" in prompt:
+            return ",".join(str(i) for i in range(1, 31))
+        return STUB_PROFILE_RESPONSE
+
+    def get_completion(messages, *args, **kwargs):
+        time.sleep(delay)
+        return respond(messages)
+
+    async def get_completion_async(messages, *args, **kwargs):
+        await asyncio.sleep(delay)
+        return respond(messages)
+
+    gpt.get_completion = get_completion
+    gpt.get_completion_async = get_completion_async
+
+
+def bench_async_pipeline(args) -> Dict[str, Dict[str, float]]:
+    """对比串行推荐流程与异步推荐流程的端到端延迟（大模型用固定延迟模拟，Qdrant 使用进程内实例）"""
+    from loguru import logger
+    from config import Config
+    from utils import NewsRecommender
+    from async_runner import run_sync
+
+    logger.remove()
+    config = Config()
+    config.RANKER = args.ranker
+    recommender = NewsRecommender(config)
+    recommender.profile_store = None  # 每次请求都生成画像，测量的是最坏情况（两次大模型调用）
+    stub_llm(recommender.gpt, args.llm_delay)
+
+    num_news = args.synthetic or 20000
+    df_news = make_synthetic_news(num_news)
+    df_behaviors = make_synthetic_behaviors(num_news, num_news)
+    recommender.qdrant = make_local_qdrant(config, df_news, recommender.news_collection, with_async=True)
+    index = recommender.get_user_index(df_behaviors)
+    users = [uid for uid in index.user_ids if index.click_history(uid)][:args.users]
+
+    runners = {
+        "serial": lambda uid: recommender.recommend_serial(df_news, df_behaviors, uid, top_n=args.top_n),
+        "async": lambda uid: run_sync(recommender.recommend_async(df_news, df_behaviors, uid, top_n=args.top_n)),
+    }
+    result = {}
+    print(
+        f"\n📊 推荐流程基准 | 用户数: {len(users)} | 模拟大模型延迟: {args.llm_delay}s | "
+        f"top_n: {args.top_n} | 排序: {args.ranker}"
+    )
+    for name, run in runners.items():
+        run(users[0])  # 预热
+        samples = []
+        for user_id in users:
+            start = time.perf_counter()
+            run(user_id)
+            samples.append(time.perf_counter() - start)
+        result[name] = {"p50_ms": percentile_ms(samples, 50), "p95_ms": percentile_ms(samples, 95)}
+        print(f"  {name:<8} p50: {result[name]['p50_ms']} ms | p95: {result[name]['p95_ms']} ms")
+    saved = result["serial"]["p50_ms"] - result["async"]["p50_ms"]
+    print(f"  p50 节省: {round(saved, 3)} ms（理论上限为一次召回耗时与一次大模型延迟中的较小者）")
+    return result
+
+
+def bench_embed_workers(args) -> Dict[int, Dict[str, float]]:
+    """不同工作进程数下多进程嵌入引擎的吞吐（关闭嵌入缓存，测量的是模型推理）"""
+    from loguru import logger
+    from config import Config
+    from NewsGPT import DeepSeekGPT
+    from embedding_cache import EmbeddingCache
+    from embedding_engine import EmbeddingEngine
+
+    logger.remove()
+    config = Config()
+    gpt = DeepSeekGPT(config)
+    df_news = load_news_frame(args.news, args.synthetic).head(args.texts).fillna('')
+    # 与入库时的 news_info 格式一致
+    texts = [
+        f"category:{c} | sub_category:{s} | title:{t} | abstract:{a}"
+        for c, s, t, a in zip(df_news['category'], df_news['sub_category'], df_news['title'], df_news['abstract'])
+    ]
+
+    result = {}
+    print(f"\n📊 嵌入吞吐基准 | 文本数: {len(texts)} | CPU 核数: {os.cpu_count()}")
+    for workers in [int(w) for w in args.workers.split(",")]:
+        gpt.embedding_cache = EmbeddingCache(
+            model_id=config.EMBEDDING_MODEL, dims=gpt.embedding_cache.dims, cache_dir=None, max_memory_items=0
+        )
+        with EmbeddingEngine(gpt, num_workers=workers, batch_size=args.batch_size) as engine:
+            engine.encode(texts[:workers * 8])  # 预热（启动工作进程、加载模型）
+            start = time.perf_counter()
+            engine.encode(texts)
+            elapsed = time.perf_counter() - start
+        result[workers] = {"seconds": round(elapsed, 2), "texts_per_second": round(len(texts) / elapsed, 1)}
+        base = result[min(result)]["texts_per_second"]
+        print(f"  进程数 {workers:<3} {result[workers]['texts_per_second']:>9} 文本/秒 | "
+              f"耗时 {result[workers]['seconds']}s | 相对加速 {result[workers]['texts_per_second'] / base:.2f}x")
+    return result
+
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+
+# 启动目标：命令行构建推荐应用；各页面以 Streamlit 裸模式执行一次（与 streamlit run 首次渲染相同的代码路径）
+STARTUP_TARGETS = {
+    "cli": "from main import NewsRecommendationApp\napp = NewsRecommendationApp()",
+    "app_main": f"import runpy\nrunpy.run_path({os.path.join(APP_DIR, 'app_main.py')!r}, run_name='__main__')",
+    "app_enhanced": f"import runpy\nrunpy.run_path({os.path.join(APP_DIR, 'app_enhanced.py')!r}, run_name='__main__')",
+    "dashboard": f"import runpy\nrunpy.run_path({os.path.join(APP_DIR, 'dashboard.py')!r}, run_name='__main__')",
+    "content_analyzer": f"import runpy\nrunpy.run_path({os.path.join(APP_DIR, 'content_analyzer.py')!r}, run_name='__main__')",
+}
+
+# 首次使用：加载嵌入模型并创建客户端（启动阶段推迟到这里的开销）
+FIRST_USE_SCRIPT = """
+from config import Config
+from shared_resources import get_embedding_model, get_openai_client, get_qdrant_client
+config = Config()
+get_embedding_model(config)
+get_openai_client(config)
+get_qdrant_client(config)
+"""
+
+STARTUP_PROBE = """
+import sys, json, time
+sys.path.insert(0, {core_dir!r})
+sys.path.insert(0, {app_dir!r})
+from loguru import logger
+logger.remove()
+start = time.perf_counter()
+{target}
+startup = time.perf_counter() - start
+first_use = None
+if {first_use!r}:
+    start = time.perf_counter()
+{first_use_script}
+    first_use = time.perf_counter() - start
+from data_store import get_rss_mb
+from shared_resources import loaded_resources
+print(json.dumps({{"startup_seconds": startup, "first_use_seconds": first_use,
+                  "rss_mb": get_rss_mb(), "resources": loaded_resources()}}))
+"""
+
+
+def bench_app_startup(args) -> Dict[str, Dict[str, float]]:
+    """在独立进程中测量命令行与各 Streamlit 页面的启动耗时和常驻内存（每个目标都是冷进程）"""
+    import json
+    import subprocess
+    import sys
+    import textwrap
+
+    core_dir = os.path.dirname(os.path.abspath(__file__))
+    targets = args.targets.split(",") if args.targets else list(STARTUP_TARGETS)
+    result = {}
+    print(f"\n📊 启动基准 | 目标: {', '.join(targets)} | 重复: {args.repeat}")
+    for name in targets:
+        script = STARTUP_PROBE.format(
+            core_dir=core_dir,
+            app_dir=APP_DIR,
+            target=STARTUP_TARGETS[name],
+            first_use=args.first_use,
+            first_use_script=textwrap.indent(FIRST_USE_SCRIPT.strip(), "    "),
+        )
+        runs = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-c", script], cwd=core_dir, capture_output=True, text=True)
+            wall = time.perf_counter() - start
+            if proc.returncode != 0:
+                error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"退出码 {proc.returncode}"
+                print(f"  {name:<18} 失败: {error}")
+                break
+            runs.append(dict(json.loads(proc.stdout.strip().splitlines()[-1]), wall_seconds=wall))
+        if not runs:
+            continue
+        result[name] = {
+            "process_seconds": round(float(np.median([r["wall_seconds"] for r in runs])), 3),
+            "startup_seconds": round(float(np.median([r["startup_seconds"] for r in runs])), 3),
+            "rss_mb": round(float(np.median([r["rss_mb"] for r in runs])), 1),
+            "resources": runs[-1]["resources"],
+        }
+        if args.first_use:
+            result[name]["first_use_seconds"] = round(float(np.median([r["first_use_seconds"] for r in runs])), 3)
+        line = (f"  {name:<18} 进程 {result[name]['process_seconds']:>7}s | 启动 {result[name]['startup_seconds']:>7}s | "
+                f"RSS {result[name]['rss_mb']:>8} MB")
+        if args.first_use:
+            line += f" | 首次使用 {result[name]['first_use_seconds']}s"
+        print(line + f" | 已创建资源: {result[name]['resources'] or '无'}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="新闻推荐系统性能基准测试")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    catalog_parser = subparsers.add_parser("catalog", help="新闻目录索引 vs 布尔掩码扫描")
+    catalog_parser.add_argument("--news", default='MIND/MINDsmall_train/news.tsv', help="news.tsv 路径")
+    catalog_parser.add_argument("--synthetic", type=int, default=0, help="使用指定条数的合成新闻数据")
+    catalog_parser.add_argument("--history", type=int, default=50, help="模拟的用户点击历史长度")
+    catalog_parser.add_argument("--top-n", type=int, default=10, help="模拟的推荐条数")
+    catalog_parser.add_argument("--repeat", type=int, default=20, help="重复次数")
+    catalog_parser.set_defaults(func=bench_catalog)
+
+    store_parser = subparsers.add_parser("store", help="进程级数据存储：首次加载 vs 后续请求")
+    store_parser.add_argument("--news", default='MIND/MINDsmall_train/news.tsv', help="news.tsv 路径")
+    store_parser.add_argument("--behaviors", default='MIND/MINDsmall_train/behaviors.tsv', help="behaviors.tsv 路径")
+    store_parser.add_argument("--synthetic", type=int, default=0, help="使用指定条数的合成数据")
+    store_parser.add_argument("--repeat", type=int, default=20, help="重复次数")
+    store_parser.set_defaults(func=bench_store)
+
+    startup_parser = subparsers.add_parser("startup", help="冷启动：解析TSV vs 列式缓存")
+    startup_parser.add_argument("--news", default='MIND/MINDsmall_train/news.tsv', help="news.tsv 路径")
+    startup_parser.add_argument("--behaviors", default='MIND/MINDsmall_train/behaviors.tsv', help="behaviors.tsv 路径")
+    startup_parser.add_argument("--synthetic", type=int, default=0, help="使用指定条数的合成数据")
+    startup_parser.add_argument("--repeat", type=int, default=3, help="重复次数")
+    startup_parser.set_defaults(func=bench_startup)
+
+    user_index_parser = subparsers.add_parser("user_index", help="用户行为索引 vs 全表过滤")
+    user_index_parser.add_argument("--behaviors", default='MIND/MINDsmall_train/behaviors.tsv', help="behaviors.tsv 路径")
+    user_index_parser.add_argument("--synthetic", type=int, default=0, help="使用指定条数的合成行为数据")
+    user_index_parser.add_argument("--scale", type=int, default=1, help="将行为数据放大的倍数（例如 10）")
+    user_index_parser.add_argument("--users", type=int, default=20, help="每轮查询的用户数")
+    user_index_parser.add_argument("--repeat", type=int, default=3, help="重复次数")
+    user_index_parser.set_defaults(func=bench_user_index)
+
+    query_parser = subparsers.add_parser("query_vector", help="召回查询：重新编码标题 vs 复用已入库向量")
+    query_parser.add_argument("--news", default='MIND/MINDsmall_train/news.tsv', help="news.tsv 路径")
+    query_parser.add_argument("--synthetic", type=int, default=0, help="使用指定条数的合成新闻数据")
+    query_parser.add_argument("--local", action="store_true", help="使用进程内 Qdrant（随机向量），无需启动服务")
+    query_parser.add_argument("--queries", type=int, default=50, help="查询次数")
+    query_parser.add_argument("--limit", type=int, default=30, help="每次召回条数")
+    query_parser.set_defaults(func=bench_query_vector)
+
+    async_parser = subparsers.add_parser("async_pipeline", help="推荐流程：串行 vs 异步并发（模拟大模型）")
+    async_parser.add_argument("--synthetic", type=int, default=0, help="合成新闻条数（默认 20000）")
+    async_parser.add_argument("--llm-delay", type=float, default=0.5, help="模拟大模型单次调用延迟（秒）")
+    async_parser.add_argument("--users", type=int, default=20, help="测试用户数")
+    async_parser.add_argument("--top-n", type=int, default=10, help="推荐条数")
+    async_parser.add_argument("--ranker", choices=["fast", "hybrid", "llm"], default="llm", help="排序方式（fast 不调用大模型）")
+    async_parser.set_defaults(func=bench_async_pipeline)
+
+    embed_parser = subparsers.add_parser("embed_workers", help="嵌入吞吐：工作进程数 vs 文本/秒")
+    embed_parser.add_argument("--news", default='MIND/MINDsmall_train/news.tsv', help="news.tsv 路径")
+    embed_parser.add_argument("--synthetic", type=int, default=0, help="使用指定条数的合成新闻数据")
+    embed_parser.add_argument("--texts", type=int, default=5000, help="参与编码的文本数")
+    embed_parser.add_argument("--workers", default="1,2,4", help="逗号分隔的工作进程数列表")
+    embed_parser.add_argument("--batch-size", type=int, default=32, help="每个进程内 encode 的批大小")
+    embed_parser.set_defaults(func=bench_embed_workers)
+
+    app_startup_parser = subparsers.add_parser("app_startup", help="启动耗时与常驻内存：命令行与各 Streamlit 页面")
+    app_startup_parser.add_argument("--targets", default="", help=f"逗号分隔的目标（默认全部）: {','.join(STARTUP_TARGETS)}")
+    app_startup_parser.add_argument("--first-use", action="store_true", help="启动后再加载嵌入模型与客户端，测量首次使用的开销")
+    app_startup_parser.add_argument("--repeat", type=int, default=3, help="每个目标的冷启动次数（取中位数）")
+    app_startup_parser.set_defaults(func=bench_app_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+候选生成模块
+职责：把多个召回来源合并为排序前的候选集合：按 news_id 去重、剔除已点击的新闻、限制候选总数，并记录各来源的命中数
+- vector:           点击历史向量近邻（嵌入 / 向量库检索，NewsRecommender.retrieve_candidates）
+- coclick:          最近点击新闻的共同点击近邻（coclick.CoClickNeighbours，无模型推理）
+- category_popular: 用户常看类别中的热门新闻（由曝光日志预先统计，NewsPools）
+- fresh:            最近仍在被曝光的新闻（由曝光日志预先统计，NewsPools）
+合并时各来源按 CANDIDATE_SOURCES 的顺序轮流取一条，保证候选数超出上限时每个来源都有代表
+"""
+
+import time
+import numpy as np
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import zip_longest
+from typing import Dict, Iterable, List, Optional, Sequence
+from fast_ranker import NewsPriors
+from news_catalog import NewsCatalog
+
+CANDIDATE_SOURCES = ("vector", "coclick", "category_popular", "fresh")
+
+
+@dataclass
+class CandidateSet:
+    """一次候选生成的结果：合并后的候选与各来源的统计"""
+    ids: List[str]
+    by_source: Dict[str, List[str]] = field(default_factory=dict)  # 各来源返回的候选（去重前）
+    hits: Dict[str, int] = field(default_factory=dict)             # 各来源贡献进最终候选集合的条数
+    elapsed_ms: Dict[str, float] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)               # 因超出延迟预算未执行的来源
+
+
+class CandidateBudget:
+    """单次请求的候选生成延迟预算（毫秒，<=0 表示不限制）"""
+
+    def __init__(self, budget_ms: float):
+        self.deadline = time.perf_counter() + budget_ms / 1000 if budget_ms > 0 else None
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数，不限制时为 None"""
+        return None if self.deadline is None else max(self.deadline - time.perf_counter(), 0.0)
+
+    def exhausted(self) -> bool:
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+
+def parse_sources(value: str) -> List[str]:
+    sources = [source.strip() for source in value.split(",") if source.strip()]
+    unknown = set(sources) - set(CANDIDATE_SOURCES)
+    if unknown:
+        raise ValueError(f"未知的候选来源: {sorted(unknown)}，可选: {', '.join(CANDIDATE_SOURCES)}")
+    return sources
+
+
+class NewsPools:
+    """与用户无关的候选池：全局与按类别的热门 / 新鲜新闻列表（每份行为数据只构建一次，只包含目录中存在的新闻）"""
+
+    def __init__(self, priors: NewsPriors, catalog: NewsCatalog, pool_size: int = 500):
+        news_ids = np.fromiter(priors.index, dtype=object, count=len(priors.index))
+        rows = np.fromiter(priors.index.values(), dtype=np.int64, count=len(priors.index))
+        found = catalog.positions(news_ids) >= 0
+        news_ids, rows = news_ids[found], rows[found]
+        popularity, recency = priors.popularity[rows], priors.recency[rows]
+        categories = catalog.aligned('category', news_ids, fill='')
+
+        self.popular = self._pools(news_ids, categories, np.lexsort((-recency, -popularity)), pool_size)
+        self.fresh = self._pools(news_ids, categories, np.lexsort((-popularity, -recency)), pool_size)
+
+    @staticmethod
+    def _pools(news_ids: np.ndarray, categories: np.ndarray, order: np.ndarray, pool_size: int) -> Dict[Optional[str], List[str]]:
+        """按 order 排好序的全局列表（键 None）与每个类别的列表，各保留前 pool_size 条"""
+        ordered_ids, ordered_categories = news_ids[order], categories[order]
+        pools: Dict[Optional[str], List[str]] = {None: ordered_ids[:pool_size].tolist()}
+        for category in np.unique(ordered_categories):
+            pools[category] = ordered_ids[ordered_categories == category][:pool_size].tolist()
+        return pools
+
+    def popular_in(self, categories: Sequence[str]) -> List[str]:
+        return interleave(self.popular.get(category, []) for category in categories)
+
+    def fresh_in(self, categories: Optional[Sequence[str]] = None) -> List[str]:
+        if not categories:
+            return self.fresh[None]
+        return interleave(self.fresh.get(category, []) for category in categories)
+
+
+def interleave(lists: Iterable[Sequence[str]]) -> List[str]:
+    """多个列表轮流各取一条（保留重复，由调用方去重）"""
+    return [item for group in zip_longest(*lists) for item in group if item is not None]
+
+
+def preferred_categories(category_counts: Counter, limit: int, allowed: Optional[Sequence[str]] = None) -> List[str]:
+    """点击历史中出现最多的前 limit 个类别；指定了类别范围时只在范围内选，范围内都没点击过时使用整个范围"""
+    totals: Counter = Counter()
+    for (category, _), count in category_counts.items():
+        totals[category] += count
+    ranked = [category for category, _ in totals.most_common()]
+    if allowed:
+        ranked = [category for category in ranked if category in set(allowed)] or list(allowed)
+    return ranked[:limit]
+
+
+def take(
+    candidates: Iterable[str],
+    limit: int,
+    exclude: set,
+    catalog: Optional[NewsCatalog] = None,
+    categories: Optional[Sequence[str]] = None,
+    sub_categories: Optional[Sequence[str]] = None
+) -> List[str]:
+    """
+    按顺序取前 limit 条：去重、跳过 exclude 中的新闻；给出 catalog 时跳过目录中不存在的新闻（无法取回详情），
+    给出 categories / sub_categories 时只保留符合条件的新闻（需要 catalog）
+    """
+    allowed_categories = set(categories) if categories else None
+    allowed_sub_categories = set(sub_categories) if sub_categories else None
+    result, seen = [], set(exclude)
+    for news_id in candidates:
+        if news_id in seen:
+            continue
+        seen.add(news_id)
+        if catalog is not None and news_id not in catalog:
+            continue
+        if allowed_categories is not None or allowed_sub_categories is not None:
+            news = catalog.get(news_id)
+            if allowed_categories is not None and news['category'] not in allowed_categories:
+                continue
+            if allowed_sub_categories is not None and news['sub_category'] not in allowed_sub_categories:
+                continue
+        result.append(news_id)
+        if len(result) >= limit:
+            break
+    return result
+
+
+def merge_sources(by_source: Dict[str, List[str]], order: Sequence[str], click_history: Sequence[str], limit: int) -> CandidateSet:
+    """各来源按 order 轮流合并、按 news_id 去重并剔除已点击的新闻，最多保留 limit 条；命中数记在第一个给出该新闻的来源上"""
+    clicked = set(click_history)
+    ids: Dict[str, str] = {}
+    sources = [source for source in order if source in by_source]
+    for group in zip_longest(*(by_source[source] for source in sources)):
+        for source, news_id in zip(sources, group):
+            if news_id is None or news_id in clicked or news_id in ids:
+                continue
+            ids[news_id] = source
+            if len(ids) >= limit:
+                break
+        if len(ids) >= limit:
+            break
+    hits = Counter(ids.values())
+    return CandidateSet(
+        ids=list(ids),
+        by_source=by_source,
+        hits={source: hits.get(source, 0) for source in sources},
+    )
@@ -0,0 +1,349 @@
+"""
+共同点击近邻模块
+职责：由用户点击构建新闻 × 新闻共同点击矩阵（SciPy CSR），每条新闻只保留得分最高的 top-K 个近邻，
+作为不需要嵌入推理和向量检索的候选来源
+- 得分：共同点击用户数按两条新闻各自的点击用户数做余弦归一化，抑制热门新闻和所有新闻都共现的问题
+- 计算：按新闻分块计算 X^T X 的行块（X 为用户 × 新闻的 0/1 点击矩阵），每块的共现对数有上限，
+  块内取完 top-K 即丢弃，内存与共现对总数无关
+- 离线任务：分块流式读取 behaviors.tsv（点击历史 + 曝光中的点击），只累积整数编码的点击对，可处理 MINDlarge；
+  结果保存为 .npy 数组目录（COCLICK_PATH），连同源文件的路径 / mtime / 大小一起写入 meta.json；
+  推荐器只在已加载的行为数据正是该文件（且未变化）时以内存映射方式使用，否则由已加载的行为数据现场构建
+
+用法:
+    python coclick.py --behaviors MIND/MINDsmall_train/behaviors.tsv
+    python coclick.py --behaviors MIND/MINDlarge_train/behaviors.tsv --chunksize 200000
+    python coclick.py --synthetic 100000 --output /tmp/coclick
+"""
+
+import os
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from itertools import chain
+from loguru import logger
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from mind_io import ClickHistories, file_signature, iter_behaviors_tsv
+
+COCLICK_META_FILE = "meta.json"
+
+# 单个行块允许的最大共现对数（决定计算时的峰值内存）
+MAX_BLOCK_PAIRS = 20_000_000
+
+
+class CoClickNeighbours:
+    """
+    每条新闻的 top-K 共同点击近邻（CSR 排布：第 i 条新闻的近邻为 neighbours[indptr[i]:indptr[i + 1]]，按得分降序）
+    sources 为构建所用行为数据文件的来源标识（mind_io.file_signature），由内存中的数据构建时为空
+    """
+
+    def __init__(
+        self,
+        news_ids: np.ndarray,
+        indptr: np.ndarray,
+        neighbours: np.ndarray,
+        scores: np.ndarray,
+        sources: Optional[List[Dict[str, Any]]] = None
+    ):
+        self.news_ids = news_ids
+        self.indptr = indptr
+        self.neighbours = neighbours
+        self.scores = scores
+        self.sources = sources or []
+        self._index: Dict[str, int] = {news_id: i for i, news_id in enumerate(news_ids)}
+
+    def __len__(self) -> int:
+        return len(self.news_ids)
+
+    def __contains__(self, news_id: str) -> bool:
+        return news_id in self._index
+
+    def neighbours_of(self, news_ids: Sequence[str], weights: Optional[np.ndarray] = None, limit: int = 50) -> List[str]:
+        """
+        多条种子新闻的近邻按 (种子权重 × 近邻得分) 累加后取前 limit 条
+        种子新闻本身不会出现在结果中（调用方另行剔除点击过的新闻）
+        """
+        weights = np.ones(len(news_ids), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+        rows = [(self._index[news_id], weight) for news_id, weight in zip(news_ids, weights) if news_id in self._index]
+        if not rows:
+            return []
+        slices = [(self.indptr[row], self.indptr[row + 1], weight) for row, weight in rows]
+        candidates = np.concatenate([self.neighbours[start:end] for start, end, _ in slices])
+        if not len(candidates):
+            return []
+        scores = np.concatenate([self.scores[start:end] * weight for start, end, weight in slices])
+        unique, inverse = np.unique(candidates, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores)
+        order = np.argsort(-totals, kind="stable")[:limit]
+        return self.news_ids[unique[order]].tolist()
+
+
+def block_bounds(costs: np.ndarray, max_pairs: int) -> List[Tuple[int, int]]:
+    """按每行的共现对数切分行块，单块总数不超过 max_pairs（单行超出时独占一块）"""
+    bounds, start, total = [], 0, 0
+    for row, cost in enumerate(costs):
+        if row > start and total + cost > max_pairs:
+            bounds.append((start, row))
+            start, total = row, 0
+        total += cost
+    if start < len(costs):
+        bounds.append((start, len(costs)))
+    return bounds
+
+
+def top_k_per_row(block, row_offset: int, degree: np.ndarray, top_k: int, min_count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """对一个共现行块做余弦归一化、去掉自身与低频共现，每行保留 top_k，返回 (行号, 近邻, 得分)，按行、得分降序排列"""
+    block = block.tocsr()
+    block.sort_indices()
+    local_rows = np.repeat(np.arange(block.shape[0], dtype=np.int64), np.diff(block.indptr))
+    cols = block.indices.astype(np.int64)
+    counts = block.data
+    keep = (cols != local_rows + row_offset) & (counts >= min_count)
+    local_rows, cols, counts = local_rows[keep], cols[keep], counts[keep]
+    scores = counts / np.sqrt(degree[local_rows + row_offset] * degree[cols])
+    # 余弦得分在 (0, 1] 内，行号 * 2 - 得分 一次排序即为按行、得分降序（得分相同时保持近邻下标升序）
+    order = np.argsort(local_rows * 2.0 - scores, kind="stable")
+    local_rows, cols, scores = local_rows[order], cols[order], scores[order]
+    row_starts = np.zeros(block.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(local_rows, minlength=block.shape[0]), out=row_starts[1:])
+    keep = np.arange(len(local_rows)) - row_starts[local_rows] < top_k
+    return local_rows[keep] + row_offset, cols[keep], scores[keep].astype(np.float32)
+
+
+def build_coclick(
+    histories: ClickHistories,
+    top_k: int = 50,
+    min_count: int = 1,
+    max_block_pairs: int = MAX_BLOCK_PAIRS
+) -> CoClickNeighbours:
+    """由每个用户一行的点击历史（ClickHistories 的行即用户）构建共同点击近邻表"""
+    import scipy.sparse as sp
+
+    clicks = sp.csr_matrix(
+        (np.ones(len(histories.codes), dtype=np.float32), histories.codes, histories.offsets),
+        shape=(len(histories), len(histories.vocab)),
+        copy=True  # sum_duplicates 会原地排序下标，不能改动调用方的数组
+    )
+    return coclick_from_clicks(clicks, np.asarray(histories.vocab, dtype=object), top_k, min_count, max_block_pairs)
+
+
+def coclick_from_clicks(
+    clicks,
+    news_ids: np.ndarray,
+    top_k: int = 50,
+    min_count: int = 1,
+    max_block_pairs: int = MAX_BLOCK_PAIRS
+) -> CoClickNeighbours:
+    """由用户 × 新闻点击矩阵（CSR，列与 news_ids 对应，重复点击只计一次）分块计算共同点击近邻表"""
+    start = time.perf_counter()
+    num_users, num_items = clicks.shape
+    clicks.sum_duplicates()
+    clicks.data[:] = 1.0
+    items = clicks.T.tocsr()
+    degree = np.asarray(items.sum(axis=1), dtype=np.float64).ravel()
+    # 第 i 行的共现对数上限 = 点击过新闻 i 的用户各自的点击数之和
+    costs = items @ np.diff(clicks.indptr).astype(np.float64)
+
+    indptr = np.zeros(num_items + 1, dtype=np.int64)
+    neighbours, scores = [], []
+    bounds = block_bounds(costs, max_block_pairs)
+    for k, (block_start, block_end) in enumerate(bounds):
+        rows, cols, block_scores = top_k_per_row(
+            items[block_start:block_end] @ clicks, block_start, degree, top_k, min_count
+        )
+        indptr[block_start + 1:block_end + 1] = np.bincount(rows - block_start, minlength=block_end - block_start)
+        neighbours.append(cols.astype(np.int32))
+        scores.append(block_scores)
+        if len(bounds) > 10 and (k + 1) % max(len(bounds) // 10, 1) == 0:
+            logger.info(f"共同点击计算进度: {k + 1}/{len(bounds)} 块 | 耗时: {time.perf_counter() - start:.1f}s")
+    np.cumsum(indptr, out=indptr)
+
+    table = CoClickNeighbours(
+        news_ids=news_ids,
+        indptr=indptr,
+        neighbours=np.concatenate(neighbours) if neighbours else np.zeros(0, dtype=np.int32),
+        scores=np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32),
+    )
+    logger.info(
+        f"共同点击近邻构建完成 | 用户数: {num_users} | 新闻数: {num_items} | "
+        f"近邻数: {len(table.neighbours)} | 耗时: {time.perf_counter() - start:.2f}s"
+    )
+    return table
+
+
+class ClickStream:
+    """
+    分块累积 (用户, 新闻) 点击对，只保存整数编码（内存与点击总数成正比，与 TSV 大小和共现对数无关）
+    - 点击历史：同一用户各条曝光记录的点击历史相同，每个用户只取第一次出现的那条
+    - 曝光点击：impression_lpg 中标签为 1 的新闻，每条曝光都计入
+    """
+
+    def __init__(self, include_impressions: bool = True):
+        self.include_impressions = include_impressions
+        self.user_codes: Dict[str, int] = {}
+        self.item_codes: Dict[str, int] = {}
+        self.rows = 0
+        self._users: List[np.ndarray] = []
+        self._items: List[np.ndarray] = []
+
+    def add(self, chunk: pd.DataFrame):
+        known_users = len(self.user_codes)
+        users = self._encode(chunk['user_id'].astype(str).to_numpy(dtype=object), self.user_codes)
+        first = (users >= known_users) & ~pd.Series(users).duplicated().to_numpy()
+        self._append(users[first], chunk['click_history'].to_numpy(dtype=object)[first], lambda value: value.split())
+        if self.include_impressions:
+            self._append(
+                users, chunk['impression_lpg'].to_numpy(dtype=object),
+                lambda value: [item[:-2] for item in value.split() if item.endswith('-1')]
+            )
+        self.rows += len(chunk)
+
+    def clicks(self):
+        """用户 × 新闻点击矩阵（CSR）与列对应的 news_id 数组"""
+        import scipy.sparse as sp
+
+        users = np.concatenate(self._users) if self._users else np.zeros(0, dtype=np.int32)
+        items = np.concatenate(self._items) if self._items else np.zeros(0, dtype=np.int32)
+        clicks = sp.csr_matrix(
+            (np.ones(len(users), dtype=np.float32), (users, items)),
+            shape=(len(self.user_codes), len(self.item_codes))
+        )
+        return clicks, np.array(list(self.item_codes), dtype=object)
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._items)
+
+    def _append(self, users: np.ndarray, values: np.ndarray, split: Callable[[str], List[str]]):
+        lists = [split(value) if isinstance(value, str) else [] for value in values]
+        lengths = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+        tokens = np.fromiter(chain.from_iterable(lists), dtype=object, count=int(lengths.sum()))
+        self._users.append(np.repeat(users, lengths).astype(np.int32))
+        self._items.append(self._encode(tokens, self.item_codes))
+
+    @staticmethod
+    def _encode(values: np.ndarray, codes: Dict[str, int]) -> np.ndarray:
+        """编码为全局连续整数：块内先 factorize，只对块内去重后的值查全局字典"""
+        if not len(values):
+            return np.zeros(0, dtype=np.int32)
+        local, uniques = pd.factorize(values, sort=False)
+        mapping = np.fromiter(
+            (codes.setdefault(value, len(codes)) for value in uniques), dtype=np.int64, count=len(uniques)
+        )
+        return mapping[local].astype(np.int32)
+
+
+def build_coclick_from_tsv(
+    behaviors_paths: Sequence[str],
+    top_k: int = 50,
+    min_count: int = 1,
+    chunksize: int = 100_000,
+    include_impressions: bool = True,
+    max_block_pairs: int = MAX_BLOCK_PAIRS
+) -> CoClickNeighbours:
+    """流式扫描一个或多个 behaviors.tsv（每次只解析 chunksize 行）构建共同点击近邻表，并记录各文件的来源标识"""
+    start = time.perf_counter()
+    stream = ClickStream(include_impressions)
+    # 扫描前取来源标识：扫描期间文件被改写时，标识与改写后的文件不一致，推荐器不会使用该表
+    sources = [file_signature(path) for path in behaviors_paths]
+    for path in behaviors_paths:
+        for chunk in iter_behaviors_tsv(path, chunksize):
+            stream.add(chunk)
+            logger.info(
+                f"读取行为数据 | {os.path.basename(os.path.dirname(os.path.abspath(path)))} | 已处理: {stream.rows} 行 | "
+                f"用户: {len(stream.user_codes)} | 新闻: {len(stream.item_codes)} | 点击: {len(stream)}"
+            )
+    logger.info(f"行为数据扫描完成 | 耗时: {time.perf_counter() - start:.1f}s")
+    clicks, news_ids = stream.clicks()
+    table = coclick_from_clicks(clicks, news_ids, top_k, min_count, max_block_pairs)
+    table.sources = sources
+    return table
+
+
+def save_coclick(table: CoClickNeighbours, path: str, meta: Optional[Dict[str, Any]] = None):
+    """
+    保存为目录（每个数组一个 .npy 文件，可直接内存映射）：先写入临时目录再整体替换，加载方不会读到写了一半的文件
+    news_id 以定长字节串保存（MIND 的 news_id 为 ASCII）
+    """
+    tmp_path, old_path = f"{path}.tmp", f"{path}.old"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "news_ids.npy"), np.array([str(news_id).encode() for news_id in table.news_ids], dtype=bytes))
+    np.save(os.path.join(tmp_path, "indptr.npy"), np.asarray(table.indptr, dtype=np.int64))
+    np.save(os.path.join(tmp_path, "neighbours.npy"), np.asarray(table.neighbours, dtype=np.int32))
+    np.save(os.path.join(tmp_path, "scores.npy"), np.asarray(table.scores, dtype=np.float32))
+    with open(os.path.join(tmp_path, COCLICK_META_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {"news": len(table), "neighbours": int(len(table.neighbours)), "sources": table.sources, **(meta or {})},
+            f, ensure_ascii=False, indent=2
+        )
+
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    logger.success(f"共同点击近邻表已保存: {path}")
+
+
+def load_coclick(path: str) -> CoClickNeighbours:
+    """加载近邻表：近邻与得分数组以只读内存映射打开，只有 news_id 词表读入内存（目录不存在时抛出 FileNotFoundError）"""
+    meta_path = os.path.join(path, COCLICK_META_FILE)
+    if not os.path.exists(meta_path):
+        raise FileNotFoundError(f"共同点击近邻表不存在: {path}")
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return CoClickNeighbours(
+        news_ids=np.char.decode(np.load(os.path.join(path, "news_ids.npy"))).astype(object),
+        indptr=np.load(os.path.join(path, "indptr.npy"), mmap_mode="r"),
+        neighbours=np.load(os.path.join(path, "neighbours.npy"), mmap_mode="r"),
+        scores=np.load(os.path.join(path, "scores.npy"), mmap_mode="r"),
+        sources=meta.get("sources", []),
+    )
+
+
+def main():
+    import argparse
+    import tempfile
+    from config import Config
+
+    config = Config()
+    parser = argparse.ArgumentParser(description="离线构建新闻共同点击近邻表")
+    parser.add_argument(
+        "--behaviors", default='MIND/MINDsmall_train/behaviors.tsv',
+        help="behaviors.tsv（推荐器只在加载的行为数据正是该文件时使用结果）"
+    )
+    parser.add_argument("--output", default=config.COCLICK_PATH, help="输出目录")
+    parser.add_argument("--top-k", type=int, default=config.COCLICK_TOP_K, help="每条新闻保留的近邻数")
+    parser.add_argument("--min-count", type=int, default=1, help="共同点击用户数低于该值的新闻对不作为近邻")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="每次解析的行数")
+    parser.add_argument("--max-block-pairs", type=int, default=MAX_BLOCK_PAIRS, help="每个计算块的最大共现对数（决定峰值内存）")
+    parser.add_argument("--no-impressions", action="store_true", help="只使用点击历史，不计入曝光中的点击")
+    parser.add_argument("--synthetic", type=int, default=0, help="使用指定条数的合成行为数据（写成临时 TSV 后流式读取）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [args.behaviors]
+        if args.synthetic:
+            from benchmark import write_synthetic_tsvs
+            paths = [write_synthetic_tsvs(directory, args.synthetic, args.synthetic)[1]]
+        table = build_coclick_from_tsv(
+            paths,
+            top_k=args.top_k,
+            min_count=args.min_count,
+            chunksize=args.chunksize,
+            include_impressions=not args.no_impressions,
+            max_block_pairs=args.max_block_pairs,
+        )
+    save_coclick(table, args.output, meta={
+        "behaviors": f"synthetic:{args.synthetic}" if args.synthetic else os.path.abspath(args.behaviors),
+        "top_k": args.top_k,
+        "min_count": args.min_count,
+        "include_impressions": not args.no_impressions,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    print(f"\n📊 共同点击近邻表 | 新闻数: {len(table)} | 近邻数: {len(table.neighbours)} | 输出: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,5 +15,121 @@ class Config:
         }
         self.EMBEDDING_MODEL = "C:/Users/guohaoyu/.cache/huggingface/hub/models--BAAI--bge-small-zh-v1.5/snapshots/7999e1d3359715c523056ef9478215996d62a620"
         self.EMBEDDING_DIMS = 512
+        # 嵌入向量缓存：进程内 LRU 条数 + 磁盘缓存目录（置空则只使用进程内缓存）
+        self.EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', 10000))
+        self.EMBEDDING_CACHE_DIR = os.getenv(
+            'EMBEDDING_CACHE_DIR',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'embeddings')
+        )
+        # 嵌入推理后端: torch(原始 float32) / torch_int8(动态量化) / onnx / onnx_int8，以及 ONNX 导出目录
+        self.EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+        self.EMBEDDING_ONNX_DIR = os.getenv(
+            'EMBEDDING_ONNX_DIR',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'onnx')
+        )
+        # 入库嵌入计算的工作进程数（>1 时使用多进程嵌入引擎）
+        self.EMBEDDING_WORKERS = int(os.getenv('EMBEDDING_WORKERS', 1))
+        # 大模型响应缓存：SQLite 文件路径（置空则关闭）、有效期（秒）、最大条数
+        self.LLM_CACHE_PATH = os.getenv(
+            'LLM_CACHE_PATH',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'llm_cache.sqlite3')
+        )
+        self.LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 24 * 3600))
+        self.LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 50000))
+        # 用户画像存储：SQLite 文件路径（置空则每次重新生成）、触发重新调用大模型的类别分布漂移阈值
+        self.PROFILE_STORE_PATH = os.getenv(
+            'PROFILE_STORE_PATH',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'profiles.sqlite3')
+        )
+        self.PROFILE_DRIFT_THRESHOLD = float(os.getenv('PROFILE_DRIFT_THRESHOLD', 0.3))
+        # 候选召回方式: point_id(按已入库点ID服务端搜索) / stored_vector(取回已存向量再搜索) / embed(重新编码标题)
+        self.RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'point_id')
+        # 候选召回查询: user_vector(全部点击的时间衰减加权均值) / interests(按类别拆分多兴趣批量搜索) / latest(仅最近一次点击)
+        self.CANDIDATE_QUERY = os.getenv('CANDIDATE_QUERY', 'user_vector')
+        self.USER_HISTORY_SIZE = 50   # 参与用户向量计算的最近点击数
+        self.USER_HISTORY_DECAY = 0.9  # 每往前一次点击权重乘以该系数
+        self.USER_INTERESTS = 3        # interests 模式下的最大兴趣数
+        # 推荐流程：是否使用异步流程（画像生成与候选召回并发），以及单次推荐的端到端超时（秒，<=0 表示不限制）
+        self.RECOMMEND_ASYNC = os.getenv('RECOMMEND_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+        self.RECOMMEND_TIMEOUT = float(os.getenv('RECOMMEND_TIMEOUT', 60))
+        # 候选生成：召回来源（按顺序轮流合并）、合并后的候选总数上限、向量以外每个来源的候选数、
+        # 单次请求的候选生成延迟预算（毫秒，<=0 表示不限制；异步流程中超出预算的向量召回会被放弃）
+        self.CANDIDATE_SOURCES = os.getenv('CANDIDATE_SOURCES', 'vector,coclick,category_popular,fresh')
+        self.CANDIDATE_MAX = int(os.getenv('CANDIDATE_MAX', 60))
+        self.CANDIDATE_SOURCE_LIMIT = int(os.getenv('CANDIDATE_SOURCE_LIMIT', 10))
+        self.CANDIDATE_BUDGET_MS = float(os.getenv('CANDIDATE_BUDGET_MS', 500))
+        # 共同点击近邻：每条新闻保留的近邻数
+        self.COCLICK_TOP_K = int(os.getenv('COCLICK_TOP_K', 50))
+        # 离线构建的共同点击近邻表目录（由 coclick.py 生成，内存映射加载；只在加载的行为数据正是构建所用的文件时使用，否则现场构建）
+        self.COCLICK_PATH = os.getenv(
+            'COCLICK_PATH',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'coclick')
+        )
+        # 候选排序: fast(本地加权打分) / ctr(离线训练的点击率模型打分) /
+        # hybrid(本地打分后大模型重排前 RANK_LLM_TOP_K 条) / llm(全部候选交给大模型)
+        self.RANKER = os.getenv('RANKER', 'fast')
+        # 点击率模型文件（由 ctr_model.py 离线训练生成；不存在时 ctr 排序退回 fast）
+        self.CTR_MODEL_PATH = os.getenv(
+            'CTR_MODEL_PATH',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'ctr_model.npz')
+        )
+        self.RANK_LLM_TOP_K = int(os.getenv('RANK_LLM_TOP_K', 10))
+        # 离线评估报告（由 evaluate.py 生成，仪表板展示其中的质量与延迟指标）
+        self.EVAL_REPORT_PATH = os.getenv(
+            'EVAL_REPORT_PATH',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'eval_report.json')
+        )
+        # 本地打分权重：用户向量相似度、类别 / 子类别偏好、热度、新鲜度（新鲜度半衰期，小时）
+        self.RANK_WEIGHT_SIMILARITY = float(os.getenv('RANK_WEIGHT_SIMILARITY', 1.0))
+        self.RANK_WEIGHT_CATEGORY = float(os.getenv('RANK_WEIGHT_CATEGORY', 0.3))
+        self.RANK_WEIGHT_SUB_CATEGORY = float(os.getenv('RANK_WEIGHT_SUB_CATEGORY', 0.3))
+        self.RANK_WEIGHT_POPULARITY = float(os.getenv('RANK_WEIGHT_POPULARITY', 0.2))
+        self.RANK_WEIGHT_RECENCY = float(os.getenv('RANK_WEIGHT_RECENCY', 0.1))
+        self.RANK_RECENCY_HALF_LIFE = float(os.getenv('RANK_RECENCY_HALF_LIFE', 24))
+        # 异步大模型请求限流：最大并发数、每秒最多发出的请求数（<=0 表示不限速）
+        self.LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+        self.LLM_RATE_LIMIT = float(os.getenv('LLM_RATE_LIMIT', 10))
+        # 批量推荐：每批用户的点击向量一次取回/编码、召回查询一次批量搜索
+        self.BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 256))
+        # 流水线入库：阶段之间队列容量（批次数）、检查点目录
+        self.INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 2))
+        self.INGEST_CHECKPOINT_DIR = os.getenv(
+            'INGEST_CHECKPOINT_DIR',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'ingest')
+        )
         self.QDRANT_HOST = "localhost"
-        self.QDRANT_PORT = 6333
\ No newline at end of file
+        self.QDRANT_PORT = 6333
+        # Qdrant 集合配置（只在创建集合时生效）：HNSW 图参数、全量扫描阈值（KB）、HNSW 索引是否放磁盘
+        self.QDRANT_HNSW_M = int(os.getenv('QDRANT_HNSW_M', 16))
+        self.QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv('QDRANT_HNSW_EF_CONSTRUCT', 100))
+        self.QDRANT_FULL_SCAN_THRESHOLD = int(os.getenv('QDRANT_FULL_SCAN_THRESHOLD', 10000))
+        self.QDRANT_HNSW_ON_DISK = os.getenv('QDRANT_HNSW_ON_DISK', 'false').lower() in ('1', 'true', 'yes')
+        # 优化器：超过该大小（KB）的段建立 HNSW 索引 / 转为内存映射（0 表示使用服务端默认值），段数量（0 为默认）
+        self.QDRANT_INDEXING_THRESHOLD = int(os.getenv('QDRANT_INDEXING_THRESHOLD', 20000))
+        self.QDRANT_MEMMAP_THRESHOLD = int(os.getenv('QDRANT_MEMMAP_THRESHOLD', 0))
+        self.QDRANT_SEGMENT_NUMBER = int(os.getenv('QDRANT_SEGMENT_NUMBER', 0))
+        # 原始向量与 payload 是否放磁盘（开启量化时原始向量只在重打分时读取）
+        self.QDRANT_ON_DISK = os.getenv('QDRANT_ON_DISK', 'false').lower() in ('1', 'true', 'yes')
+        self.QDRANT_ON_DISK_PAYLOAD = os.getenv('QDRANT_ON_DISK_PAYLOAD', 'false').lower() in ('1', 'true', 'yes')
+        # 标量量化: none / int8，量化分位数，量化向量常驻内存
+        self.QDRANT_QUANTIZATION = os.getenv('QDRANT_QUANTIZATION', 'none')
+        self.QDRANT_QUANTIZATION_QUANTILE = float(os.getenv('QDRANT_QUANTIZATION_QUANTILE', 0.99))
+        self.QDRANT_QUANTIZATION_ALWAYS_RAM = os.getenv('QDRANT_QUANTIZATION_ALWAYS_RAM', 'true').lower() in ('1', 'true', 'yes')
+        # 查询参数：HNSW 查询 ef（0 表示使用服务端默认值），量化检索后用原始向量重打分及过采样倍数
+        self.QDRANT_HNSW_EF = int(os.getenv('QDRANT_HNSW_EF', 0))
+        self.QDRANT_QUANTIZATION_RESCORE = os.getenv('QDRANT_QUANTIZATION_RESCORE', 'true').lower() in ('1', 'true', 'yes')
+        self.QDRANT_QUANTIZATION_OVERSAMPLING = float(os.getenv('QDRANT_QUANTIZATION_OVERSAMPLING', 2.0))
+        # 向量存储: qdrant（Qdrant 服务）/ local（进程内索引，无需服务）
+        self.VECTOR_STORE = os.getenv('VECTOR_STORE', 'qdrant')
+        # 本地索引：持久化目录（置空则只在内存中）、检索模式 exact / ivf / hnsw、低于该点数时总是精确检索
+        self.LOCAL_INDEX_DIR = os.getenv(
+            'LOCAL_INDEX_DIR',
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'vector_index')
+        )
+        self.LOCAL_INDEX_MODE = os.getenv('LOCAL_INDEX_MODE', 'exact')
+        self.LOCAL_INDEX_FULL_SCAN_THRESHOLD = int(os.getenv('LOCAL_INDEX_FULL_SCAN_THRESHOLD', 10000))
+        # IVF 聚类数（0 为自动）与探查簇数；HNSW 连接数与查询候选列表大小
+        self.LOCAL_IVF_NLIST = int(os.getenv('LOCAL_IVF_NLIST', 0))
+        self.LOCAL_IVF_NPROBE = int(os.getenv('LOCAL_IVF_NPROBE', 16))
+        self.LOCAL_HNSW_M = int(os.getenv('LOCAL_HNSW_M', 16))
+        self.LOCAL_HNSW_EF = int(os.getenv('LOCAL_HNSW_EF', 64))
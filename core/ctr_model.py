@@ -0,0 +1,389 @@
+"""
+点击率（CTR）排序模型模块
+职责：离线用 MIND 曝光记录（impression_lpg 中带标签的 Nxxx-1 / Nxxx-0）训练轻量点击率模型并保存到磁盘，
+推荐时在 NewsRecommender 的排序阶段对整批候选一次向量化打分（RANKER=ctr）
+- 特征（CTR_FEATURES）：用户向量相似度、类别 / 子类别匹配、点击历史长度、标题实体重合度；
+  训练、评估与线上打分使用同一个 ctr_features 函数，特征定义一致
+- 模型：带 L2 正则的逻辑回归，特征标准化后用牛顿法求解（纯 NumPy，分块累加梯度与 Hessian，内存与样本数无关）
+- 评估：MINDsmall_dev 上按曝光计算 AUC / MRR / nDCG@5 / nDCG@10，并给出只用相似度排序的基线
+
+用法:
+    python ctr_model.py --train MIND/MINDsmall_train --dev MIND/MINDsmall_dev --vectors store
+    python ctr_model.py --synthetic 5000 --vectors random --output /tmp/ctr_model.npz
+"""
+
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+from collections import Counter
+from itertools import chain
+from loguru import logger
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from config import Config
+from fast_ranker import candidate_features
+from metrics import ImpressionMetrics
+from mind_io import load_news, load_behaviors, parse_entities, parse_impressions
+from news_catalog import NewsCatalog
+
+CTR_FEATURES = ("similarity", "category", "sub_category", "history_length", "entity_overlap")
+
+
+class EntityIndex:
+    """新闻标题实体的稀疏关联矩阵（新闻 × 实体，CSR），用于向量化计算实体重合度"""
+
+    def __init__(self, df_news: pd.DataFrame, column: str = "title_entities"):
+        import scipy.sparse as sp
+
+        news_ids = df_news['news_id'].astype(str).to_numpy(dtype=object)
+        n = len(news_ids)
+        # 重复 news_id 取第一条（与 NewsCatalog 一致）
+        self._row: Dict[str, int] = dict(zip(news_ids[::-1], range(n - 1, -1, -1)))
+        values = df_news[column] if column in df_news.columns else pd.Series([[]] * n)
+        entity_lists = [
+            sorted({e['WikidataId'] for e in parse_entities(value) if isinstance(e, dict) and e.get('WikidataId')})
+            for value in values
+        ]
+        lengths = np.fromiter(map(len, entity_lists), dtype=np.int64, count=n)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        codes, vocab = pd.factorize(np.fromiter(chain.from_iterable(entity_lists), dtype=object, count=int(indptr[-1])))
+        self.matrix = sp.csr_matrix(
+            (np.ones(len(codes), dtype=np.float32), codes.astype(np.int64), indptr),
+            shape=(n, len(vocab))
+        )
+
+    def rows(self, news_ids: Iterable[str]) -> np.ndarray:
+        get = self._row.get
+        return np.fromiter((get(news_id, -1) for news_id in news_ids), dtype=np.int64)
+
+    def overlap(self, click_history: Sequence[str], candidate_ids: Sequence[str]) -> np.ndarray:
+        """候选新闻的标题实体中出现在用户已点击新闻标题实体里的比例（无实体的候选为 0）"""
+        result = np.zeros(len(candidate_ids), dtype=np.float32)
+        click_rows = self.rows(click_history)
+        click_rows = click_rows[click_rows >= 0]
+        if not len(click_rows) or not self.matrix.shape[1]:
+            return result
+        user_entities = (np.asarray(self.matrix[click_rows].sum(axis=0)).ravel() > 0).astype(np.float32)
+        candidate_rows = self.rows(candidate_ids)
+        found = candidate_rows >= 0
+        candidates = self.matrix[candidate_rows[found]]
+        hits = candidates @ user_entities
+        result[found] = hits / np.maximum(np.diff(candidates.indptr), 1)
+        return result
+
+
+def ctr_features(
+    user_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    candidate_categories: np.ndarray,
+    candidate_sub_categories: np.ndarray,
+    category_counts: Counter,
+    history_length: int,
+    entity_overlap: np.ndarray,
+    features: Sequence[str] = CTR_FEATURES
+) -> np.ndarray:
+    """一次曝光（或一次推荐）全部候选的特征矩阵，列顺序为 features（模型只使用部分特征时传入 model.features）"""
+    base = candidate_features(
+        user_vector, candidate_vectors, candidate_categories, candidate_sub_categories, category_counts,
+        np.zeros(len(candidate_vectors), dtype=np.float32), np.zeros(len(candidate_vectors), dtype=np.float32)
+    )
+    columns = {
+        "similarity": base["similarity"],
+        "category": base["category"],
+        "sub_category": base["sub_category"],
+        "history_length": np.full(len(candidate_vectors), np.log1p(history_length), dtype=np.float32),
+        "entity_overlap": np.asarray(entity_overlap, dtype=np.float32),
+    }
+    return np.stack([columns[name] for name in features], axis=1)
+
+
+class LogisticCTRModel:
+    """标准化特征上的 L2 正则逻辑回归"""
+
+    def __init__(
+        self,
+        features: Sequence[str] = CTR_FEATURES,
+        mean: Optional[np.ndarray] = None,
+        scale: Optional[np.ndarray] = None,
+        coef: Optional[np.ndarray] = None,
+        intercept: float = 0.0
+    ):
+        unknown = set(features) - set(CTR_FEATURES)
+        if unknown or not features:
+            raise ValueError(f"未知的 CTR 特征: {sorted(unknown)}，可选: {', '.join(CTR_FEATURES)}")
+        self.features = tuple(features)
+        d = len(self.features)
+        self.mean = np.zeros(d) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = np.ones(d) if scale is None else np.asarray(scale, dtype=np.float64)
+        self.coef = np.zeros(d) if coef is None else np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    def fit(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        l2: float = 1.0,
+        max_iter: int = 30,
+        tol: float = 1e-6,
+        chunk_size: int = 1_000_000
+    ) -> "LogisticCTRModel":
+        """牛顿法求解（每次迭代分块累加梯度与 Hessian，特征维度很小，通常十次以内收敛）"""
+        n, d = X.shape
+        if d != len(self.features):
+            raise ValueError(f"特征矩阵列数（{d}）与模型特征（{', '.join(self.features)}）不一致")
+        self.mean = X.mean(axis=0, dtype=np.float64)
+        self.scale = X.std(axis=0, dtype=np.float64)
+        self.scale[self.scale < 1e-12] = 1.0
+        weights = np.zeros(d + 1)
+        penalty = np.diag(np.r_[np.full(d, l2), 0.0])  # 截距不做正则
+        for iteration in range(max_iter):
+            gradient = penalty @ weights
+            hessian = penalty.copy()
+            for start in range(0, n, chunk_size):
+                Z = self._design(X[start:start + chunk_size])
+                p = _sigmoid(Z @ weights)
+                gradient += Z.T @ (p - y[start:start + chunk_size])
+                hessian += (Z * (p * (1 - p))[:, None]).T @ Z
+            step = np.linalg.solve(hessian, gradient)
+            weights -= step
+            if np.max(np.abs(step)) < tol:
+                break
+        self.coef, self.intercept = weights[:d], float(weights[d])
+        logger.info(f"CTR 模型训练完成 | 样本数: {n} | 迭代: {iteration + 1} | 系数: {dict(zip(self.features, np.round(self.coef, 4)))}")
+        return self
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return ((X - self.mean) / self.scale) @ self.coef + self.intercept
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """整批候选的点击概率（负采样训练时概率整体偏高，但同一批内的排序不受影响）"""
+        return _sigmoid(self.decision_function(X))
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                features=np.array(self.features),
+                mean=self.mean,
+                scale=self.scale,
+                coef=self.coef,
+                intercept=np.array([self.intercept])
+            )
+        os.replace(tmp_path, path)
+        logger.success(f"CTR 模型已保存: {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "LogisticCTRModel":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                features=[str(name) for name in data["features"]],
+                mean=data["mean"],
+                scale=data["scale"],
+                coef=data["coef"],
+                intercept=float(data["intercept"][0])
+            )
+
+    def _design(self, X: np.ndarray) -> np.ndarray:
+        Z = (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+        return np.hstack([Z, np.ones((len(Z), 1))])
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -35, 35)))
+
+
+class CTRFeatureContext:
+    """离线特征上下文：全部新闻的归一化向量矩阵、类别与标题实体索引，按曝光计算与线上一致的特征"""
+
+    def __init__(self, config: Config, df_news: pd.DataFrame, news_ids: np.ndarray, matrix: np.ndarray):
+        self.config = config
+        self.matrix = matrix
+        self._row = {news_id: row for row, news_id in enumerate(news_ids)}
+        self.catalog = NewsCatalog(df_news)
+        self.entities = EntityIndex(df_news)
+
+    def user_vector(self, click_history: Sequence[str]) -> np.ndarray:
+        """与 NewsRecommender.build_user_vector 相同：最近 USER_HISTORY_SIZE 次点击的时间衰减加权均值"""
+        rows = [self._row[news_id] for news_id in click_history[-self.config.USER_HISTORY_SIZE:] if news_id in self._row]
+        if not rows:
+            return np.zeros(0, dtype=np.float32)
+        weights = (self.config.USER_HISTORY_DECAY ** np.arange(len(rows) - 1, -1, -1)).astype(np.float32)
+        vector = weights @ self.matrix[rows]
+        return vector / max(np.linalg.norm(vector), 1e-12)
+
+    def features(self, click_history: Sequence[str], candidate_ids: Sequence[str]) -> np.ndarray:
+        user_vector = self.user_vector(click_history)
+        candidate_vectors = np.zeros((len(candidate_ids), len(user_vector)), dtype=np.float32)
+        if len(user_vector):
+            rows = np.fromiter((self._row.get(news_id, -1) for news_id in candidate_ids), dtype=np.int64, count=len(candidate_ids))
+            found = rows >= 0
+            candidate_vectors[found] = self.matrix[rows[found]]
+        category_counts = Counter(zip(
+            self.catalog.column('category', click_history), self.catalog.column('sub_category', click_history)
+        ))
+        return ctr_features(
+            user_vector,
+            candidate_vectors,
+            self.catalog.aligned('category', candidate_ids, fill=''),
+            self.catalog.aligned('sub_category', candidate_ids, fill=''),
+            category_counts,
+            len(click_history),
+            self.entities.overlap(click_history, candidate_ids)
+        )
+
+
+def impression_dataset(
+    context: CTRFeatureContext,
+    df_behaviors: pd.DataFrame,
+    max_impressions: int = 0,
+    neg_ratio: int = 0,
+    seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    逐条曝光计算特征，返回 (特征矩阵, 标签, 每条曝光在矩阵中的起始偏移，长度为曝光数 + 1)
+    neg_ratio > 0 时每个点击最多保留 neg_ratio 个未点击样本（只用于训练，评估使用完整曝光）
+    """
+    rng = np.random.default_rng(seed)
+    blocks, labels, offsets = [], [], [0]
+    start = time.perf_counter()
+    for history, impressions in zip(df_behaviors['click_history'], df_behaviors['impression_lpg']):
+        news_ids, impression_labels = parse_impressions(impressions)
+        impression_labels = np.asarray(impression_labels, dtype=np.float32)
+        if not news_ids or impression_labels.min() < 0 or impression_labels.sum() == 0:
+            continue
+        if neg_ratio > 0:
+            positives = np.flatnonzero(impression_labels == 1)
+            negatives = np.flatnonzero(impression_labels == 0)
+            negatives = rng.permutation(negatives)[:neg_ratio * len(positives)]
+            keep = np.sort(np.concatenate([positives, negatives]))
+            news_ids, impression_labels = [news_ids[i] for i in keep], impression_labels[keep]
+        click_history = history.split() if isinstance(history, str) else []
+        blocks.append(context.features(click_history, news_ids))
+        labels.append(impression_labels)
+        offsets.append(offsets[-1] + len(news_ids))
+        if max_impressions and len(blocks) >= max_impressions:
+            break
+    logger.info(f"曝光特征构建完成 | 曝光数: {len(blocks)} | 样本数: {offsets[-1]} | 耗时: {time.perf_counter() - start:.1f}s")
+    if not blocks:
+        return np.zeros((0, len(CTR_FEATURES)), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(1, dtype=np.int64)
+    return np.vstack(blocks), np.concatenate(labels), np.asarray(offsets, dtype=np.int64)
+
+
+def evaluate_scores(labels: np.ndarray, scores: np.ndarray, offsets: np.ndarray) -> Dict[str, float]:
+    """按曝光计算 AUC / MRR / nDCG@5 / nDCG@10"""
+    metrics = ImpressionMetrics()
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        metrics.add(labels[start:end], scores[start:end])
+    return metrics.summary()
+
+
+def train_and_evaluate(
+    config: Config,
+    df_train_news: pd.DataFrame,
+    df_train_behaviors: pd.DataFrame,
+    df_dev_news: pd.DataFrame,
+    df_dev_behaviors: pd.DataFrame,
+    vectors: str = "store",
+    max_train_impressions: int = 0,
+    max_dev_impressions: int = 0,
+    neg_ratio: int = 4,
+    l2: float = 1.0,
+    seed: int = 0
+) -> Tuple[LogisticCTRModel, Dict[str, Any]]:
+    """在训练集曝光上训练模型，在验证集曝光上评估（附只用相似度排序的基线），返回 (模型, 报告)"""
+    from retrieval_benchmark import load_news_vectors
+
+    df_news = pd.concat([df_train_news, df_dev_news], ignore_index=True).drop_duplicates('news_id').reset_index(drop=True)
+    news_ids, matrix = load_news_vectors(config, df_news, vectors, seed)
+    logger.info(f"新闻向量: {len(news_ids)} / {len(df_news)} | 来源: {vectors}")
+    context = CTRFeatureContext(config, df_news, news_ids, matrix)
+
+    X_train, y_train, _ = impression_dataset(context, df_train_behaviors, max_train_impressions, neg_ratio, seed)
+    if not len(y_train):
+        raise ValueError("训练集中没有带点击标签的曝光记录")
+    start = time.perf_counter()
+    model = LogisticCTRModel().fit(X_train, y_train, l2=l2)
+    train_seconds = time.perf_counter() - start
+
+    X_dev, y_dev, offsets = impression_dataset(context, df_dev_behaviors, max_dev_impressions)
+    start = time.perf_counter()
+    scores = model.predict(X_dev)
+    score_seconds = time.perf_counter() - start
+    report = {
+        "meta": {
+            "vectors": vectors,
+            "features": list(model.features),
+            "train_samples": int(len(y_train)),
+            "dev_samples": int(len(y_dev)),
+            "neg_ratio": neg_ratio,
+            "l2": l2,
+            "train_seconds": round(train_seconds, 3),
+            "score_us_per_item": round(score_seconds / max(len(y_dev), 1) * 1e6, 3),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "coef": dict(zip(model.features, np.round(model.coef, 6).tolist())),
+        "dev": {
+            "ctr": evaluate_scores(y_dev, scores, offsets),
+            "similarity": evaluate_scores(y_dev, X_dev[:, CTR_FEATURES.index("similarity")], offsets),
+        },
+    }
+    return model, report
+
+
+def print_report(report: Dict[str, Any]):
+    meta = report["meta"]
+    print(f"\n📊 CTR 模型 | 训练样本: {meta['train_samples']} | 验证样本: {meta['dev_samples']} | 向量: {meta['vectors']}")
+    print(f"  训练耗时: {meta['train_seconds']}s | 打分: {meta['score_us_per_item']} µs/条")
+    print(f"  {'排序':<12} {'AUC':>8} {'MRR':>8} {'nDCG@5':>8} {'nDCG@10':>8} {'曝光数':>8}")
+    for name, metrics in report["dev"].items():
+        print(f"  {name:<12} {metrics['auc']:>8} {metrics['mrr']:>8} {metrics['ndcg@5']:>8} {metrics['ndcg@10']:>8} {metrics['impressions']:>8}")
+
+
+def main():
+    import argparse
+
+    config = Config()
+    parser = argparse.ArgumentParser(description="离线训练 CTR 排序模型并在验证集上评估")
+    parser.add_argument("--train", default='MIND/MINDsmall_train', help="训练集目录（含 news.tsv / behaviors.tsv）")
+    parser.add_argument("--dev", default='MIND/MINDsmall_dev', help="验证集目录（含 news.tsv / behaviors.tsv）")
+    parser.add_argument("--synthetic", type=int, default=0, help="使用指定条数的合成数据（配合 --vectors random）")
+    parser.add_argument("--vectors", choices=["store", "embed", "random"], default="store", help="新闻向量来源")
+    parser.add_argument("--max-train-impressions", type=int, default=0, help="最多使用的训练曝光数（0 表示全部）")
+    parser.add_argument("--max-dev-impressions", type=int, default=0, help="最多评估的验证曝光数（0 表示全部）")
+    parser.add_argument("--neg-ratio", type=int, default=4, help="训练时每个点击保留的未点击样本数（0 表示全部保留）")
+    parser.add_argument("--l2", type=float, default=1.0, help="L2 正则系数")
+    parser.add_argument("--output", default=config.CTR_MODEL_PATH, help="模型输出路径")
+    parser.add_argument("--report", default="", help="评估报告 JSON 输出路径（默认只打印）")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        from benchmark import make_synthetic_news, make_synthetic_behaviors
+        df_news = make_synthetic_news(args.synthetic)
+        train = (df_news, make_synthetic_behaviors(args.synthetic, args.synthetic, seed=1))
+        dev = (df_news, make_synthetic_behaviors(args.synthetic, args.synthetic, seed=2))
+    else:
+        train = (load_news(os.path.join(args.train, 'news.tsv')), load_behaviors(os.path.join(args.train, 'behaviors.tsv')))
+        dev = (load_news(os.path.join(args.dev, 'news.tsv')), load_behaviors(os.path.join(args.dev, 'behaviors.tsv')))
+
+    model, report = train_and_evaluate(
+        config, *train, *dev,
+        vectors=args.vectors,
+        max_train_impressions=args.max_train_impressions,
+        max_dev_impressions=args.max_dev_impressions,
+        neg_ratio=args.neg_ratio,
+        l2=args.l2,
+    )
+    model.save(args.output)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n报告已写入: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
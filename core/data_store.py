@@ -0,0 +1,199 @@
+"""
+MIND 数据存储模块
+职责：进程级共享的 news.tsv / behaviors.tsv 数据存储
+- 首次使用时懒加载，之后所有请求、CLI 和各 Streamlit 页面共享同一份 DataFrame
+- 仅当文件 mtime/大小变化时重新加载
+- 实际读取由 mind_io 完成，列式缓存新鲜时自动走缓存
+- 记录加载耗时与进程常驻内存，便于确认请求路径上不再有磁盘解析
+"""
+
+import os
+import time
+import threading
+import pandas as pd
+from dataclasses import dataclass, field
+from loguru import logger
+from typing import Dict, Any, List, Optional, Callable
+from news_catalog import NewsCatalog
+from user_index import UserBehaviorIndex
+from mind_io import load_news, load_behaviors, load_click_histories
+
+MAX_EXTERNAL_FRAMES = 3
+
+
+def get_rss_mb() -> float:
+    """获取当前进程常驻内存（MB），无法获取时返回 -1"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    try:
+        import resource
+        # Linux 下 ru_maxrss 单位为 KB（峰值常驻内存）
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return -1.0
+
+
+@dataclass
+class _DataEntry:
+    """单个数据文件的缓存条目"""
+    frame: pd.DataFrame
+    mtime: float
+    size: int
+    load_seconds: float
+    loaded_at: float
+    hits: int = 0
+    derived: Dict[str, Any] = field(default_factory=dict)
+    building: Dict[str, threading.Lock] = field(default_factory=dict)
+
+
+class MINDDataStore:
+    """进程级 MIND 数据存储（按文件绝对路径缓存，mtime 变化时刷新）"""
+
+    def __init__(self):
+        self._entries: Dict[str, _DataEntry] = {}
+        self._lock = threading.RLock()
+        # 外部传入的 DataFrame（新闻、行为与先验行为数据各一份）的派生结构，只保留最近的几份
+        self._external: List[_DataEntry] = []
+        self.loads = 0
+
+    def get_news(self, file_path: str) -> pd.DataFrame:
+        """获取新闻数据（首次调用时加载）"""
+        return self._get(file_path, load_news).frame
+
+    def get_behaviors(self, file_path: str) -> pd.DataFrame:
+        """获取用户行为数据（首次调用时加载）"""
+        return self._get(file_path, load_behaviors).frame
+
+    def catalog_for(self, df_news: pd.DataFrame) -> NewsCatalog:
+        """获取与某个新闻DataFrame绑定的目录索引，随数据条目一起刷新"""
+        return self.derived_for(df_news, 'catalog', NewsCatalog)
+
+    def user_index_for(self, df_behaviors: pd.DataFrame) -> UserBehaviorIndex:
+        """获取与某个行为DataFrame绑定的用户索引（优先复用列式缓存中的偏移编码点击历史）"""
+        return self.derived_for(df_behaviors, 'user_index', self._build_user_index)
+
+    def derived_for(self, frame: pd.DataFrame, name: str, builder: Callable[[pd.DataFrame], Any]) -> Any:
+        """
+        获取由某个已加载DataFrame派生出的索引结构（每份数据只构建一次）
+        构建在存储锁之外进行（只锁住同一结构的并发构建），耗时的构建不会阻塞其他数据的访问
+        """
+        with self._lock:
+            entry = self._entry_of(frame)
+            if entry is None:
+                # 非本存储加载的数据（例如外部传入的DataFrame），只为最近的几份保留派生结构
+                entry = next((e for e in self._external if e.frame is frame), None)
+                if entry is None:
+                    entry = _DataEntry(frame=frame, mtime=0.0, size=0, load_seconds=0.0, loaded_at=time.time())
+                    self._external = [entry] + self._external[:MAX_EXTERNAL_FRAMES - 1]
+            if name in entry.derived:
+                return entry.derived[name]
+            building = entry.building.setdefault(name, threading.Lock())
+        with building:
+            with self._lock:
+                if name in entry.derived:
+                    return entry.derived[name]
+            value = builder(frame)
+            with self._lock:
+                entry.derived[name] = value
+                entry.building.pop(name, None)
+            return value
+
+    def source_of(self, frame: pd.DataFrame) -> Optional[Dict[str, Any]]:
+        """本存储加载的 DataFrame 的来源标识（与 mind_io.file_signature 格式一致），外部传入的数据返回 None"""
+        with self._lock:
+            path = self._path_of(frame)
+            if path is None:
+                return None
+            entry = self._entries[path]
+            return {"path": path, "mtime": entry.mtime, "size": entry.size}
+
+    def invalidate(self, file_path: Optional[str] = None):
+        """清除缓存，下次访问时重新加载"""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                self._external = []
+            else:
+                self._entries.pop(os.path.abspath(file_path), None)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回各数据文件的加载耗时、记录数、命中次数以及进程常驻内存"""
+        with self._lock:
+            files = {
+                path: {
+                    "rows": len(entry.frame),
+                    "load_seconds": round(entry.load_seconds, 3),
+                    "hits": entry.hits,
+                    "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.loaded_at)),
+                }
+                for path, entry in self._entries.items()
+            }
+        return {
+            "files": files,
+            "loads": self.loads,
+            "rss_mb": round(get_rss_mb(), 1),
+        }
+
+    def _entry_of(self, frame: pd.DataFrame) -> Optional[_DataEntry]:
+        path = self._path_of(frame)
+        return self._entries[path] if path is not None else None
+
+    def _path_of(self, frame: pd.DataFrame) -> Optional[str]:
+        for path, entry in self._entries.items():
+            if entry.frame is frame:
+                return path
+        return None
+
+    def _build_user_index(self, df_behaviors: pd.DataFrame) -> UserBehaviorIndex:
+        path = self._path_of(df_behaviors)
+        histories = load_click_histories(path) if path is not None else None
+        start = time.perf_counter()
+        index = UserBehaviorIndex(df_behaviors, histories)
+        logger.info(f"用户行为索引构建完成 | 用户数: {len(index)} | 耗时: {time.perf_counter() - start:.2f}s")
+        return index
+
+    def _get(self, file_path: str, reader: Callable[[str], pd.DataFrame]) -> _DataEntry:
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+                entry.hits += 1
+                return entry
+
+            if entry is not None:
+                logger.info(f"数据文件已变化，重新加载: {path}")
+            start = time.perf_counter()
+            frame = reader(path)
+            load_seconds = time.perf_counter() - start
+            entry = _DataEntry(
+                frame=frame,
+                mtime=stat.st_mtime,
+                size=stat.st_size,
+                load_seconds=load_seconds,
+                loaded_at=time.time(),
+            )
+            self._entries[path] = entry
+            self.loads += 1
+            logger.info(
+                f"数据加载完成 | {os.path.basename(path)} | 记录数: {len(frame)} | "
+                f"耗时: {load_seconds:.2f}s | 常驻内存: {get_rss_mb():.0f}MB"
+            )
+            return entry
+
+
+_data_store: Optional[MINDDataStore] = None
+_data_store_lock = threading.Lock()
+
+
+def get_data_store() -> MINDDataStore:
+    """获取进程级共享的数据存储"""
+    global _data_store
+    if _data_store is None:
+        with _data_store_lock:
+            if _data_store is None:
+                _data_store = MINDDataStore()
+    return _data_store
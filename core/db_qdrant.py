@@ -1,23 +1,49 @@
 from loguru import logger
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, Batch
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http.models import (
+    Distance, VectorParams, Batch, SearchRequest, PointIdsList, HnswConfigDiff, OptimizersConfigDiff,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, SearchParams, QuantizationSearchParams,
+    PayloadSchemaType
+)
 from qdrant_client.http.exceptions import UnexpectedResponse
-from typing import List, Dict, Any, Optional, Tuple, Union
+from typing import List, Dict, Any, Optional, Tuple, Union, Iterator
 from config import Config
 from NewsGPT import DeepSeekGPT
+from shared_resources import get_qdrant_client, get_async_qdrant_client
+from vector_store import VectorStore, per_query_filters
+import uuid
 
-class QdrantClientWrapper:
+
+def news_point_id(news_id: str) -> str:
+    """由 news_id 推导确定性的 Qdrant 点ID（与入库时一致）"""
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, str(news_id)))
+
+
+class QdrantClientWrapper(VectorStore):
     """封装 Qdrant 客户端操作，提供更健壮的向量数据库访问"""
-    def __init__(self, config: Config = None, client: QdrantClient = None):
+    def __init__(self, config: Config = None, client: QdrantClient = None, async_client: AsyncQdrantClient = None):
         self.config = config or Config()
-        self.client = client or QdrantClient(
-            host=self.config.QDRANT_HOST,
-            port=self.config.QDRANT_PORT
-        )
+        # 未显式传入时使用进程内共享的客户端（首次使用时创建）
+        self._client = client
+        self._async_client = async_client
         self.size = self.config.EMBEDDING_DIMS
 
+    @property
+    def client(self) -> QdrantClient:
+        if self._client is None:
+            self._client = get_qdrant_client(self.config)
+        return self._client
 
+    @client.setter
+    def client(self, value: QdrantClient):
+        self._client = value
 
+    @property
+    def async_client(self) -> AsyncQdrantClient:
+        """异步客户端（首次使用时创建，只在异步检索路径上使用）"""
+        if self._async_client is None:
+            self._async_client = get_async_qdrant_client(self.config)
+        return self._async_client
     
     def collection_exists(self, collection_name: str) -> bool:
         """检查集合是否存在"""
@@ -25,21 +51,86 @@ class QdrantClientWrapper:
         return any(collection.name == collection_name 
                   for collection in collections.collections)
     
+    def collection_config(self, **overrides) -> Dict[str, Any]:
+        """
+        由 Config 生成 create_collection 的集合配置：HNSW 图参数、优化器阈值、磁盘存储与 int8 标量量化
+        overrides 可覆盖 m / ef_construct / full_scan_threshold / indexing_threshold（基准测试使用）
+        """
+        settings = {
+            'm': self.config.QDRANT_HNSW_M,
+            'ef_construct': self.config.QDRANT_HNSW_EF_CONSTRUCT,
+            'full_scan_threshold': self.config.QDRANT_FULL_SCAN_THRESHOLD,
+            'indexing_threshold': self.config.QDRANT_INDEXING_THRESHOLD,
+        }
+        unknown = set(overrides) - set(settings)
+        if unknown:
+            raise ValueError(f"未知的集合配置项: {sorted(unknown)}")
+        settings.update(overrides)
+
+        quantization = self.config.QDRANT_QUANTIZATION.lower()
+        if quantization not in ("none", "int8"):
+            raise ValueError(f"未知的量化方式: {self.config.QDRANT_QUANTIZATION}，可选: none, int8")
+        quantization_config = None
+        if quantization == "int8":
+            quantization_config = ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=self.config.QDRANT_QUANTIZATION_QUANTILE,
+                    always_ram=self.config.QDRANT_QUANTIZATION_ALWAYS_RAM
+                )
+            )
+        return {
+            'vectors_config': VectorParams(
+                size=self.size,
+                distance=Distance.COSINE,
+                on_disk=self.config.QDRANT_ON_DISK
+            ),
+            'hnsw_config': HnswConfigDiff(
+                m=settings['m'],
+                ef_construct=settings['ef_construct'],
+                full_scan_threshold=settings['full_scan_threshold'],
+                on_disk=self.config.QDRANT_HNSW_ON_DISK
+            ),
+            'optimizers_config': OptimizersConfigDiff(
+                indexing_threshold=settings['indexing_threshold'],
+                # 0 表示沿用服务端默认值
+                memmap_threshold=self.config.QDRANT_MEMMAP_THRESHOLD or None,
+                default_segment_number=self.config.QDRANT_SEGMENT_NUMBER or None
+            ),
+            'quantization_config': quantization_config,
+            'on_disk_payload': self.config.QDRANT_ON_DISK_PAYLOAD,
+        }
+
+    def search_params(self, hnsw_ef: Optional[int] = None, exact: bool = False) -> Optional[SearchParams]:
+        """
+        与集合配置对应的查询参数：HNSW 查询 ef；开启量化时先用量化向量过采样检索，再用原始向量重打分
+        未配置任何参数时返回 None（使用服务端默认值）
+        """
+        hnsw_ef = hnsw_ef or self.config.QDRANT_HNSW_EF or None
+        quantization = None
+        if self.config.QDRANT_QUANTIZATION.lower() == "int8":
+            quantization = QuantizationSearchParams(
+                rescore=self.config.QDRANT_QUANTIZATION_RESCORE,
+                oversampling=self.config.QDRANT_QUANTIZATION_OVERSAMPLING
+            )
+        if hnsw_ef is None and quantization is None and not exact:
+            return None
+        return SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+
     def ensure_collection(self, collection_name: str) -> Tuple[bool, str]:
         """
-        确保集合存在，如不存在则创建
+        确保集合存在，如不存在则按 Config 中的集合配置创建（已存在的集合及其数据保持不变）
         返回元组：(创建结果, 错误信息)
         """
         try:
             if not self.collection_exists(collection_name):
-                logger.info(f"正在创建集合: {collection_name}")
-                self.client.recreate_collection(
-                    collection_name=collection_name,
-                    vectors_config=VectorParams(
-                        size=self.size,
-                        distance=Distance.COSINE
-                    )
+                collection_config = self.collection_config()
+                logger.info(
+                    f"正在创建集合: {collection_name} | HNSW m={self.config.QDRANT_HNSW_M} "
+                    f"ef_construct={self.config.QDRANT_HNSW_EF_CONSTRUCT} | 量化: {self.config.QDRANT_QUANTIZATION} | "
+                    f"向量落盘: {self.config.QDRANT_ON_DISK}"
                 )
+                self.client.create_collection(collection_name=collection_name, **collection_config)
                 logger.success(f"集合创建成功: {collection_name}")
                 return True, ""
             return True, ""
@@ -47,6 +138,23 @@ class QdrantClientWrapper:
             logger.error(f"集合创建失败: {collection_name} - 错误: {str(e)}")
             return False, str(e)
     
+    def ensure_payload_index(self, collection_name: str, field_name: str) -> bool:
+        """为 payload 字段建立关键字索引（已存在时跳过），过滤检索时由索引直接筛选候选点"""
+        try:
+            schema = self.client.get_collection(collection_name).payload_schema or {}
+            if field_name in schema:
+                return True
+            self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+            logger.success(f"payload 索引创建成功: {collection_name}.{field_name}")
+            return True
+        except Exception as e:
+            logger.error(f"payload 索引创建失败: {collection_name}.{field_name} - 错误: {str(e)}")
+            return False
+
     def get_points_count(self, collection_name: str) -> int:
         """获取集合中的点数"""
         try:
@@ -111,6 +219,39 @@ class QdrantClientWrapper:
             logger.error(f"添加点到集合失败: {collection_name} - 错误: {str(e)}")
             return False
 
+    def delete_points(self, collection_name: str, ids: List[Union[int, str]], batch_size: int = 1000) -> bool:
+        """按点ID批量删除"""
+        try:
+            for i in range(0, len(ids), batch_size):
+                self.client.delete(
+                    collection_name=collection_name,
+                    points_selector=PointIdsList(points=ids[i:i + batch_size])
+                )
+            logger.success(f"成功从集合删除 {len(ids)} 个点: {collection_name}")
+            return True
+        except Exception as e:
+            logger.error(f"删除点失败: {collection_name} - 错误: {str(e)}")
+            return False
+
+    def scroll_payloads(self,
+                        collection_name: str,
+                        fields: List[str],
+                        batch_size: int = 1000) -> Iterator[Tuple[Union[int, str], Dict[str, Any]]]:
+        """分页遍历集合中所有点的指定 payload 字段（不取向量）"""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=fields,
+                with_vectors=False
+            )
+            for point in points:
+                yield point.id, point.payload or {}
+            if offset is None:
+                break
+
     def search(self, 
                collection_name: str, 
                query_vector: List[float], 
@@ -120,6 +261,7 @@ class QdrantClientWrapper:
             collection_name=collection_name,
             query_vector=query_vector,
             limit=limit,
+            search_params=self.search_params(),
             with_payload=True
         )
         return [self._format_search_result(r) for r in results]
@@ -135,10 +277,112 @@ class QdrantClientWrapper:
             query_vector=query_vector,
             query_filter=query_filter,
             limit=limit,
+            search_params=self.search_params(),
             with_payload=True
         )
         return [self._format_search_result(r) for r in results]
     
+    def search_batch(self,
+                     collection_name: str,
+                     query_vectors: List[List[float]],
+                     limit: int = 3,
+                     query_filter: Any = None) -> List[List[Dict[str, Any]]]:
+        """批量向量搜索：多个查询在一次请求中完成，按查询顺序返回各自的结果"""
+        requests = self._search_requests(query_vectors, limit, query_filter)
+        results = self.client.search_batch(collection_name=collection_name, requests=requests)
+        return [[self._format_search_result(r) for r in batch] for batch in results]
+
+    def retrieve_vectors(self,
+                         collection_name: str,
+                         ids: List[Union[int, str]]) -> Dict[Union[int, str], List[float]]:
+        """按点ID批量取回已存储的向量（不存在的ID不出现在结果中）"""
+        points = self.client.retrieve(
+            collection_name=collection_name,
+            ids=ids,
+            with_payload=False,
+            with_vectors=True
+        )
+        return {point.id: point.vector for point in points}
+
+    def search_by_id(self,
+                     collection_name: str,
+                     point_id: Union[int, str],
+                     limit: int = 3,
+                     query_filter: Any = None) -> List[Dict[str, Any]]:
+        """以已存储点的向量为查询进行搜索（服务端完成，结果不含该点本身），可附加过滤条件"""
+        results = self.client.recommend(
+            collection_name=collection_name,
+            positive=[point_id],
+            query_filter=query_filter,
+            limit=limit,
+            search_params=self.search_params(),
+            with_payload=True
+        )
+        return [self._format_search_result(r) for r in results]
+
+    async def search_async(self,
+                           collection_name: str,
+                           query_vector: List[float],
+                           limit: int = 3,
+                           query_filter: Any = None) -> List[Dict[str, Any]]:
+        """search 的异步版本"""
+        results = await self.async_client.search(
+            collection_name=collection_name,
+            query_vector=query_vector,
+            query_filter=query_filter,
+            limit=limit,
+            search_params=self.search_params(),
+            with_payload=True
+        )
+        return [self._format_search_result(r) for r in results]
+
+    async def search_batch_async(self,
+                                 collection_name: str,
+                                 query_vectors: List[List[float]],
+                                 limit: int = 3,
+                                 query_filter: Any = None) -> List[List[Dict[str, Any]]]:
+        """search_batch 的异步版本"""
+        requests = self._search_requests(query_vectors, limit, query_filter)
+        results = await self.async_client.search_batch(collection_name=collection_name, requests=requests)
+        return [[self._format_search_result(r) for r in batch] for batch in results]
+
+    async def retrieve_vectors_async(self,
+                                     collection_name: str,
+                                     ids: List[Union[int, str]]) -> Dict[Union[int, str], List[float]]:
+        """retrieve_vectors 的异步版本"""
+        points = await self.async_client.retrieve(
+            collection_name=collection_name,
+            ids=ids,
+            with_payload=False,
+            with_vectors=True
+        )
+        return {point.id: point.vector for point in points}
+
+    async def search_by_id_async(self,
+                                 collection_name: str,
+                                 point_id: Union[int, str],
+                                 limit: int = 3,
+                                 query_filter: Any = None) -> List[Dict[str, Any]]:
+        """search_by_id 的异步版本"""
+        results = await self.async_client.recommend(
+            collection_name=collection_name,
+            positive=[point_id],
+            query_filter=query_filter,
+            limit=limit,
+            search_params=self.search_params(),
+            with_payload=True
+        )
+        return [self._format_search_result(r) for r in results]
+
+    def _search_requests(self, query_vectors: List[List[float]], limit: int, query_filter: Any) -> List[SearchRequest]:
+        """query_filter 为列表时每个查询使用各自的过滤条件"""
+        params = self.search_params()
+        filters = per_query_filters(query_vectors, query_filter)
+        return [
+            SearchRequest(vector=vector, limit=limit, filter=vector_filter, params=params, with_payload=True)
+            for vector, vector_filter in zip(query_vectors, filters)
+        ]
+
     def _format_search_result(self, result) -> Dict[str, Any]:
         """格式化搜索结果为字典"""
         return {
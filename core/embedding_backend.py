@@ -0,0 +1,216 @@
+"""
+嵌入模型推理后端模块
+职责：按 Config.EMBEDDING_BACKEND 加载 Config.EMBEDDING_MODEL，对外统一提供
+encode(texts, batch_size) -> np.ndarray 与 get_sentence_embedding_dimension()，DeepSeekGPT.get_embeddings 的约定不变
+- torch:       原始 float32 SentenceTransformer（参考后端）
+- torch_int8:  对 Linear 层做 PyTorch 动态 int8 量化
+- onnx:        导出为 ONNX，由 ONNX Runtime 推理
+- onnx_int8:   导出的 ONNX 再做 ONNX Runtime 动态 int8 量化
+ONNX 模型首次使用时导出到 EMBEDDING_ONNX_DIR 并复用；池化方式（CLS / mean）与是否归一化沿用原模型配置
+
+用法（对比某个后端与参考后端的余弦一致性和速度）:
+    python embedding_backend.py --backend onnx_int8 --news MIND/MINDsmall_dev/news.tsv --texts 2000
+"""
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from loguru import logger
+from typing import Any, Dict, List, Sequence, Tuple
+
+BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+
+
+def embedding_model_id(model_path: str, backend: str) -> str:
+    """嵌入缓存使用的模型标识：非参考后端的向量与参考后端略有差异，单独缓存"""
+    return model_path if backend == "torch" else f"{model_path}#{backend}"
+
+
+def load_embedding_model(model_path: str, backend: str = "torch", onnx_dir: str = "", device: str = None):
+    """按后端名称加载嵌入模型"""
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的嵌入后端: {backend}，可选: {', '.join(BACKENDS)}")
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_path, device=device)
+    if backend == "torch_int8":
+        import torch
+        model = SentenceTransformer(model_path, device="cpu")
+        # 动态量化：权重离线转 int8，激活在推理时按批量化，只作用于 Linear 层
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return OnnxEmbeddingModel(model_path, onnx_dir, quantize=backend == "onnx_int8")
+
+
+class OnnxEmbeddingModel:
+    """基于 ONNX Runtime 的 SentenceTransformer 等价推理（Transformer + 池化 + 可选归一化）"""
+
+    MODEL_FILE = "model.onnx"
+    INT8_FILE = "model.int8.onnx"
+    META_FILE = "pooling.json"
+
+    def __init__(self, model_path: str, onnx_dir: str, quantize: bool = False):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("onnx/onnx_int8 嵌入后端需要安装 onnxruntime 与 onnx") from e
+        from transformers import AutoTokenizer
+
+        model_hash = hashlib.sha1(model_path.encode("utf-8")).hexdigest()[:12]
+        self.export_dir = os.path.join(onnx_dir, model_hash)
+        model_file = os.path.join(self.export_dir, self.MODEL_FILE)
+        if not os.path.exists(model_file):
+            self._export(model_path)
+        if quantize:
+            model_file = self._quantize(model_file)
+
+        with open(os.path.join(self.export_dir, self.META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.pooling = meta["pooling"]
+        self.normalize = meta["normalize"]
+        self.max_seq_length = meta["max_seq_length"]
+        self.dims = meta["dims"]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.export_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self._input_names = {node.name for node in self.session.get_inputs()}
+        logger.info(f"ONNX 嵌入模型已加载 | 文件: {model_file} | 池化: {self.pooling}")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dims
+
+    def encode(self, sentences: Sequence[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """与 SentenceTransformer.encode 一致：按长度排序分批推理，结果按输入顺序返回"""
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        order = np.argsort([-len(text) for text in sentences], kind="stable")
+        output = np.empty((len(sentences), self.dims), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            index = order[start:start + batch_size]
+            output[index] = self._encode_batch([sentences[i] for i in index])
+        return output
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        features = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+        )
+        inputs = {name: value.astype(np.int64) for name, value in features.items() if name in self._input_names}
+        hidden = self.session.run(None, inputs)[0]
+        if self.pooling == "cls":
+            embeddings = hidden[:, 0]
+        else:
+            mask = features["attention_mask"][..., None].astype(np.float32)
+            embeddings = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings.astype(np.float32)
+
+    def _export(self, model_path: str):
+        """导出 Transformer 主体为 ONNX，并记录池化配置"""
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Pooling, Normalize
+
+        model = SentenceTransformer(model_path, device="cpu")
+        transformer = model[0]
+        pooling = next(module for module in model if isinstance(module, Pooling))
+        os.makedirs(self.export_dir, exist_ok=True)
+        logger.info(f"导出 ONNX 嵌入模型: {self.export_dir}")
+
+        dummy = transformer.tokenizer(["导出示例文本"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        transformer.auto_model.eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer.auto_model,
+                tuple(dummy[name] for name in input_names),
+                os.path.join(self.export_dir, self.MODEL_FILE),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+        transformer.tokenizer.save_pretrained(self.export_dir)
+        meta = {
+            "pooling": "cls" if pooling.pooling_mode_cls_token else "mean",
+            "normalize": any(isinstance(module, Normalize) for module in model),
+            "max_seq_length": transformer.max_seq_length,
+            "dims": model.get_sentence_embedding_dimension(),
+        }
+        with open(os.path.join(self.export_dir, self.META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def _quantize(self, model_file: str) -> str:
+        """ONNX Runtime 动态 int8 量化（只做一次）"""
+        int8_file = os.path.join(self.export_dir, self.INT8_FILE)
+        if not os.path.exists(int8_file):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            logger.info(f"量化 ONNX 嵌入模型为 int8: {int8_file}")
+            quantize_dynamic(model_file, int8_file, weight_type=QuantType.QInt8)
+        return int8_file
+
+
+def compare_backends(
+    model_path: str,
+    backend: str,
+    texts: Sequence[str],
+    onnx_dir: str = "",
+    batch_size: int = 32
+) -> Dict[str, Any]:
+    """对比指定后端与参考后端（torch）：逐条余弦一致性与编码吞吐"""
+    def timed_encode(model) -> Tuple[np.ndarray, float]:
+        model.encode(list(texts[:batch_size]), batch_size=batch_size)  # 预热
+        start = time.perf_counter()
+        vectors = np.asarray(model.encode(list(texts), batch_size=batch_size), dtype=np.float32)
+        return vectors, time.perf_counter() - start
+
+    reference, reference_seconds = timed_encode(load_embedding_model(model_path, "torch", device="cpu"))
+    candidate, candidate_seconds = timed_encode(load_embedding_model(model_path, backend, onnx_dir))
+
+    def normalized(matrix: np.ndarray) -> np.ndarray:
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    cosine = (normalized(reference) * normalized(candidate)).sum(axis=1)
+    return {
+        "backend": backend,
+        "texts": len(texts),
+        "cosine_mean": round(float(cosine.mean()), 6),
+        "cosine_min": round(float(cosine.min()), 6),
+        "cosine_p01": round(float(np.percentile(cosine, 1)), 6),
+        "reference_texts_per_second": round(len(texts) / reference_seconds, 1),
+        "backend_texts_per_second": round(len(texts) / candidate_seconds, 1),
+        "speedup": round(reference_seconds / candidate_seconds, 2),
+    }
+
+
+def main():
+    import argparse
+    import pandas as pd
+    from config import Config
+    from mind_io import NEWS_COLUMNS
+
+    config = Config()
+    parser = argparse.ArgumentParser(description="嵌入后端一致性与速度检查")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx_int8", help="待检查的后端")
+    parser.add_argument("--news", default='MIND/MINDsmall_dev/news.tsv', help="取标题作为测试文本的 news.tsv")
+    parser.add_argument("--texts", type=int, default=2000, help="测试文本数")
+    parser.add_argument("--batch-size", type=int, default=32, help="encode 批大小")
+    args = parser.parse_args()
+
+    df_news = pd.read_csv(args.news, names=NEWS_COLUMNS, sep='\t', header=None, nrows=args.texts)
+    texts = df_news['title'].fillna('').astype(str).tolist()
+    result = compare_backends(config.EMBEDDING_MODEL, args.backend, texts, config.EMBEDDING_ONNX_DIR, args.batch_size)
+    print(f"\n📊 嵌入后端检查 | 后端: {result['backend']} | 文本数: {result['texts']}")
+    print(f"  余弦一致性:  均值 {result['cosine_mean']} | 最小 {result['cosine_min']} | P1 {result['cosine_p01']}")
+    print(f"  参考后端:    {result['reference_texts_per_second']} 文本/秒")
+    print(f"  {args.backend:<12} {result['backend_texts_per_second']} 文本/秒 | 加速 {result['speedup']}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+嵌入向量缓存模块
+职责：为 DeepSeekGPT.get_embeddings 提供两级缓存，重复查询和重复入库时跳过模型推理
+- 一级：进程内 LRU
+- 二级：磁盘存储（内存映射的 float32 矩阵 + 哈希索引），跨进程/重启复用；
+  多个进程可同时写入同一目录：追加在文件锁内进行，行号取自文件实际长度，其他进程追加的键按需读入
+缓存键由模型标识 + 规范化后的文本计算，换模型不会命中旧向量
+"""
+
+import os
+import hashlib
+import contextlib
+import threading
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from loguru import logger
+from typing import List, Dict, Any, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有 flock，只能单进程写入
+    fcntl = None
+
+
+class EmbeddingCache:
+    """两级嵌入向量缓存（磁盘部分可由多个进程共享读写）"""
+
+    VECTORS_FILE = "vectors.f32"
+    KEYS_FILE = "keys.txt"
+    LOCK_FILE = "append.lock"
+
+    def __init__(
+        self,
+        model_id: str,
+        dims: int,
+        cache_dir: Optional[str] = None,
+        max_memory_items: int = 10000
+    ):
+        """
+        :param model_id: 模型标识（模型路径/名称 + 推理后端等），参与缓存键计算
+        :param dims: 向量维度
+        :param cache_dir: 磁盘缓存根目录，为空时只使用进程内缓存
+        :param max_memory_items: 进程内 LRU 的最大条数
+        """
+        self.model_id = model_id
+        self.dims = dims
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._disk_dir = None
+        self._disk_index: Dict[str, int] = {}
+        self._disk_rows = 0  # 已读入的键文件行数（即磁盘向量的行数）
+        self._keys_offset = 0  # 键文件已读入的字节数
+        self._matrix: Optional[np.memmap] = None
+        if cache_dir:
+            model_hash = hashlib.sha1(model_id.encode("utf-8")).hexdigest()[:12]
+            self._disk_dir = os.path.join(cache_dir, f"{model_hash}_{dims}")
+            self._open_disk()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """文本规范化：NFKC + 折叠空白"""
+        return " ".join(unicodedata.normalize("NFKC", text).split())
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_id}\n{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """批量查询，未命中的位置为 None"""
+        keys = [self.key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = []
+        reloaded = not self._disk_dir
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                else:
+                    vector = self._read_disk(key)
+                    if vector is None and not reloaded:
+                        # 每批最多检查一次其他进程追加的键
+                        reloaded = True
+                        if self._load_new_keys():
+                            vector = self._read_disk(key)
+                    if vector is not None:
+                        self.disk_hits += 1
+                        self._remember(key, vector)
+                    else:
+                        self.misses += 1
+                results.append(vector)
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Any):
+        """批量写入（同时写入进程内缓存与磁盘）"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.size != len(texts) * self.dims:
+            raise ValueError(f"嵌入维度与缓存不一致: 缓存 {self.dims} 维，写入 {vectors.shape}（检查 EMBEDDING_DIMS 与模型是否匹配）")
+        vectors = vectors.reshape(len(texts), self.dims)
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            new_rows = []
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+                if self._disk_dir and key not in self._disk_index:
+                    self._disk_index[key] = -1  # 占位，避免同批次重复写入
+                    new_rows.append((key, vector))
+            if new_rows:
+                self._append_disk(new_rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中/未命中计数"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "disk_items": len(self._disk_index),
+        }
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._disk_dir, name)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """进程间互斥（flock）：追加与截断都在锁内进行，行号才与文件内容一致"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(self.LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _open_disk(self):
+        os.makedirs(self._disk_dir, exist_ok=True)
+        vectors_path = self._path(self.VECTORS_FILE)
+        keys_path = self._path(self.KEYS_FILE)
+        row_bytes = self.dims * 4
+
+        with self._file_lock():
+            keys: List[str] = []
+            if os.path.exists(keys_path):
+                with open(keys_path, "r", encoding="ascii") as f:
+                    keys = [line.strip() for line in f if line.strip()]
+            vector_rows = os.path.getsize(vectors_path) // row_bytes if os.path.exists(vectors_path) else 0
+
+            # 上次写入中断时两个文件可能不一致，截断到共同的行数
+            rows = min(len(keys), vector_rows)
+            if rows != len(keys) or rows != vector_rows:
+                logger.warning(f"嵌入缓存文件不一致，截断到 {rows} 行: {self._disk_dir}")
+                with open(keys_path, "w", encoding="ascii") as f:
+                    f.writelines(f"{key}\n" for key in keys[:rows])
+                with open(vectors_path, "ab") as f:
+                    f.truncate(rows * row_bytes)
+            self._disk_index = {}
+            self._disk_rows = self._keys_offset = 0
+            self._load_new_keys()
+        self._map_vectors(self._disk_rows)
+        logger.info(f"嵌入缓存已加载 | 条数: {self._disk_rows} | 目录: {self._disk_dir}")
+
+    def _load_new_keys(self) -> bool:
+        """读入键文件中尚未读入的完整行（其他进程追加的键）；向量先于键写入，读到的键对应的向量一定已在文件中"""
+        keys_path = self._path(self.KEYS_FILE)
+        try:
+            if os.path.getsize(keys_path) <= self._keys_offset:
+                return False
+        except OSError:
+            return False
+        with open(keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            self._disk_index[line.decode("ascii").strip()] = self._disk_rows
+            self._disk_rows += 1
+        self._keys_offset += len(complete)
+        return bool(complete)
+
+    def _map_vectors(self, rows: int):
+        self._matrix = (
+            np.memmap(self._path(self.VECTORS_FILE), dtype=np.float32, mode="r", shape=(rows, self.dims))
+            if rows else None
+        )
+
+    def _read_disk(self, key: str) -> Optional[np.ndarray]:
+        row = self._disk_index.get(key)
+        if row is None or row < 0:
+            return None
+        if self._matrix is None or row >= self._matrix.shape[0]:
+            self._map_vectors(self._disk_rows)
+        return np.array(self._matrix[row])
+
+    def _append_disk(self, new_rows):
+        vectors_path = self._path(self.VECTORS_FILE)
+        row_bytes = self.dims * 4
+        with self._file_lock():
+            # 先读入其他进程追加的键：它们已写入的向量不再重复写
+            self._load_new_keys()
+            new_rows = [(key, vector) for key, vector in new_rows if self._disk_index.get(key, -1) < 0]
+            if not new_rows:
+                return
+            # 行号取自向量文件的实际长度；中断留下的无键尾部向量先截掉
+            if os.path.exists(vectors_path) and os.path.getsize(vectors_path) > self._disk_rows * row_bytes:
+                with open(vectors_path, "ab") as f:
+                    f.truncate(self._disk_rows * row_bytes)
+            # 先写向量再写键：中断时只会留下无键的尾部向量，下次追加或重新打开时被截断
+            with open(vectors_path, "ab") as f:
+                f.write(np.stack([vector for _, vector in new_rows]).astype(np.float32).tobytes())
+            with open(self._path(self.KEYS_FILE), "a", encoding="ascii") as f:
+                f.writelines(f"{key}\n" for key, _ in new_rows)
+            self._load_new_keys()
@@ -0,0 +1,123 @@
+"""
+多进程嵌入引擎模块
+职责：在 CPU 上为大规模语料（入库）计算嵌入向量，充分利用多核
+- 与 DeepSeekGPT.get_embeddings 的约定一致：输入文本列表，按原顺序返回向量列表，并共用两级嵌入缓存
+- 未命中缓存的文本按长度排序后切分为若干分片，相近长度的文本在同一批次中编码，减少填充浪费
+- 分片由进程池中的多个工作进程并行编码（每个进程各自加载一份模型，并限制 torch 线程数避免超额订阅），结果按原顺序拼回
+- 多进程时主进程只读写嵌入缓存，不加载模型，常驻内存中只有工作进程的 N 份模型
+"""
+
+import os
+import math
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+from typing import List, Optional, Sequence, Union
+
+# 工作进程内的模型实例（由进程池初始化函数加载）
+_worker_model = None
+
+
+def _init_worker(model_path: str, backend: str, onnx_dir: str, threads: int):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(max(1, threads))
+    except ImportError:
+        pass
+    from embedding_backend import load_embedding_model
+    _worker_model = load_embedding_model(model_path, backend, onnx_dir, device="cpu")
+
+
+def _encode_shard(texts: List[str], batch_size: int) -> np.ndarray:
+    return np.asarray(_worker_model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+
+class EmbeddingEngine:
+    """多进程嵌入引擎（num_workers <= 1 时直接调用 get_embeddings）"""
+
+    def __init__(
+        self,
+        gpt,
+        num_workers: Optional[int] = None,
+        batch_size: int = 32,
+        shard_size: Optional[int] = None,
+        start_method: str = "spawn"
+    ):
+        """
+        :param gpt: DeepSeekGPT 实例（提供模型路径、嵌入缓存与单进程编码；多进程时不使用其模型）
+        :param num_workers: 工作进程数，默认使用全部 CPU 核
+        :param batch_size: 每个工作进程内 encode 的批大小
+        :param shard_size: 每个分片的文本数，默认按工作进程数自动切分
+        :param start_method: 进程启动方式（spawn 避免在已加载 torch 的进程中 fork）
+        """
+        self.gpt = gpt
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.shard_size = shard_size
+        self.start_method = start_method
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def encode(self, texts: Union[str, Sequence[str]]) -> List[List[float]]:
+        """计算嵌入向量，按输入顺序返回"""
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = list(texts)
+        if self.num_workers <= 1:
+            return self.gpt.get_embeddings(texts)
+
+        cache = self.gpt.embedding_cache
+        vectors = cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = self._encode_parallel(missing)
+            cache.put_many(missing, encoded)
+            by_text = dict(zip(missing, encoded))
+            vectors = [by_text[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return np.asarray(vectors, dtype=np.float32).tolist() if vectors else []
+
+    def _encode_parallel(self, texts: List[str]) -> np.ndarray:
+        """按长度排序、切分分片并行编码，再按原顺序拼回"""
+        order = np.argsort([len(text) for text in texts], kind="stable")
+        shard_size = self.shard_size or max(1, math.ceil(len(texts) / (self.num_workers * 4)))
+        shards = [order[i:i + shard_size] for i in range(0, len(order), shard_size)]
+
+        pool = self._get_pool()
+        futures = [pool.submit(_encode_shard, [texts[i] for i in shard], self.batch_size) for shard in shards]
+        result: Optional[np.ndarray] = None
+        for shard, future in zip(shards, futures):
+            encoded = future.result()
+            if result is None:
+                result = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            result[shard] = encoded
+        return result
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+            logger.info(f"启动嵌入工作进程 | 进程数: {self.num_workers} | 每进程线程数: {threads}")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+                initargs=(
+                    self.gpt.config.EMBEDDING_MODEL,
+                    self.gpt.config.EMBEDDING_BACKEND,
+                    self.gpt.config.EMBEDDING_ONNX_DIR,
+                    threads
+                )
+            )
+        return self._pool
+
+    def close(self):
+        """关闭工作进程"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
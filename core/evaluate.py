@@ -0,0 +1,335 @@
+"""
+离线评估模块
+职责：用 MIND 验证集（MINDsmall_dev）的曝光记录回放推荐链路的召回与排序阶段，给出质量指标与分阶段延迟，
+结果输出为 JSON，可与基线报告比较作为质量 / 性能回归门禁（不访问网络，大模型使用模拟响应或只读响应缓存）
+- 质量：排序阶段对每条曝光的全部候选排序，按曝光计算 AUC / MRR / nDCG@5 / nDCG@10（与 MIND 官方评测一致）；
+  召回阶段给出曝光中被点击的新闻出现在候选集合中的比例（retrieval_recall），以及各候选来源的命中数与召回覆盖率
+- 延迟：load（加载数据与共享索引，只计一次）、profile（点击历史与用户画像）、retrieve（多来源候选生成）、
+  rank（对曝光候选排序）、hydrate（取回推荐结果的新闻详情），逐条曝光串行计时，给出 mean / p50 / p95
+- 热度先验、类别热门 / 新鲜候选池与共同点击近邻使用 --history 指定的行为数据（默认训练集），
+  避免验证集曝光标签泄漏到排序特征与候选中；共同点击近邻总是由 --history 现场构建，不使用 COCLICK_PATH 的离线表
+  （离线表可能由含验证集点击的行为数据构建）
+- 新闻向量来自当前 VECTOR_STORE，验证集新闻需已入库；--synthetic 时使用进程内 Qdrant 与随机向量
+
+用法:
+    python evaluate.py --dev MIND/MINDsmall_dev --max-impressions 2000
+    python evaluate.py --ranker ctr --baseline cache/eval_baseline.json   # 指标下降或延迟上升超出容忍度时退出码为 1
+    python evaluate.py --synthetic 5000 --ranker hybrid --llm-delay 0.01
+"""
+
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+from collections import Counter
+from loguru import logger
+from typing import Any, Dict, List, Optional, Sequence
+from config import Config
+from metrics import ImpressionMetrics
+from mind_io import parse_impressions
+from benchmark import percentile_ms, stub_llm
+from candidate_sources import parse_sources
+
+STAGES = ("load", "profile", "retrieve", "rank", "hydrate")
+# 每条曝光都会经过的阶段（load 只在开始时执行一次，不参与端到端延迟）
+REQUEST_STAGES = STAGES[1:]
+# 延迟比较的绝对下限（毫秒）：低于该差值的波动不视为回归
+LATENCY_FLOOR_MS = 1.0
+
+
+class StageTimer:
+    """按阶段收集耗时样本（秒）"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {name: [] for name in STAGES}
+        self.requests: List[float] = []
+
+    def record(self, name: str, seconds: float):
+        self.samples[name].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for name, samples in list(self.samples.items()) + [("end_to_end", self.requests)]:
+            if samples:
+                result[name] = {
+                    "mean_ms": round(float(np.mean(samples)) * 1000, 3),
+                    "p50_ms": percentile_ms(samples, 50),
+                    "p95_ms": percentile_ms(samples, 95),
+                    "calls": len(samples),
+                }
+        return result
+
+
+def use_offline_llm(gpt, mode: str = "stub", delay: float = 0.0) -> Dict[str, int]:
+    """
+    替换大模型调用，保证评估不访问网络，返回命中计数（评估结束后读取）
+    - stub:  全部使用固定的模拟响应（排序请求返回 1..N，画像请求返回固定画像）
+    - cache: 优先读取持久化响应缓存（只读，不写入），未命中时使用模拟响应
+    """
+    stub_llm(gpt, delay)
+    counts = {"cache_hits": 0, "stub_calls": 0}
+    stub_sync, stub_async = gpt.get_completion, gpt.get_completion_async
+
+    def cached(messages, model=None, max_tokens=2000, temperature=0.7) -> Optional[str]:
+        if mode != "cache" or gpt.completion_cache is None:
+            return None
+        key = gpt.completion_cache.make_key(
+            model or gpt.config.DEFAULT_MODEL, temperature, max_tokens, gpt._normalize_messages(messages)
+        )
+        return gpt.completion_cache.get(key)
+
+    def get_completion(messages, model=None, max_tokens=2000, temperature=0.7, **kwargs):
+        response = cached(messages, model, max_tokens, temperature)
+        if response is not None:
+            counts["cache_hits"] += 1
+            return response
+        counts["stub_calls"] += 1
+        return stub_sync(messages)
+
+    async def get_completion_async(messages, model=None, max_tokens=2000, temperature=0.7, **kwargs):
+        response = cached(messages, model, max_tokens, temperature)
+        if response is not None:
+            counts["cache_hits"] += 1
+            return response
+        counts["stub_calls"] += 1
+        return await stub_async(messages)
+
+    gpt.get_completion = get_completion
+    gpt.get_completion_async = get_completion_async
+    return counts
+
+
+def ranked_scores(impression_ids: Sequence[str], ranked_ids: Sequence[str]) -> np.ndarray:
+    """把排序结果转成与曝光候选一一对应的分数（排名越前分数越高；未返回的候选排在最后，保持曝光顺序）"""
+    n = len(impression_ids)
+    position = {news_id: i for i, news_id in enumerate(ranked_ids)}
+    return np.array([
+        -position.get(news_id, n + i) for i, news_id in enumerate(impression_ids)
+    ], dtype=np.float64)
+
+
+def evaluate(
+    recommender,
+    df_news: pd.DataFrame,
+    df_behaviors: pd.DataFrame,
+    df_history: pd.DataFrame,
+    max_impressions: int = 0,
+    top_n: int = 10,
+    timer: Optional[StageTimer] = None
+) -> Dict[str, Any]:
+    """
+    逐条回放曝光记录（串行，便于拆分各阶段耗时），返回 {metrics, retrieval, latency}
+    df_behaviors 为被评估的曝光记录，df_history 只用于新闻先验与本地候选来源
+    """
+    timer = timer or StageTimer()
+    metrics = ImpressionMetrics()
+    catalog = recommender.get_catalog(df_news)
+    limit = top_n * 3
+    retrieved_hits = retrieved_positives = empty_retrievals = 0
+    source_hits: Counter = Counter()
+    source_positives: Counter = Counter()
+
+    for user_id, impressions in zip(df_behaviors['user_id'], df_behaviors['impression_lpg']):
+        impression_ids, labels = parse_impressions(impressions)
+        labels = np.asarray(labels)
+        if not impression_ids or labels.min() < 0 or labels.sum() == 0:
+            continue
+
+        start = time.perf_counter()
+        click_history = recommender.get_click_history(df_behaviors, user_id)
+        user_profile = recommender.get_user_profile(df_news, user_id, click_history) if recommender._needs_profile() else None
+        profiled = time.perf_counter()
+
+        candidates = recommender.generate_candidates(df_news, df_history, click_history, limit=limit) if click_history else None
+        candidate_ids = candidates.ids if candidates else []
+        retrieved = time.perf_counter()
+
+        ranked_ids = recommender.rank_candidates(
+            df_news, df_history, click_history, user_profile, impression_ids, top_n=len(impression_ids)
+        )
+        ranked = time.perf_counter()
+
+        catalog.lookup(ranked_ids[:top_n])
+        hydrated = time.perf_counter()
+
+        for name, seconds in zip(REQUEST_STAGES, (profiled - start, retrieved - profiled, ranked - retrieved, hydrated - ranked)):
+            timer.record(name, seconds)
+        timer.requests.append(hydrated - start)
+
+        metrics.add(labels, ranked_scores(impression_ids, ranked_ids))
+        positives = {news_id for news_id, label in zip(impression_ids, labels) if label == 1}
+        retrieved_hits += len(positives.intersection(candidate_ids))
+        retrieved_positives += len(positives)
+        empty_retrievals += not candidate_ids
+        if candidates:
+            source_hits.update(candidates.hits)
+            for source, source_ids in candidates.by_source.items():
+                source_positives[source] += len(positives.intersection(source_ids))
+
+        if max_impressions and len(metrics) >= max_impressions:
+            break
+
+    return {
+        "metrics": metrics.summary(),
+        "retrieval": {
+            "limit": limit,
+            "retrieval_recall": round(retrieved_hits / retrieved_positives, 4) if retrieved_positives else float('nan'),
+            "empty": empty_retrievals,
+            "sources": {
+                source: {
+                    "hits": source_hits[source],
+                    "recall": round(source_positives[source] / retrieved_positives, 4) if retrieved_positives else float('nan'),
+                }
+                for source in source_hits
+            },
+        },
+        "latency": timer.summary(),
+    }
+
+
+def compare_reports(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    max_metric_drop: float = 0.005,
+    max_latency_increase: float = 0.2
+) -> List[str]:
+    """
+    与基线报告比较，返回回归项说明（空列表表示通过）
+    - 质量：任一指标比基线下降超过 max_metric_drop（绝对值）
+    - 延迟：任一阶段或端到端 p95 比基线增加超过 max_latency_increase（相对值）且超过 LATENCY_FLOOR_MS
+    """
+    failures = []
+    for name in ImpressionMetrics.NAMES:
+        current, previous = report["metrics"].get(name), baseline.get("metrics", {}).get(name)
+        if current is None or previous is None or np.isnan(current) or np.isnan(previous):
+            continue
+        if previous - current > max_metric_drop:
+            failures.append(f"{name}: {previous} → {current}")
+    for stage, stats in report["latency"].items():
+        previous = baseline.get("latency", {}).get(stage)
+        if stage == "load" or not previous:
+            continue
+        current_ms, previous_ms = stats["p95_ms"], previous["p95_ms"]
+        if current_ms > previous_ms * (1 + max_latency_increase) and current_ms - previous_ms > LATENCY_FLOOR_MS:
+            failures.append(f"{stage} p95: {previous_ms} ms → {current_ms} ms")
+    return failures
+
+
+def load_report(path: str) -> Optional[Dict[str, Any]]:
+    """读取评估报告，不存在或无法解析时返回 None"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def print_report(report: Dict[str, Any]):
+    meta, metrics, retrieval = report["meta"], report["metrics"], report["retrieval"]
+    print(
+        f"\n📊 离线评估 | 曝光数: {metrics['impressions']} | 排序: {meta['ranker']} | "
+        f"大模型: {meta['llm']} | top_n: {meta['top_n']}"
+    )
+    print(f"  {'AUC':>8} {'MRR':>8} {'nDCG@5':>8} {'nDCG@10':>8}")
+    print(f"  {metrics['auc']:>8} {metrics['mrr']:>8} {metrics['ndcg@5']:>8} {metrics['ndcg@10']:>8}")
+    print(f"  召回覆盖率（点击新闻出现在候选集合中）: {retrieval['retrieval_recall']} | 候选为空: {retrieval['empty']}")
+    for source, stats in retrieval["sources"].items():
+        print(f"    {source:<18} 命中: {stats['hits']:>8} | 召回覆盖率: {stats['recall']}")
+    print(f"  {'阶段':<12} {'mean':>10} {'p50':>10} {'p95':>10} {'次数':>8}")
+    for stage, stats in report["latency"].items():
+        print(f"  {stage:<12} {stats['mean_ms']:>10} {stats['p50_ms']:>10} {stats['p95_ms']:>10} {stats['calls']:>8}")
+
+
+def main():
+    import argparse
+    from utils import NewsRecommender
+
+    config = Config()
+    parser = argparse.ArgumentParser(description="用验证集曝光回放召回与排序阶段，输出质量指标与分阶段延迟")
+    parser.add_argument("--dev", default='MIND/MINDsmall_dev', help="验证集目录（含 news.tsv / behaviors.tsv）")
+    parser.add_argument("--history", default='MIND/MINDsmall_train/behaviors.tsv', help="用于热度 / 新鲜度先验的行为数据")
+    parser.add_argument("--synthetic", type=int, default=0, help="使用指定条数的合成数据与进程内 Qdrant（随机向量）")
+    parser.add_argument("--max-impressions", type=int, default=0, help="最多评估的曝光数（0 表示全部）")
+    parser.add_argument("--top-n", type=int, default=10, help="推荐条数（向量召回条数为 top_n * 3）")
+    parser.add_argument("--ranker", default=config.RANKER, help="排序方式: fast / ctr / hybrid / llm")
+    parser.add_argument("--llm", choices=["stub", "cache"], default="stub", help="大模型响应: 模拟响应 / 只读响应缓存（未命中时模拟）")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="模拟大模型响应的固定延迟（秒）")
+    parser.add_argument("--output", default=config.EVAL_REPORT_PATH, help="报告输出路径")
+    parser.add_argument("--baseline", default="", help="基线报告路径，出现回归时退出码为 1")
+    parser.add_argument("--max-metric-drop", type=float, default=0.005, help="允许的指标下降（绝对值）")
+    parser.add_argument("--max-latency-increase", type=float, default=0.2, help="允许的 p95 延迟增加（相对值）")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    config.RANKER = args.ranker
+    config.COCLICK_PATH = ""  # 共同点击近邻只由 --history 现场构建，离线表中可能含验证集点击
+    recommender = NewsRecommender(config)
+    recommender.profile_store = None  # 不读写持久化画像，每条曝光都经过画像生成
+    llm_counts = use_offline_llm(recommender.gpt, args.llm, args.llm_delay)
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    if args.synthetic:
+        from benchmark import make_synthetic_news, make_synthetic_behaviors, make_local_qdrant
+        df_news = make_synthetic_news(args.synthetic)
+        df_behaviors = make_synthetic_behaviors(args.synthetic, args.synthetic, seed=2)
+        df_history = make_synthetic_behaviors(args.synthetic, args.synthetic, seed=1)
+        recommender.qdrant = make_local_qdrant(config, df_news, recommender.news_collection, with_async=True)
+    else:
+        df_news = recommender.load_news_data(os.path.join(args.dev, 'news.tsv'))
+        df_behaviors = recommender.load_behaviors_data(os.path.join(args.dev, 'behaviors.tsv'))
+        df_history = recommender.load_behaviors_data(args.history) if os.path.exists(args.history) else df_behaviors
+        if df_history is df_behaviors:
+            logger.warning(f"未找到 {args.history}，热度先验改用验证集行为数据（含曝光标签，指标会偏高）")
+    recommender.get_catalog(df_news)
+    recommender.get_user_index(df_behaviors)
+    recommender.get_news_priors(df_history)
+    sources = parse_sources(config.CANDIDATE_SOURCES)
+    if "coclick" in sources:
+        recommender.get_coclick(df_history)
+    if "category_popular" in sources or "fresh" in sources:
+        recommender.get_news_pools(df_news, df_history)
+    timer.record("load", time.perf_counter() - start)
+
+    report = evaluate(recommender, df_news, df_behaviors, df_history, args.max_impressions, args.top_n, timer)
+    report = {
+        "meta": {
+            "dev": f"synthetic:{args.synthetic}" if args.synthetic else args.dev,
+            "ranker": args.ranker,
+            "vector_store": "synthetic" if args.synthetic else config.VECTOR_STORE,
+            "retrieval_mode": config.RETRIEVAL_MODE,
+            "candidate_query": config.CANDIDATE_QUERY,
+            "candidate_sources": config.CANDIDATE_SOURCES,
+            "top_n": args.top_n,
+            "llm": args.llm,
+            **llm_counts,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        **report,
+    }
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n报告已写入: {args.output}")
+
+    if args.baseline:
+        baseline = load_report(args.baseline)
+        if baseline is None:
+            print(f"\n❌ 无法读取基线报告: {args.baseline}")
+            sys.exit(2)
+        failures = compare_reports(report, baseline, args.max_metric_drop, args.max_latency_increase)
+        if failures:
+            print("\n❌ 相对基线出现回归:")
+            for failure in failures:
+                print(f"  - {failure}")
+            sys.exit(1)
+        print("\n✅ 未发现相对基线的回归")
+
+
+if __name__ == "__main__":
+    main()
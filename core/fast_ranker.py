@@ -0,0 +1,132 @@
+"""
+快速排序模块
+职责：不调用大模型的候选新闻排序，所有特征在候选矩阵上用 NumPy 向量化计算
+- similarity:   候选新闻向量与用户向量（按时间衰减加权的点击向量均值）的余弦相似度
+- category / sub_category: 用户点击历史中该类别 / 子类别所占的比例
+- popularity:   曝光日志中的点击数（对数归一化到 [0, 1]）
+- recency:      新闻最后一次被曝光的时间距日志最新时间的指数衰减（新闻数据本身没有发布时间）
+排序分数为各特征的加权和（权重见 Config.RANK_WEIGHT_*），大模型重排可选，只作用于前若干条
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from collections import Counter
+from dataclasses import dataclass
+from loguru import logger
+from typing import Dict, List, Sequence, Tuple
+from config import Config
+
+RANK_FEATURES = ("similarity", "category", "sub_category", "popularity", "recency")
+BEHAVIORS_TIME_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+
+@dataclass
+class NewsPriors:
+    """与用户无关的新闻先验：热度与新鲜度（按 news_id 查找，未出现在曝光日志中的新闻为 0）"""
+    index: Dict[str, int]
+    popularity: np.ndarray
+    recency: np.ndarray
+
+    def lookup(self, news_ids: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        get = self.index.get
+        pos = np.fromiter((get(news_id, -1) for news_id in news_ids), dtype=np.int64, count=len(news_ids))
+        found = pos >= 0
+        popularity = np.zeros(len(pos), dtype=np.float32)
+        recency = np.zeros(len(pos), dtype=np.float32)
+        popularity[found] = self.popularity[pos[found]]
+        recency[found] = self.recency[pos[found]]
+        return popularity, recency
+
+
+def build_news_priors(df_behaviors: pd.DataFrame, half_life_hours: float = 24.0) -> NewsPriors:
+    """由曝光日志统计每条新闻的点击数与最后曝光时间（每份行为数据只需计算一次）"""
+    start = time.perf_counter()
+    tokens = df_behaviors['impression_lpg'].fillna('').astype(str).str.split()
+    times = pd.to_datetime(df_behaviors['time'], format=BEHAVIORS_TIME_FORMAT, errors='coerce')
+    exploded = pd.DataFrame({'token': tokens, 'time': times}).explode('token').dropna(subset=['token'])
+    exploded['news_id'] = exploded['token'].str.rsplit('-', n=1).str[0]
+    exploded['clicked'] = exploded['token'].str.endswith('-1')
+
+    grouped = exploded.groupby('news_id', sort=False).agg(clicks=('clicked', 'sum'), last_seen=('time', 'max'))
+    clicks = grouped['clicks'].to_numpy(dtype=np.float64)
+    popularity = np.log1p(clicks) / max(np.log1p(clicks.max()) if len(clicks) else 0.0, 1e-12)
+
+    age_hours = (grouped['last_seen'].max() - grouped['last_seen']).dt.total_seconds().to_numpy() / 3600
+    recency = np.nan_to_num(0.5 ** (age_hours / max(half_life_hours, 1e-6)), nan=0.0)
+
+    logger.info(f"新闻先验统计完成 | 新闻数: {len(grouped)} | 耗时: {time.perf_counter() - start:.2f}s")
+    return NewsPriors(
+        index={news_id: i for i, news_id in enumerate(grouped.index)},
+        popularity=popularity.astype(np.float32),
+        recency=recency.astype(np.float32)
+    )
+
+
+def category_shares(category_counts: Counter) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """由 (category, sub_category) 计数得到类别与子类别在点击历史中的占比"""
+    total = sum(category_counts.values())
+    categories: Dict[str, float] = {}
+    sub_categories: Dict[str, float] = {}
+    for (category, sub_category), count in category_counts.items():
+        categories[category] = categories.get(category, 0.0) + count / total
+        sub_categories[sub_category] = sub_categories.get(sub_category, 0.0) + count / total
+    return categories, sub_categories
+
+
+def candidate_features(
+    user_vector: np.ndarray,
+    candidate_vectors: np.ndarray,
+    candidate_categories: np.ndarray,
+    candidate_sub_categories: np.ndarray,
+    category_counts: Counter,
+    popularity: np.ndarray,
+    recency: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    计算候选新闻的排序特征，每个特征是与候选一一对应的数组
+    candidate_vectors 为 L2 归一化的候选向量矩阵（没有向量的候选为全零行，相似度为 0）
+    """
+    similarity = candidate_vectors @ user_vector if len(user_vector) else np.zeros(len(candidate_vectors))
+    categories, sub_categories = category_shares(category_counts) if category_counts else ({}, {})
+    return {
+        "similarity": np.asarray(similarity, dtype=np.float32),
+        "category": np.array([categories.get(c, 0.0) for c in candidate_categories], dtype=np.float32),
+        "sub_category": np.array([sub_categories.get(s, 0.0) for s in candidate_sub_categories], dtype=np.float32),
+        "popularity": np.asarray(popularity, dtype=np.float32),
+        "recency": np.asarray(recency, dtype=np.float32),
+    }
+
+
+class FastRanker:
+    """加权线性打分排序器"""
+
+    def __init__(self, weights: Dict[str, float]):
+        unknown = set(weights) - set(RANK_FEATURES)
+        if unknown:
+            raise ValueError(f"未知的排序特征: {sorted(unknown)}，可选: {', '.join(RANK_FEATURES)}")
+        self.weights = {name: float(weights.get(name, 0.0)) for name in RANK_FEATURES}
+
+    @classmethod
+    def from_config(cls, config: Config) -> "FastRanker":
+        return cls({
+            "similarity": config.RANK_WEIGHT_SIMILARITY,
+            "category": config.RANK_WEIGHT_CATEGORY,
+            "sub_category": config.RANK_WEIGHT_SUB_CATEGORY,
+            "popularity": config.RANK_WEIGHT_POPULARITY,
+            "recency": config.RANK_WEIGHT_RECENCY,
+        })
+
+    def score(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """各特征的加权和"""
+        scores = None
+        for name, weight in self.weights.items():
+            if weight:
+                term = weight * features[name]
+                scores = term if scores is None else scores + term
+        return scores if scores is not None else np.zeros(len(features["similarity"]), dtype=np.float32)
+
+    def rank(self, candidate_ids: Sequence[str], scores: np.ndarray) -> List[str]:
+        """按分数从高到低排列候选新闻（分数相同时保持召回顺序）"""
+        order = np.argsort(-scores, kind="stable")
+        return [candidate_ids[i] for i in order]
@@ -0,0 +1,244 @@
+"""
+流水线入库模块
+职责：为新闻入库提供分阶段并行的流水线与断点续传
+- 各阶段（读取、预处理、嵌入、写入）各占一个线程，阶段之间用有界队列连接，
+  模型编码第 N+1 批时第 N 批正在写入，内存中最多只有 queue_size 个批次
+- 写入阶段每提交一批就更新检查点文件，进程中断后重新运行从最后提交的位置继续
+- 记录每个阶段的批次数、行数、忙碌时间和吞吐
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+from dataclasses import dataclass
+from loguru import logger
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+
+@dataclass
+class StageStats:
+    """单个阶段的统计"""
+    name: str
+    batches: int = 0
+    rows: int = 0
+    busy_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.busy_seconds if self.busy_seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+_END = object()
+
+
+class _Stop(Exception):
+    """其他阶段出错，当前阶段提前退出"""
+
+
+def run_pipeline(
+    source: Iterable[Any],
+    stages: Sequence[Tuple[str, Callable[[Any], Any]]],
+    queue_size: int = 2,
+    source_name: str = "read",
+    count_rows: Callable[[Any], int] = len
+) -> Dict[str, StageStats]:
+    """
+    以有界队列连接的多线程流水线处理 source 中的批次
+    :param source: 批次迭代器（在独立线程中迭代，作为第一个阶段）
+    :param stages: (阶段名, 处理函数) 列表，处理函数的返回值传给下一阶段，返回 None 表示丢弃该批次
+    :param queue_size: 阶段之间队列的容量
+    :param count_rows: 统计批次行数的函数
+    :return: 各阶段统计（按阶段顺序）
+    """
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    stats = {name: StageStats(name) for name in [source_name] + [name for name, _ in stages]}
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in stages]
+
+    def put(q: queue.Queue, item: Any):
+        while True:
+            if stop.is_set():
+                raise _Stop()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(q: queue.Queue) -> Any:
+        while True:
+            if stop.is_set():
+                raise _Stop()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def fail(exc: BaseException):
+        errors.append(exc)
+        stop.set()
+
+    def read():
+        stat = stats[source_name]
+        try:
+            iterator = iter(source)
+            while True:
+                start = time.perf_counter()
+                item = next(iterator, _END)
+                if item is _END:
+                    break
+                stat.busy_seconds += time.perf_counter() - start
+                stat.batches += 1
+                stat.rows += count_rows(item)
+                put(queues[0], item)
+            put(queues[0], _END)
+        except _Stop:
+            pass
+        except BaseException as e:
+            fail(e)
+
+    def work(index: int, name: str, func: Callable[[Any], Any]):
+        stat = stats[name]
+        out = queues[index + 1] if index + 1 < len(queues) else None
+        try:
+            while True:
+                item = get(queues[index])
+                if item is _END:
+                    break
+                start = time.perf_counter()
+                rows = count_rows(item)
+                result = func(item)
+                stat.busy_seconds += time.perf_counter() - start
+                stat.batches += 1
+                stat.rows += rows
+                if out is not None and result is not None:
+                    put(out, result)
+            if out is not None:
+                put(out, _END)
+        except _Stop:
+            pass
+        except BaseException as e:
+            fail(e)
+
+    threads = [threading.Thread(target=read, name=f"ingest-{source_name}", daemon=True)]
+    threads += [
+        threading.Thread(target=work, args=(i, name, func), name=f"ingest-{name}", daemon=True)
+        for i, (name, func) in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        raise
+
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def log_stage_stats(stats: Dict[str, StageStats], wall_seconds: float):
+    """输出各阶段吞吐；忙碌时间之和明显大于总耗时说明阶段之间确实重叠"""
+    for stat in stats.values():
+        logger.info(
+            f"阶段 {stat.name:<10} | 批次: {stat.batches} | 行数: {stat.rows} | "
+            f"忙碌: {stat.busy_seconds:.2f}s | 吞吐: {stat.rows_per_second:.1f} 行/秒"
+        )
+    total_busy = sum(stat.busy_seconds for stat in stats.values())
+    logger.info(f"流水线总耗时: {wall_seconds:.2f}s | 各阶段忙碌时间之和: {total_busy:.2f}s")
+
+
+class IngestManifest:
+    """入库清单：记录集合中每条新闻的内容哈希（news_id -> content_hash），增量入库时与新文件比对"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> Dict[str, str]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"入库清单损坏，忽略: {self.path}")
+            return {}
+
+    def save(self, hashes: Dict[str, str]):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(hashes, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+
+class IngestCheckpoint:
+    """入库检查点：记录某个源文件写入某个集合时最后提交的行偏移（原子写入）"""
+
+    def __init__(self, path: str, source_path: str, collection_name: str):
+        self.path = path
+        self.source_path = os.path.abspath(source_path)
+        self.collection_name = collection_name
+
+    def _signature(self) -> Dict[str, Any]:
+        stat = os.stat(self.source_path)
+        return {
+            "source": self.source_path,
+            "source_mtime": stat.st_mtime,
+            "source_size": stat.st_size,
+            "collection": self.collection_name,
+        }
+
+    def load_offset(self) -> int:
+        """返回可续传的行偏移；检查点不存在或源文件/集合已变化时返回 0"""
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"检查点文件损坏，忽略: {self.path}")
+            return 0
+        signature = self._signature()
+        if any(state.get(key) != value for key, value in signature.items()):
+            logger.info("源文件或集合与检查点不一致，从头开始入库")
+            return 0
+        return int(state.get("offset", 0))
+
+    def is_pending(self) -> bool:
+        """存在未完成的入库（检查点存在且未标记完成）"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return not json.load(f).get("completed", False)
+        except (OSError, ValueError):
+            return False
+
+    def save(self, offset: int, completed: bool = False):
+        state = dict(self._signature(), offset=offset, completed=completed, updated_at=time.time())
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
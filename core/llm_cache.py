@@ -0,0 +1,144 @@
+"""
+大模型响应缓存模块
+职责：为 DeepSeekGPT.get_completion 提供跨进程、跨会话的持久化响应缓存（SQLite）
+- 缓存键：(模型, temperature, max_tokens, 消息内容) 的哈希
+- 支持 TTL 过期与按条数的 LRU 淘汰
+- 记录命中/未命中、节省的延迟与 token，便于观察 API 花费和 p95 延迟的变化
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from loguru import logger
+from typing import List, Dict, Any, Optional
+
+
+class CompletionCache:
+    """基于 SQLite 的对话补全缓存"""
+
+    def __init__(self, db_path: str, ttl_seconds: int = 7 * 24 * 3600, max_entries: int = 50000):
+        """
+        :param db_path: SQLite 文件路径
+        :param ttl_seconds: 缓存有效期（秒），<=0 表示永不过期
+        :param max_entries: 最大缓存条数，超出后淘汰最久未访问的条目
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+        self.tokens_saved = 0
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                latency REAL NOT NULL,
+                total_tokens INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_created_at ON completions(created_at)")
+        self._conn.commit()
+        # 条数的估计值：写入时累加，超出上限时才做一次精确计数（同键覆盖与其他进程的写入都会让估计值偏离）
+        self._count = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, temperature: float, max_tokens: int, messages: List[dict]) -> str:
+        payload = json.dumps(
+            {"model": model, "temperature": temperature, "max_tokens": max_tokens, "messages": messages},
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, latency, total_tokens, created_at FROM completions WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None or self._expired(row[3], now):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE completions SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            self.latency_saved += row[1]
+            self.tokens_saved += row[2]
+            return row[0]
+
+    def put(self, key: str, model: str, response: str, latency: float, total_tokens: int = 0):
+        """写入缓存，并在超出容量时淘汰最久未访问的条目"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, model, response, latency, total_tokens, created_at, last_access, hit_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, model, response, latency, total_tokens, now, now)
+            )
+            self._count += 1
+            self._evict(now)
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回本进程的命中统计，以及缓存文件中累计的命中次数与节省量"""
+        with self._lock:
+            entries, total_hits, total_latency_saved, total_tokens_saved = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hit_count), 0), "
+                "COALESCE(SUM(hit_count * latency), 0), COALESCE(SUM(hit_count * total_tokens), 0) "
+                "FROM completions"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "latency_saved_seconds": round(self.latency_saved, 3),
+            "tokens_saved": self.tokens_saved,
+            "entries": entries,
+            "total_hits": total_hits,
+            "total_latency_saved_seconds": round(total_latency_saved, 3),
+            "total_tokens_saved": total_tokens_saved,
+        }
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and created_at + self.ttl_seconds < now
+
+    def _evict(self, now: float):
+        """过期条目按 created_at 索引删除；条数估计值超出上限时才精确计数并淘汰最久未访问的条目"""
+        if self.ttl_seconds > 0:
+            expired = self._conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._count -= max(expired.rowcount, 0)
+        if self._count <= self.max_entries:
+            return
+        self._count = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        if self._count > self.max_entries:
+            removed = self._count - self.max_entries
+            self._conn.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY last_access ASC LIMIT ?)",
+                (removed,)
+            )
+            self._count = self.max_entries
+            logger.debug(f"响应缓存淘汰 {removed} 条")
@@ -0,0 +1,695 @@
+"""
+本地向量索引模块
+职责：不依赖 Qdrant 服务的进程内向量存储，供单机部署与离线基准使用
+- 每个集合是一个归一化 float32 矩阵（磁盘上为 vectors.f32，内存映射读取）加 payload 列表，
+  余弦相似度即点积，打分与 Qdrant COSINE 集合一致
+- 精确检索：分块矩阵乘 + argpartition 维护 top-k，多个查询一次矩阵乘完成；
+  过滤后剩余的行很少时只对这些行打分
+- 近似检索（LOCAL_INDEX_MODE）：ivf 为 NumPy 实现的倒排聚类（球面 k-means，探查 nprobe 个簇），
+  hnsw 使用 hnswlib（可选依赖）；点数低于 full_scan_threshold 或过滤后结果不足时回退精确检索
+- 过滤条件直接解释 qdrant_client 的 Filter 模型（must / should / must_not，MatchValue / MatchAny / MatchExcept / Range、
+  HasIdCondition、IsEmptyCondition），payload 字段按需建立 值 -> 行号 的倒排索引
+- 写入追加到 points.jsonl 日志（同一ID覆盖、删除记为墓碑），重新打开时回放日志恢复；
+  同一目录同时只允许一个写入进程（首次写入时获取 writer.lock，其他进程写入立即报错），
+  只读的进程在日志增长时回放新增的记录，看到写入进程追加的点
+"""
+
+import os
+import json
+import threading
+import numpy as np
+from loguru import logger
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from qdrant_client.http import models
+from config import Config
+from vector_store import VectorStore, PointId, per_query_filters
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有 flock，无法检测并发写入
+    fcntl = None
+
+MODES = ("exact", "ivf", "hnsw")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _merge_topk(scores: np.ndarray, rows: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """每个查询保留得分最高的 limit 个（不排序）；scores、rows 形状均为 (查询数, 候选数)"""
+    if scores.shape[1] <= limit:
+        return scores, rows
+    top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+    return np.take_along_axis(scores, top, axis=1), np.take_along_axis(rows, top, axis=1)
+
+
+def exact_topk(
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    limit: int,
+    mask: Optional[np.ndarray] = None,
+    block_rows: int = 65536
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    分块矩阵乘精确 top-k
+    :param matrix: (n, d) 归一化向量（可为 memmap，按块读入）
+    :param queries: (q, d) 归一化查询
+    :param mask: (n,) 允许返回的行，None 表示全部
+    :return: (scores, rows)，形状 (q, k)，每行按得分降序；不足 k 个的位置得分为 -inf、行号为 -1
+    """
+    n = len(matrix)
+    num_queries = len(queries)
+    best_scores = np.full((num_queries, 0), -np.inf, dtype=np.float32)
+    best_rows = np.full((num_queries, 0), -1, dtype=np.int64)
+    if limit <= 0 or n == 0:
+        return best_scores, best_rows
+
+    # 过滤后只剩少量行：直接对这些行打分，不扫描整个矩阵
+    candidates = np.flatnonzero(mask) if mask is not None and np.count_nonzero(mask) < n // 8 else None
+    total = n if candidates is None else len(candidates)
+    for start in range(0, total, block_rows):
+        end = min(start + block_rows, total)
+        if candidates is not None:
+            block = candidates[start:end]
+            scores = queries @ np.asarray(matrix[block]).T
+        else:
+            block = np.arange(start, end)
+            scores = queries @ np.asarray(matrix[start:end]).T
+            if mask is not None:
+                scores[:, ~mask[start:end]] = -np.inf
+        rows = np.broadcast_to(block, scores.shape)
+        scores, rows = _merge_topk(scores, rows, limit)
+        best_scores, best_rows = _merge_topk(
+            np.concatenate([best_scores, scores], axis=1), np.concatenate([best_rows, rows], axis=1), limit
+        )
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best_rows = np.take_along_axis(best_rows, order, axis=1)
+    best_rows[~np.isfinite(best_scores)] = -1
+    return best_scores, best_rows
+
+
+class IVFIndex:
+    """倒排聚类索引：球面 k-means 聚类中心 + 按簇排列的行号（CSR 形式）"""
+
+    def __init__(self, matrix: np.ndarray, nlist: int, nprobe: int, seed: int = 0, iterations: int = 10):
+        n = len(matrix)
+        self.nlist = max(1, min(nlist or int(np.sqrt(n)), n))
+        self.nprobe = max(1, min(nprobe, self.nlist))
+        rng = np.random.default_rng(seed)
+
+        # 在样本上训练聚类中心
+        sample = np.sort(rng.choice(n, size=min(n, self.nlist * 64), replace=False))
+        data = np.asarray(matrix[sample])
+        centroids = data[rng.choice(len(data), size=self.nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            empty = np.bincount(assign, minlength=self.nlist) == 0
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+            centroids = _normalize(sums)
+        self.centroids = centroids
+
+        # 全量分配（分块，避免一次性生成 n × nlist 的得分矩阵）
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 65536):
+            block = np.asarray(matrix[start:start + 65536])
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        self.rows = np.argsort(assign, kind="stable")
+        self.offsets = np.searchsorted(assign[self.rows], np.arange(self.nlist + 1))
+
+    def search(
+        self, matrix: np.ndarray, queries: np.ndarray, limit: int, mask: Optional[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        probes = np.argpartition(-(queries @ self.centroids.T), self.nprobe - 1, axis=1)[:, :self.nprobe]
+        results = []
+        for query, clusters in zip(queries, probes):
+            rows = np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in clusters])
+            if mask is not None:
+                rows = rows[mask[rows]]
+            rows = np.sort(rows)
+            scores = np.asarray(matrix[rows]) @ query
+            top = np.argsort(-scores, kind="stable")[:limit]
+            results.append((scores[top], rows[top]))
+        return results
+
+
+class HNSWIndex:
+    """基于 hnswlib 的图索引（内积空间，向量已归一化即余弦）"""
+
+    def __init__(self, matrix: np.ndarray, m: int, ef: int, ef_construction: int = 200):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("LOCAL_INDEX_MODE=hnsw 需要安装 hnswlib") from e
+        n, dims = matrix.shape
+        self.index = hnswlib.Index(space="ip", dim=dims)
+        self.index.init_index(max_elements=n, ef_construction=ef_construction, M=m)
+        for start in range(0, n, 65536):
+            block = np.asarray(matrix[start:start + 65536])
+            self.index.add_items(block, np.arange(start, start + len(block)))
+        self.ef = ef
+        self.size = n
+
+    def search(
+        self, matrix: np.ndarray, queries: np.ndarray, limit: int, mask: Optional[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        # 过滤与已删除的行在召回后剔除，因此多取一些
+        k = min(self.size, limit if mask is None else max(limit * 4, limit + 64))
+        self.index.set_ef(max(self.ef, k))
+        labels, distances = self.index.knn_query(queries, k=k)
+        results = []
+        for rows, distance in zip(labels.astype(np.int64), distances):
+            scores = 1.0 - distance  # hnswlib 的 ip 距离为 1 - 内积
+            if mask is not None:
+                keep = mask[rows]
+                rows, scores = rows[keep], scores[keep]
+            results.append((scores[:limit].astype(np.float32), rows[:limit]))
+        return results
+
+
+class LocalCollection:
+    """单个集合的数据：归一化向量矩阵、点ID、payload、存活标记，以及 payload 倒排索引与近似索引缓存"""
+
+    VECTORS_FILE = "vectors.f32"
+    POINTS_FILE = "points.jsonl"
+    META_FILE = "meta.json"
+    WRITER_LOCK_FILE = "writer.lock"
+
+    def __init__(self, name: str, dims: int, directory: Optional[str] = None):
+        self.name = name
+        self.dims = dims
+        self.directory = directory
+        self.ids: List[PointId] = []
+        self.payloads: List[Dict[str, Any]] = []
+        self.row_of: Dict[PointId, int] = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.version = 0  # 每次新增行递增，近似索引据此判断是否需要重建
+        self._buffer = np.zeros((0, dims), dtype=np.float32)  # 内存模式的向量（按容量倍增）
+        self._mmap: Optional[np.memmap] = None
+        self._field_index: Dict[str, Tuple[Dict[Any, np.ndarray], np.ndarray]] = {}
+        self.ann: Any = None
+        self.ann_version = -1
+        self._log_offset = 0  # points.jsonl 已回放的字节数
+        self._writer_lock = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            meta_path = os.path.join(directory, self.META_FILE)
+            if os.path.exists(meta_path):
+                self.refresh()
+            else:
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"name": name, "dims": dims}, f)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def count(self) -> int:
+        return int(np.count_nonzero(self.alive[:len(self.ids)]))
+
+    @property
+    def matrix(self) -> np.ndarray:
+        n = len(self.ids)
+        if not self.directory:
+            return self._buffer[:n]
+        if n == 0:
+            return np.zeros((0, self.dims), dtype=np.float32)
+        if self._mmap is None or len(self._mmap) != n:
+            path = os.path.join(self.directory, self.VECTORS_FILE)
+            self._mmap = np.memmap(path, dtype=np.float32, mode="r", shape=(n, self.dims))
+        return self._mmap
+
+    def refresh(self) -> bool:
+        """
+        回放日志中尚未回放的完整记录（打开时回放全部；之后由其他进程的写入追加），有新记录时返回 True
+        向量文件先于日志写入，日志中出现的行在向量文件中一定存在
+        """
+        points_path = os.path.join(self.directory, self.POINTS_FILE)
+        try:
+            if os.path.getsize(points_path) <= self._log_offset:
+                return False
+        except OSError:
+            return False
+        with open(points_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1]  # 写入中的最后一行留到下次
+        alive = self.alive.tolist()
+        applied = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"本地索引日志记录不完整，忽略之后的记录: {points_path}")
+                break
+            self._apply(record, alive)
+            self._log_offset += len(line)
+            applied += 1
+        if not applied:
+            return False
+        self.alive = np.array(alive, dtype=bool)
+        self._mmap = None
+        self._field_index.clear()
+        self.version += 1
+        return True
+
+    def _apply(self, record: Dict[str, Any], alive: List[bool]):
+        row = record["row"]
+        if record.get("deleted"):
+            alive[row] = False
+            self.row_of.pop(self.ids[row], None)
+            return
+        if row == len(self.ids):
+            self.ids.append(record["id"])
+            self.payloads.append(record["payload"])
+            alive.append(True)
+        else:
+            self.row_of.pop(self.ids[row], None)
+            self.ids[row] = record["id"]
+            self.payloads[row] = record["payload"]
+            alive[row] = True
+        self.row_of[record["id"]] = row
+
+    def _acquire_writer(self):
+        """首次写入时获取写锁并补上锁之前其他进程的写入；行号来自本进程的状态，因此不允许两个进程同时写入"""
+        if not self.directory or self._writer_lock is not None:
+            return
+        lock = open(os.path.join(self.directory, self.WRITER_LOCK_FILE), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                raise RuntimeError(f"本地索引正被其他进程写入: {self.directory}（同一目录同时只允许一个写入进程）")
+        self._writer_lock = lock
+        self.refresh()
+        # 中断的写入可能在日志末尾留下不完整的记录，截掉后再追加
+        points_path = os.path.join(self.directory, self.POINTS_FILE)
+        if os.path.exists(points_path) and os.path.getsize(points_path) > self._log_offset:
+            logger.warning(f"截断本地索引日志末尾不完整的记录: {points_path}")
+            with open(points_path, "ab") as f:
+                f.truncate(self._log_offset)
+
+    def upsert(self, ids: List[PointId], payloads: List[Dict[str, Any]], vectors: np.ndarray):
+        """按ID覆盖已有点，其余追加到末尾"""
+        self._acquire_writer()
+        rows = []
+        new_rows: Dict[PointId, int] = {}  # 同一批次内重复的ID落在同一行，以最后一次为准
+        for point_id in ids:
+            row = self.row_of.get(point_id, new_rows.get(point_id))
+            if row is None:
+                row = new_rows[point_id] = len(self.ids) + len(new_rows)
+            rows.append(row)
+        rows = np.array(rows, dtype=np.int64)
+        new_ids = list(new_rows)
+
+        start = len(self.ids)
+        total = start + len(new_ids)
+        if self.directory:
+            path = os.path.join(self.directory, self.VECTORS_FILE)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.truncate(total * self.dims * 4)
+                if np.array_equal(rows, np.arange(start, total)):
+                    # 常见情况：整批都是新点，一次顺序写入
+                    f.seek(start * self.dims * 4)
+                    f.write(np.ascontiguousarray(vectors).tobytes())
+                else:
+                    for row, vector in zip(rows, vectors):
+                        f.seek(int(row) * self.dims * 4)
+                        f.write(vector.tobytes())
+            self._mmap = None
+        else:
+            if total > len(self._buffer):
+                grown = np.zeros((max(total, len(self._buffer) * 2, 1024), self.dims), dtype=np.float32)
+                grown[:start] = self._buffer[:start]
+                self._buffer = grown
+            self._buffer[rows] = vectors
+
+        self.ids.extend(new_ids)
+        self.payloads.extend([{}] * len(new_ids))
+        self.alive = np.concatenate([self.alive, np.zeros(len(new_ids), dtype=bool)])
+        for point_id, row, payload in zip(ids, rows, payloads):
+            self.ids[row] = point_id
+            self.payloads[row] = payload
+            self.alive[row] = True
+            self.row_of[point_id] = row
+        if self.directory:
+            self._append_log([
+                {"row": int(row), "id": point_id, "payload": payload}
+                for point_id, row, payload in zip(ids, rows, payloads)
+            ])
+        self._field_index.clear()
+        self.version += 1
+
+    def delete(self, ids: List[PointId]) -> int:
+        self._acquire_writer()
+        rows = [self.row_of.pop(point_id) for point_id in ids if point_id in self.row_of]
+        self.alive[rows] = False
+        if self.directory and rows:
+            self._append_log([{"row": int(row), "deleted": True} for row in rows])
+        self._field_index.clear()
+        return len(rows)
+
+    def _append_log(self, records: List[Dict[str, Any]]):
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        with open(os.path.join(self.directory, self.POINTS_FILE), "ab") as f:
+            f.write(data)
+        self._log_offset += len(data)
+
+    def field_index(self, key: str) -> Tuple[Dict[Any, np.ndarray], np.ndarray]:
+        """payload 字段的倒排索引：(值 -> 行号数组, 字段非空的行掩码)；数组值的每个元素都建立索引"""
+        cached = self._field_index.get(key)
+        if cached is not None:
+            return cached
+        postings: Dict[Any, List[int]] = {}
+        present = np.zeros(len(self.ids), dtype=bool)
+        for row, payload in enumerate(self.payloads):
+            value = payload.get(key)
+            values = value if isinstance(value, list) else [value]
+            for item in values:
+                if item is None or isinstance(item, (dict, list)):
+                    continue
+                postings.setdefault(item, []).append(row)
+                present[row] = True
+        index = ({value: np.array(rows, dtype=np.int64) for value, rows in postings.items()}, present)
+        self._field_index[key] = index
+        return index
+
+
+class LocalVectorStore(VectorStore):
+    """进程内向量存储：与 QdrantClientWrapper 相同的接口与打分，无需 Qdrant 服务"""
+
+    def __init__(
+        self,
+        dims: int,
+        directory: Optional[str] = None,
+        mode: str = "exact",
+        full_scan_threshold: int = 10000,
+        ivf_nlist: int = 0,
+        ivf_nprobe: int = 16,
+        hnsw_m: int = 16,
+        hnsw_ef: int = 64,
+        block_rows: int = 65536
+    ):
+        """
+        :param dims: 向量维度
+        :param directory: 持久化目录（每个集合一个子目录），None 表示只在内存中
+        :param mode: exact / ivf / hnsw
+        :param full_scan_threshold: 点数低于该值时总是精确检索
+        :param ivf_nlist: IVF 聚类数，0 表示按 sqrt(n) 自动选择
+        :param ivf_nprobe: IVF 每次查询探查的簇数
+        :param hnsw_m: HNSW 每个节点的连接数
+        :param hnsw_ef: HNSW 查询时的候选列表大小
+        :param block_rows: 精确检索每次矩阵乘的行数
+        """
+        if mode not in MODES:
+            raise ValueError(f"未知的本地索引模式: {mode}，可选: {', '.join(MODES)}")
+        self.size = dims
+        self.directory = directory
+        self.mode = mode
+        self.full_scan_threshold = full_scan_threshold
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef = hnsw_ef
+        self.block_rows = block_rows
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.RLock()
+        self._discover()
+        if self._collections:
+            logger.info(f"本地向量索引已加载 | 目录: {directory} | 集合: {list(self._collections)}")
+
+    @classmethod
+    def from_config(cls, config: Config) -> "LocalVectorStore":
+        return cls(
+            dims=config.EMBEDDING_DIMS,
+            directory=config.LOCAL_INDEX_DIR or None,
+            mode=config.LOCAL_INDEX_MODE,
+            full_scan_threshold=config.LOCAL_INDEX_FULL_SCAN_THRESHOLD,
+            ivf_nlist=config.LOCAL_IVF_NLIST,
+            ivf_nprobe=config.LOCAL_IVF_NPROBE,
+            hnsw_m=config.LOCAL_HNSW_M,
+            hnsw_ef=config.LOCAL_HNSW_EF,
+        )
+
+    def _discover(self):
+        """加载目录中尚未加载的集合（包括其他进程创建的集合）"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        with self._lock:
+            for name in sorted(os.listdir(self.directory)):
+                if name not in self._collections and os.path.exists(os.path.join(self.directory, name, LocalCollection.META_FILE)):
+                    self._collections[name] = LocalCollection(name, self.size, os.path.join(self.directory, name))
+
+    def collection_exists(self, collection_name: str) -> bool:
+        if collection_name not in self._collections:
+            self._discover()
+        return collection_name in self._collections
+
+    def ensure_collection(self, collection_name: str) -> Tuple[bool, str]:
+        try:
+            with self._lock:
+                if collection_name not in self._collections:
+                    logger.info(f"正在创建集合: {collection_name}")
+                    directory = os.path.join(self.directory, collection_name) if self.directory else None
+                    self._collections[collection_name] = LocalCollection(collection_name, self.size, directory)
+                    logger.success(f"集合创建成功: {collection_name}")
+            return True, ""
+        except Exception as e:
+            logger.error(f"集合创建失败: {collection_name} - 错误: {str(e)}")
+            return False, str(e)
+
+    def get_points_count(self, collection_name: str) -> int:
+        if not self.collection_exists(collection_name):
+            logger.warning(f"集合不存在: {collection_name}")
+            success, _ = self.ensure_collection(collection_name)
+            return 0 if success else -1
+        return self._get(collection_name).count
+
+    def list_all_collection_names(self) -> List[str]:
+        self._discover()
+        return list(self._collections)
+
+    def add_points(self,
+                   collection_name: str,
+                   ids: List[PointId],
+                   payloads: List[Dict[str, Any]],
+                   vectors: List[List[float]]) -> bool:
+        if len(ids) != len(payloads):
+            raise ValueError("ids和payloads长度必须相同")
+        if len(ids) != len(vectors):
+            raise ValueError("ids和vectors长度必须相同")
+        success, error = self.ensure_collection(collection_name)
+        if not success:
+            return False
+        try:
+            vectors = _normalize(vectors)
+            if vectors.shape[1] != self.size:
+                raise ValueError(f"向量维度不匹配: {vectors.shape[1]} != {self.size}")
+            with self._lock:
+                self._collections[collection_name].upsert(list(ids), list(payloads), vectors)
+            logger.success(f"成功添加 {len(ids)} 个点到集合: {collection_name}")
+            return True
+        except Exception as e:
+            logger.error(f"添加点到集合失败: {collection_name} - 错误: {str(e)}")
+            return False
+
+    def delete_points(self, collection_name: str, ids: List[PointId], batch_size: int = 1000) -> bool:
+        try:
+            with self._lock:
+                self._get(collection_name).delete(list(ids))
+            logger.success(f"成功从集合删除 {len(ids)} 个点: {collection_name}")
+            return True
+        except Exception as e:
+            logger.error(f"删除点失败: {collection_name} - 错误: {str(e)}")
+            return False
+
+    def scroll_payloads(self,
+                        collection_name: str,
+                        fields: List[str],
+                        batch_size: int = 1000) -> Iterator[Tuple[PointId, Dict[str, Any]]]:
+        collection = self._get(collection_name)
+        for row in np.flatnonzero(collection.alive[:len(collection)]):
+            payload = collection.payloads[row]
+            yield collection.ids[row], {field: payload[field] for field in fields if field in payload}
+
+    def search(self,
+               collection_name: str,
+               query_vector: List[float],
+               limit: int = 3) -> List[Dict[str, Any]]:
+        return self.search_batch(collection_name, [query_vector], limit)[0]
+
+    def search_with_filter(self,
+                           collection_name: str,
+                           query_vector: List[float],
+                           query_filter: Any,
+                           limit: int = 3) -> List[Dict[str, Any]]:
+        return self.search_batch(collection_name, [query_vector], limit, query_filter)[0]
+
+    def search_batch(self,
+                     collection_name: str,
+                     query_vectors: List[List[float]],
+                     limit: int = 3,
+                     query_filter: Any = None) -> List[List[Dict[str, Any]]]:
+        if len(query_vectors) == 0:
+            return []
+        if isinstance(query_filter, list):
+            return self._search_batch_per_filter(collection_name, query_vectors, limit, query_filter)
+        collection = self._get(collection_name)
+        with self._lock:
+            matrix = collection.matrix
+            mask = collection.alive[:len(collection)].copy()
+            if query_filter is not None:
+                mask &= self._filter_mask(collection, query_filter)
+            ann = self._get_ann(collection)
+        allowed = int(np.count_nonzero(mask))
+        mask = None if allowed == len(mask) else mask
+        queries = _normalize(query_vectors)
+        if ann is None:
+            scores, rows = exact_topk(matrix, queries, limit, mask, self.block_rows)
+            return [self._format_results(collection, s, r) for s, r in zip(scores, rows)]
+
+        results = []
+        fallback = []
+        for i, (scores, rows) in enumerate(ann.search(matrix, queries, limit, mask)):
+            results.append(self._format_results(collection, scores, rows))
+            if len(rows) < min(limit, allowed):
+                fallback.append(i)
+        if fallback:
+            # 过滤条件较严、近似召回不足时回退精确检索（与 Qdrant 对强过滤条件走全量扫描一致）
+            scores, rows = exact_topk(matrix, queries[fallback], limit, mask, self.block_rows)
+            for i, s, r in zip(fallback, scores, rows):
+                results[i] = self._format_results(collection, s, r)
+        return results
+
+    def _search_batch_per_filter(self,
+                                 collection_name: str,
+                                 query_vectors: List[List[float]],
+                                 limit: int,
+                                 query_filters: List[Any]) -> List[List[Dict[str, Any]]]:
+        """每个查询各自的过滤条件：共用同一个过滤条件对象的查询（例如同一用户的多个兴趣向量）合并为一次检索"""
+        filters = per_query_filters(query_vectors, query_filters)
+        groups: Dict[int, List[int]] = {}
+        for i, query_filter in enumerate(filters):
+            groups.setdefault(id(query_filter), []).append(i)
+        results: List[List[Dict[str, Any]]] = [[] for _ in query_vectors]
+        for positions in groups.values():
+            batch = self.search_batch(collection_name, [query_vectors[i] for i in positions], limit, filters[positions[0]])
+            for i, result in zip(positions, batch):
+                results[i] = result
+        return results
+
+    def retrieve_vectors(self,
+                         collection_name: str,
+                         ids: List[PointId]) -> Dict[PointId, List[float]]:
+        collection = self._get(collection_name)
+        matrix = collection.matrix
+        return {
+            point_id: np.asarray(matrix[collection.row_of[point_id]]).tolist()
+            for point_id in ids if point_id in collection.row_of
+        }
+
+    def search_by_id(self,
+                     collection_name: str,
+                     point_id: PointId,
+                     limit: int = 3,
+                     query_filter: Any = None) -> List[Dict[str, Any]]:
+        collection = self._get(collection_name)
+        row = collection.row_of.get(point_id)
+        if row is None:
+            raise ValueError(f"点不存在: {point_id}")
+        query_filter = models.Filter(
+            must=[query_filter] if query_filter is not None else None,
+            must_not=[models.HasIdCondition(has_id=[point_id])]
+        )
+        return self.search_with_filter(collection_name, collection.matrix[row], query_filter, limit)
+
+    def _get(self, collection_name: str) -> LocalCollection:
+        """取得集合并回放其他进程新写入的日志记录"""
+        if not self.collection_exists(collection_name):
+            raise ValueError(f"集合不存在: {collection_name}")
+        collection = self._collections[collection_name]
+        if collection.directory:
+            with self._lock:
+                collection.refresh()
+        return collection
+
+    def _get_ann(self, collection: LocalCollection):
+        """近似索引（集合新增点后在下一次查询时重建）；exact 模式或点数较少时返回 None"""
+        if self.mode == "exact" or collection.count < self.full_scan_threshold:
+            return None
+        if collection.ann is None or collection.ann_version != collection.version:
+            logger.info(f"构建本地近似索引 | 集合: {collection.name} | 模式: {self.mode} | 点数: {len(collection)}")
+            if self.mode == "ivf":
+                collection.ann = IVFIndex(collection.matrix, self.ivf_nlist, self.ivf_nprobe)
+            else:
+                collection.ann = HNSWIndex(collection.matrix, self.hnsw_m, self.hnsw_ef)
+            collection.ann_version = collection.version
+        return collection.ann
+
+    def _format_results(self, collection: LocalCollection, scores: np.ndarray, rows: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {'id': collection.ids[row], 'score': float(score), 'payload': dict(collection.payloads[row])}
+            for score, row in zip(scores, rows) if row >= 0
+        ]
+
+    def _filter_mask(self, collection: LocalCollection, query_filter: models.Filter) -> np.ndarray:
+        """按 Qdrant 过滤语义计算行掩码：must 全部满足、should 至少满足一个、must_not 都不满足"""
+        n = len(collection)
+        mask = np.ones(n, dtype=bool)
+        for condition in query_filter.must or []:
+            mask &= self._condition_mask(collection, condition)
+        if query_filter.should:
+            should = np.zeros(n, dtype=bool)
+            for condition in query_filter.should:
+                should |= self._condition_mask(collection, condition)
+            mask &= should
+        for condition in query_filter.must_not or []:
+            mask &= ~self._condition_mask(collection, condition)
+        return mask
+
+    def _condition_mask(self, collection: LocalCollection, condition: Any) -> np.ndarray:
+        n = len(collection)
+        mask = np.zeros(n, dtype=bool)
+        if isinstance(condition, models.Filter):
+            return self._filter_mask(collection, condition)
+        if isinstance(condition, models.HasIdCondition):
+            mask[[collection.row_of[i] for i in condition.has_id if i in collection.row_of]] = True
+            return mask
+        if isinstance(condition, models.IsEmptyCondition):
+            return ~collection.field_index(condition.is_empty.key)[1]
+        if not isinstance(condition, models.FieldCondition):
+            raise ValueError(f"本地索引不支持的过滤条件: {type(condition).__name__}")
+
+        if condition.range is not None:
+            bounds = condition.range
+            for row, payload in enumerate(collection.payloads):
+                value = payload.get(condition.key)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    mask[row] = ((bounds.gt is None or value > bounds.gt) and (bounds.gte is None or value >= bounds.gte)
+                                 and (bounds.lt is None or value < bounds.lt) and (bounds.lte is None or value <= bounds.lte))
+            return mask
+
+        postings, present = collection.field_index(condition.key)
+        match = condition.match
+        if isinstance(match, models.MatchValue):
+            values = [match.value]
+        elif isinstance(match, models.MatchAny):
+            values = match.any
+        elif isinstance(match, models.MatchExcept):
+            for value in getattr(match, "except_", None) or getattr(match, "except"):
+                mask[postings.get(value, [])] = True
+            return present & ~mask
+        else:
+            raise ValueError(f"本地索引不支持的匹配条件: {type(match).__name__}")
+        for value in values:
+            mask[postings.get(value, [])] = True
+        return mask
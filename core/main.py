@@ -4,6 +4,8 @@
 """
 
 import sys
+import json
+import time
 from loguru import logger
 from config import Config
 from save_news_to_qdrant import NewsDataProcessor
@@ -26,17 +28,20 @@ class NewsRecommendationApp:
         """设置数据 - 检查向量数据库，如果需要则重建"""
         logger.info("=== 数据设置阶段 ===")
         
-        # 检查向量数据库是否已存在数据
-        if not force_rebuild and self.recommender.qdrant.collection_exists("news_vectors"):
+        file_path = 'data/MIND/MINDsmall_train/news.tsv'
+        # 检查向量数据库是否已存在数据（上次入库中断时继续入库）
+        pending = self.processor.get_checkpoint(file_path, "news_vectors").is_pending()
+        if not force_rebuild and not pending and self.recommender.qdrant.collection_exists("news_vectors"):
             logger.info("向量数据库已存在，跳过数据入库")
             return True
             
-        # 执行数据预处理和入库
+        # 执行数据预处理和入库（流水线入库，中断后重新运行会从检查点继续）
         logger.info("开始数据预处理和向量入库...")
         success = self.processor.process_and_save(
-            file_path='data/MIND/MINDsmall_train/news.tsv',
+            file_path=file_path,
             collection_name="news_vectors",
-            batch_size=500
+            batch_size=500,
+            resume=not force_rebuild
         )
         
         if success:
@@ -76,15 +81,12 @@ class NewsRecommendationApp:
                     continue
                 
                 # 显示用户点击历史
-                user_history = self.recommender.get_user_history(df_behaviors, user_id)
-                if not user_history.empty:
-                    click_history = user_history['click_history'].iloc[0].split()[:5]
+                click_history = self.recommender.get_click_history(df_behaviors, user_id)[:5]
+                if click_history:
                     print(f"\n用户历史点击（最近5条）:")
-                    for j, news_id in enumerate(click_history, 1):
-                        news = df_news[df_news['news_id'] == news_id]
-                        if not news.empty:
-                            news_info = news.iloc[0]
-                            print(f"  {j}. [{news_info['category']}] {news_info['title'][:50]}...")
+                    catalog = self.recommender.get_catalog(df_news)
+                    for j, news_info in enumerate(catalog.lookup(click_history), 1):
+                        print(f"  {j}. [{news_info['category']}] {news_info['title'][:50]}...")
                 
                 # 显示推荐结果
                 print(f"\n🎯 为用户 {user_id} 的推荐结果:")
@@ -122,7 +124,7 @@ class NewsRecommendationApp:
                     continue
                 
                 # 检查用户是否存在
-                if user_input not in df_behaviors['user_id'].values:
+                if not self.recommender.user_exists(df_behaviors, user_input):
                     print(f"❌ 用户 {user_input} 不存在")
                     continue
                 
@@ -149,7 +151,45 @@ class NewsRecommendationApp:
         except Exception as e:
             logger.error(f"交互模式失败: {str(e)}")
     
-    def run(self, mode: str = "demo", force_rebuild: bool = False):
+    def run_batch_recommendation(self, num_users: int = 1000, output_path: str = "recommendations.jsonl", top_n: int = 10):
+        """批量推荐模式 - 为多个用户生成推荐，结果逐行写入 JSONL 文件"""
+        logger.info("=== 批量推荐模式 ===")
+        
+        df_news = self.recommender.load_news_data()
+        df_behaviors = self.recommender.load_behaviors_data()
+        user_ids = df_behaviors['user_id'].drop_duplicates()
+        user_ids = (user_ids.head(num_users) if num_users > 0 else user_ids).tolist()
+        
+        start = time.perf_counter()
+        done = 0
+        with open(output_path, "w", encoding="utf-8") as f:
+            for user_id, recommendations in self.recommender.recommend_many(df_news, df_behaviors, user_ids, top_n):
+                record = {
+                    "user_id": user_id,
+                    "recommendations": [
+                        {"news_id": rec['news_id'], "category": rec['category'], "title": rec['title']}
+                        for rec in recommendations
+                    ]
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                done += 1
+                if done % 100 == 0:
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"已完成 {done} 个用户 | {done / elapsed:.2f} 用户/秒")
+        
+        elapsed = time.perf_counter() - start
+        print(f"\n✅ 批量推荐完成：{done} 个用户，耗时 {elapsed:.1f}s，{done / elapsed if elapsed else 0:.2f} 用户/秒")
+        print(f"结果已写入: {output_path}")
+    
+    def run(
+        self,
+        mode: str = "demo",
+        force_rebuild: bool = False,
+        num_users: int = 1000,
+        output_path: str = "recommendations.jsonl",
+        top_n: int = 10
+    ):
         """主运行函数"""
         print("🚀 新闻推荐系统启动")
         print("="*50)
@@ -164,6 +204,8 @@ class NewsRecommendationApp:
             self.run_recommendation_demo(num_users=3)
         elif mode == "interactive":
             self.interactive_mode()
+        elif mode == "batch":
+            self.run_batch_recommendation(num_users=num_users, output_path=output_path, top_n=top_n)
         elif mode == "setup_only":
             print("✅ 仅完成数据设置")
         else:
@@ -186,22 +228,21 @@ class NewsRecommendationApp:
             return []
     
     
-    def recommend_for_user(self, user_id, top_n=5):
-        # 加载新闻和行为数据（可优化为只加载一次）
+    def recommend_for_user(self, user_id, top_n=5, categories=None, sub_categories=None):
+        # 新闻和行为数据由进程级数据存储共享，这里不会重复解析TSV
         df_news = self.recommender.load_news_data()
         df_behaviors = self.recommender.load_behaviors_data()
-        return self.recommender.recommend(df_news, df_behaviors, user_id, top_n)
+        # 类别限定在召回时由向量库过滤，返回的就是 top_n 条符合条件的新闻
+        return self.recommender.recommend(df_news, df_behaviors, user_id, top_n, categories, sub_categories)
 
     def get_user_profile(self, user_id):
         df_news = self.recommender.load_news_data()
         df_behaviors = self.recommender.load_behaviors_data()
         # 获取用户点击历史
-        user_history = self.recommender.get_user_history(df_behaviors, user_id)
-        if user_history.empty:
+        if not self.recommender.user_exists(df_behaviors, user_id):
             return {}
-        click_history_str = user_history['click_history'].iloc[0]
-        click_history = click_history_str.split() if click_history_str else []
-        return self.recommender.generate_user_profile(df_news, click_history)
+        click_history = self.recommender.get_click_history(df_behaviors, user_id)
+        return self.recommender.get_user_profile(df_news, user_id, click_history)
 
 
 def main():
@@ -211,23 +252,30 @@ def main():
     parser = argparse.ArgumentParser(description="新闻推荐系统")
     parser.add_argument(
         "--mode", 
-        choices=["demo", "interactive", "setup_only"], 
+        choices=["demo", "interactive", "setup_only", "batch"], 
         default="demo",
-        help="运行模式: demo(演示), interactive(交互), setup_only(仅数据设置)"
+        help="运行模式: demo(演示), interactive(交互), setup_only(仅数据设置), batch(批量推荐)"
+    )
+    parser.add_argument("--num-users", type=int, default=1000, help="batch 模式下推荐的用户数（0 表示全部用户）")
+    parser.add_argument("--output", default="recommendations.jsonl", help="batch 模式的 JSONL 输出路径")
+    parser.add_argument("--top-n", type=int, default=10, help="batch 模式下每个用户的推荐条数")
+    # 入库已改为可断点续传的流水线，重建不再需要从头等待
+    parser.add_argument(
+        "--force-rebuild", 
+        action="store_true",
+        help="强制重建向量数据库（忽略入库检查点，从头开始）"
     )
-    #重建太麻烦时间长就注释了
-    # parser.add_argument(
-    #     "--force-rebuild", 
-    #     action="store_true",
-    #     help="强制重建向量数据库"
-    # )
 
     args = parser.parse_args()
 
     app = NewsRecommendationApp()
-    # 如果 --force-rebuild 没有启用，这里会报 AttributeError
-    # 建议加: force_rebuild = getattr(args, "force_rebuild", False)
-    app.run(mode=args.mode, force_rebuild=getattr(args, "force_rebuild", False))
+    app.run(
+        mode=args.mode,
+        force_rebuild=args.force_rebuild,
+        num_users=args.num_users,
+        output_path=args.output,
+        top_n=args.top_n
+    )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,74 @@
+"""
+推荐质量指标模块
+职责：MIND 评测使用的按曝光计算的排序指标（与官方评测脚本的定义一致），各曝光的指标取平均
+- AUC:     曝光内被点击新闻排在未点击新闻之前的概率（全为同一标签的曝光不计入）
+- MRR:     被点击新闻倒数排名的平均
+- nDCG@k:  前 k 条的归一化折损累计增益
+"""
+
+import numpy as np
+from typing import Dict, List, Sequence
+
+
+def auc_score(labels: np.ndarray, scores: np.ndarray) -> float:
+    """基于秩的 AUC（Mann-Whitney U，分数相同时取平均秩）"""
+    labels = np.asarray(labels)
+    positives = int(labels.sum())
+    negatives = len(labels) - positives
+    if positives == 0 or negatives == 0:
+        return float('nan')
+    order = np.argsort(scores, kind='mergesort')
+    sorted_scores = np.asarray(scores)[order]
+    ranks = np.empty(len(labels), dtype=np.float64)
+    # 相同分数的一段取平均秩
+    _, starts, counts = np.unique(sorted_scores, return_index=True, return_counts=True)
+    average = starts + (counts + 1) / 2.0
+    ranks[order] = np.repeat(average, counts)
+    return float((ranks[labels == 1].sum() - positives * (positives + 1) / 2.0) / (positives * negatives))
+
+
+def mrr_score(labels: np.ndarray, scores: np.ndarray) -> float:
+    order = np.argsort(scores)[::-1]
+    ranked = np.asarray(labels)[order]
+    return float(np.sum(ranked / (np.arange(len(ranked)) + 1)) / max(np.sum(ranked), 1))
+
+
+def dcg_score(labels: np.ndarray, scores: np.ndarray, k: int) -> float:
+    order = np.argsort(scores)[::-1]
+    ranked = np.asarray(labels)[order[:k]]
+    return float(np.sum((2 ** ranked - 1) / np.log2(np.arange(len(ranked)) + 2)))
+
+
+def ndcg_score(labels: np.ndarray, scores: np.ndarray, k: int) -> float:
+    best = dcg_score(labels, labels, k)
+    return dcg_score(labels, scores, k) / best if best > 0 else 0.0
+
+
+class ImpressionMetrics:
+    """逐条曝光累加指标，summary 返回各指标的平均值"""
+
+    NAMES = ("auc", "mrr", "ndcg@5", "ndcg@10")
+
+    def __init__(self):
+        self._values: Dict[str, List[float]] = {name: [] for name in self.NAMES}
+
+    def __len__(self) -> int:
+        return len(self._values["mrr"])
+
+    def add(self, labels: Sequence[int], scores: Sequence[float]):
+        """添加一条曝光的标签（1 点击 / 0 未点击）与模型分数；没有点击的曝光跳过"""
+        labels = np.asarray(labels, dtype=np.float64)
+        scores = np.asarray(scores, dtype=np.float64)
+        if len(labels) == 0 or labels.sum() == 0:
+            return
+        auc = auc_score(labels, scores)
+        if not np.isnan(auc):
+            self._values["auc"].append(auc)
+        self._values["mrr"].append(mrr_score(labels, scores))
+        self._values["ndcg@5"].append(ndcg_score(labels, scores, 5))
+        self._values["ndcg@10"].append(ndcg_score(labels, scores, 10))
+
+    def summary(self) -> Dict[str, float]:
+        result = {name: round(float(np.mean(values)), 4) if values else float('nan') for name, values in self._values.items()}
+        result["impressions"] = len(self)
+        return result
@@ -0,0 +1,279 @@
+"""
+MIND 数据读写模块
+职责：原始 TSV 解析 + 一次性转换生成的列式二进制缓存（Parquet + .npz）
+- category / sub_category / user_id 使用 categorical 类型
+- title_entities / abstract_entities 预先由 Python 字面量规范化为 JSON，
+  加载时用 C 实现的 json 解析还原为列表，无需逐条 literal_eval
+- 点击历史额外保存为 offsets + codes 的整型数组（CSR 风格）
+缓存与源文件的 mtime/大小一致时，加载函数自动走缓存，否则回退到解析 TSV
+
+用法:
+    python mind_io.py --news MIND/MINDsmall_train/news.tsv --behaviors MIND/MINDsmall_train/behaviors.tsv
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from ast import literal_eval
+from dataclasses import dataclass
+from itertools import chain
+from loguru import logger
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+
+NEWS_COLUMNS = [
+    "news_id", "category", "sub_category", "title", "abstract",
+    "url", "title_entities", "abstract_entities"
+]
+BEHAVIORS_COLUMNS = [
+    "impression_id", "user_id", "time",
+    "click_history", "impression_lpg"
+]
+ENTITY_COLUMNS = ["title_entities", "abstract_entities"]
+NEWS_CATEGORICAL_COLUMNS = ["category", "sub_category"]
+BEHAVIORS_CATEGORICAL_COLUMNS = ["user_id"]
+
+CACHE_DIR_NAME = "_cache"
+CACHE_VERSION = 1
+
+
+def read_news_tsv(file_path: str) -> pd.DataFrame:
+    """从原始 TSV 解析新闻数据"""
+    return pd.read_csv(file_path, names=NEWS_COLUMNS, sep='\t', header=None)
+
+
+def iter_news_tsv(file_path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """分块流式解析新闻 TSV（每块 chunksize 行，行号与 read_news_tsv 的结果一致）"""
+    return pd.read_csv(file_path, names=NEWS_COLUMNS, sep='\t', header=None, chunksize=chunksize)
+
+
+def read_behaviors_tsv(file_path: str) -> pd.DataFrame:
+    """从原始 TSV 解析用户行为数据"""
+    return pd.read_csv(file_path, names=BEHAVIORS_COLUMNS, sep='\t', header=None)
+
+
+def iter_behaviors_tsv(file_path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """分块流式解析用户行为 TSV（每块 chunksize 行）"""
+    return pd.read_csv(file_path, names=BEHAVIORS_COLUMNS, sep='\t', header=None, chunksize=chunksize)
+
+
+def parse_entities(value: Any) -> List[Dict[str, Any]]:
+    """将实体列的字符串表示解析为列表（已是列表时原样返回）"""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and value.strip():
+        return literal_eval(value)
+    return []
+
+
+def parse_impressions(value: Any) -> Tuple[List[str], List[int]]:
+    """将曝光列（"N1-1 N2-0 ..."）解析为 (新闻ID列表, 点击标签列表)；测试集没有标签时标签记为 -1"""
+    if not isinstance(value, str):
+        return [], []
+    news_ids, labels = [], []
+    for item in value.split():
+        news_id, _, label = item.partition('-')
+        news_ids.append(news_id)
+        labels.append(int(label) if label else -1)
+    return news_ids, labels
+
+
+@dataclass
+class ClickHistories:
+    """
+    按行偏移编码的点击历史
+    第 i 行的点击历史为 vocab[codes[offsets[i]:offsets[i + 1]]]
+    """
+    vocab: np.ndarray    # news_id 词表（object）
+    offsets: np.ndarray  # int64，长度为 行数 + 1
+    codes: np.ndarray    # int32，指向 vocab 的下标
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def row_codes(self, row: int) -> np.ndarray:
+        return self.codes[self.offsets[row]:self.offsets[row + 1]]
+
+    def row_ids(self, row: int) -> List[str]:
+        return self.vocab[self.row_codes(row)].tolist()
+
+
+def encode_click_histories(click_history: pd.Series) -> ClickHistories:
+    """将空格分隔的点击历史列编码为 offsets + codes 数组"""
+    values = click_history.fillna('').astype(str).to_numpy(dtype=object)
+    # 同一用户的多条曝光记录点击历史相同，先去重再切分
+    row_keys, unique_histories = pd.factorize(values, sort=False)
+    unique_lists = [history.split() for history in unique_histories]
+    unique_lengths = np.fromiter(map(len, unique_lists), dtype=np.int64, count=len(unique_lists))
+    unique_offsets = np.zeros(len(unique_lists) + 1, dtype=np.int64)
+    np.cumsum(unique_lengths, out=unique_offsets[1:])
+    tokens = np.fromiter(chain.from_iterable(unique_lists), dtype=object, count=int(unique_offsets[-1]))
+    token_codes, vocab = pd.factorize(tokens, sort=False)
+
+    # 按行展开：第 i 行取其对应去重历史在 token_codes 中的区间
+    lengths = unique_lengths[row_keys]
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    gather = np.repeat(unique_offsets[row_keys] - offsets[:-1], lengths) + np.arange(offsets[-1])
+    return ClickHistories(
+        vocab=np.asarray(vocab, dtype=object),
+        offsets=offsets,
+        codes=token_codes[gather].astype(np.int32),
+    )
+
+
+def _cache_paths(tsv_path: str) -> Dict[str, str]:
+    directory, filename = os.path.split(os.path.abspath(tsv_path))
+    stem = os.path.splitext(filename)[0]
+    cache_dir = os.path.join(directory, CACHE_DIR_NAME)
+    return {
+        "dir": cache_dir,
+        "table": os.path.join(cache_dir, f"{stem}.parquet"),
+        "history": os.path.join(cache_dir, f"{stem}.history.npz"),
+        "meta": os.path.join(cache_dir, f"{stem}.meta.json"),
+    }
+
+
+def _source_signature(tsv_path: str) -> Dict[str, Any]:
+    stat = os.stat(tsv_path)
+    return {"version": CACHE_VERSION, "source_mtime": stat.st_mtime, "source_size": stat.st_size}
+
+
+def file_signature(file_path: str) -> Dict[str, Any]:
+    """数据文件的来源标识（绝对路径 + mtime/大小），用于判断由该文件离线派生的结构是否仍然对应当前文件"""
+    stat = os.stat(file_path)
+    return {"path": os.path.abspath(file_path), "mtime": stat.st_mtime, "size": stat.st_size}
+
+
+def _pyarrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def is_cache_fresh(tsv_path: str) -> bool:
+    """缓存存在且与源 TSV 的 mtime/大小一致"""
+    meta_path = _cache_paths(tsv_path)["meta"]
+    if not os.path.exists(meta_path):
+        return False
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return meta == _source_signature(tsv_path)
+    except (OSError, ValueError):
+        return False
+
+
+def _write_meta(tsv_path: str, meta_path: str):
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_source_signature(tsv_path), f)
+    os.replace(tmp_path, meta_path)
+
+
+def _write_table(df: pd.DataFrame, table_path: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = table_path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, table_path)
+
+
+def _read_table(table_path: str, json_columns: List[str]) -> pd.DataFrame:
+    import pyarrow.parquet as pq
+
+    df = pq.read_table(table_path).to_pandas()
+    loads = json.loads
+    for col in json_columns:
+        if col in df.columns:
+            df[col] = [loads(value) for value in df[col]]
+    return df
+
+
+def build_news_cache(tsv_path: str) -> str:
+    """将 news.tsv 转换为列式缓存，返回缓存文件路径"""
+    paths = _cache_paths(tsv_path)
+    os.makedirs(paths["dir"], exist_ok=True)
+    df = read_news_tsv(tsv_path)
+    for col in NEWS_CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype("category")
+    for col in ENTITY_COLUMNS:
+        df[col] = [json.dumps(parse_entities(value), ensure_ascii=False) for value in df[col]]
+    _write_table(df, paths["table"])
+    _write_meta(tsv_path, paths["meta"])
+    logger.success(f"新闻缓存生成完成 | 记录数: {len(df)} | {paths['table']}")
+    return paths["table"]
+
+
+def build_behaviors_cache(tsv_path: str) -> str:
+    """将 behaviors.tsv 转换为列式缓存（含偏移编码的点击历史），返回缓存文件路径"""
+    paths = _cache_paths(tsv_path)
+    os.makedirs(paths["dir"], exist_ok=True)
+    df = read_behaviors_tsv(tsv_path)
+    for col in BEHAVIORS_CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype("category")
+    _write_table(df, paths["table"])
+
+    histories = encode_click_histories(df["click_history"])
+    tmp_path = paths["history"] + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        vocab=histories.vocab.astype(str),
+        offsets=histories.offsets,
+        codes=histories.codes,
+    )
+    os.replace(tmp_path, paths["history"])
+    _write_meta(tsv_path, paths["meta"])
+    logger.success(f"行为缓存生成完成 | 记录数: {len(df)} | {paths['table']}")
+    return paths["table"]
+
+
+def load_news(tsv_path: str) -> pd.DataFrame:
+    """加载新闻数据：缓存新鲜时读取列式缓存，否则解析原始 TSV"""
+    if _pyarrow_available() and is_cache_fresh(tsv_path):
+        return _read_table(_cache_paths(tsv_path)["table"], ENTITY_COLUMNS)
+    return read_news_tsv(tsv_path)
+
+
+def load_behaviors(tsv_path: str) -> pd.DataFrame:
+    """加载用户行为数据：缓存新鲜时读取列式缓存，否则解析原始 TSV"""
+    if _pyarrow_available() and is_cache_fresh(tsv_path):
+        return _read_table(_cache_paths(tsv_path)["table"], [])
+    return read_behaviors_tsv(tsv_path)
+
+
+def load_click_histories(tsv_path: str) -> Optional[ClickHistories]:
+    """读取缓存中的偏移编码点击历史，缓存不存在或已过期时返回 None"""
+    history_path = _cache_paths(tsv_path)["history"]
+    if not os.path.exists(history_path) or not is_cache_fresh(tsv_path):
+        return None
+    with np.load(history_path, allow_pickle=False) as data:
+        return ClickHistories(
+            vocab=data["vocab"].astype(object),
+            offsets=data["offsets"],
+            codes=data["codes"],
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="将 MIND TSV 转换为列式二进制缓存")
+    parser.add_argument("--news", default='MIND/MINDsmall_train/news.tsv', help="news.tsv 路径")
+    parser.add_argument("--behaviors", default='MIND/MINDsmall_train/behaviors.tsv', help="behaviors.tsv 路径")
+    args = parser.parse_args()
+
+    if not _pyarrow_available():
+        logger.error("未安装 pyarrow，无法生成 Parquet 缓存: pip install pyarrow")
+        return
+    build_news_cache(args.news)
+    build_behaviors_cache(args.behaviors)
+
+
+if __name__ == "__main__":
+    main()
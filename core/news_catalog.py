@@ -0,0 +1,71 @@
+"""
+新闻目录索引模块
+职责：在加载时一次性为 news.tsv 建立 news_id -> 行号的哈希索引和列式数组，
+替代 df_news[df_news['news_id'] == news_id] 这类逐条全表扫描
+"""
+
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Optional, Iterable, Sequence
+
+
+class NewsCatalog:
+    """新闻目录：O(1) 的 news_id 查找 + 列式存储的新闻字段"""
+
+    COLUMNS = ("category", "sub_category", "title", "abstract")
+
+    def __init__(self, df_news: pd.DataFrame, columns: Sequence[str] = COLUMNS):
+        self.news_ids = df_news['news_id'].to_numpy(dtype=object)
+        # 反向遍历构建索引，保证重复 news_id 时与布尔掩码 + iloc[0] 一致（取第一条）
+        n = len(self.news_ids)
+        self._index: Dict[str, int] = dict(zip(self.news_ids[::-1], range(n - 1, -1, -1)))
+        self.columns = tuple(col for col in columns if col in df_news.columns)
+        self._arrays: Dict[str, np.ndarray] = {
+            col: df_news[col].to_numpy(dtype=object) for col in self.columns
+        }
+
+    def __len__(self) -> int:
+        return len(self.news_ids)
+
+    def __contains__(self, news_id: str) -> bool:
+        return news_id in self._index
+
+    def position(self, news_id: str) -> int:
+        """返回 news_id 对应的行号，不存在返回 -1"""
+        return self._index.get(news_id, -1)
+
+    def positions(self, news_ids: Iterable[str]) -> np.ndarray:
+        """批量查找行号，不存在的位置为 -1"""
+        get = self._index.get
+        return np.fromiter((get(nid, -1) for nid in news_ids), dtype=np.int64)
+
+    def column(self, name: str, news_ids: Iterable[str]) -> np.ndarray:
+        """批量取某一列的值（仅返回存在的新闻，保持输入顺序）"""
+        pos = self.positions(news_ids)
+        return self._arrays[name][pos[pos >= 0]]
+
+    def aligned(self, name: str, news_ids: Iterable[str], fill: Any = None) -> np.ndarray:
+        """批量取某一列的值，与输入一一对应，不存在的新闻填充 fill"""
+        pos = self.positions(news_ids)
+        values = np.full(len(pos), fill, dtype=object)
+        found = pos >= 0
+        values[found] = self._arrays[name][pos[found]]
+        return values
+
+    def get(self, news_id: str) -> Optional[Dict[str, Any]]:
+        """获取单条新闻信息，不存在返回 None"""
+        pos = self._index.get(news_id)
+        if pos is None:
+            return None
+        return self._row(pos)
+
+    def lookup(self, news_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """批量获取新闻信息，跳过不存在的ID，保持输入顺序"""
+        pos = self.positions(news_ids)
+        return [self._row(p) for p in pos[pos >= 0]]
+
+    def _row(self, pos: int) -> Dict[str, Any]:
+        row = {'news_id': self.news_ids[pos]}
+        for col in self.columns:
+            row[col] = self._arrays[col][pos]
+        return row
@@ -0,0 +1,129 @@
+"""
+用户画像存储模块
+职责：将用户画像（主题、地区、类别计数、点击历史指纹）持久化到本地 SQLite，
+支持按追加的新点击增量刷新，只在画像缺失或兴趣分布漂移超过阈值时才重新调用大模型
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+def history_fingerprint(click_history: List[str]) -> str:
+    """点击历史指纹"""
+    return hashlib.sha1(" ".join(click_history).encode("utf-8")).hexdigest()
+
+
+def category_drift(old: Counter, new: Counter) -> float:
+    """两个类别计数分布之间的总变差距离（0 表示完全一致，1 表示完全不同）"""
+    old_total, new_total = sum(old.values()), sum(new.values())
+    if not old_total or not new_total:
+        return 1.0 if old_total != new_total else 0.0
+    keys = set(old) | set(new)
+    return 0.5 * sum(abs(old[k] / old_total - new[k] / new_total) for k in keys)
+
+
+@dataclass
+class StoredProfile:
+    """持久化的用户画像"""
+    topics: List[str] = field(default_factory=list)
+    regions: List[str] = field(default_factory=list)
+    category_counts: Counter = field(default_factory=Counter)  # (category, sub_category) -> 次数
+    history_len: int = 0
+    history_fingerprint: str = ""
+    llm_category_counts: Counter = field(default_factory=Counter)  # 上次调用大模型时的类别分布
+    updated_at: float = 0.0
+
+    def new_clicks(self, click_history: List[str]) -> Optional[List[str]]:
+        """若 click_history 是在已存历史之后追加得到的，返回新增点击；否则返回 None"""
+        if len(click_history) < self.history_len:
+            return None
+        if history_fingerprint(click_history[:self.history_len]) != self.history_fingerprint:
+            return None
+        return click_history[self.history_len:]
+
+
+def _encode_counter(counter: Counter) -> str:
+    return json.dumps([[cat, sub, count] for (cat, sub), count in counter.items()], ensure_ascii=False)
+
+
+def _decode_counter(text: str) -> Counter:
+    return Counter({(cat, sub): count for cat, sub, count in json.loads(text)})
+
+
+class ProfileStore:
+    """基于 SQLite 的用户画像存储"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                user_id TEXT PRIMARY KEY,
+                topics TEXT NOT NULL,
+                regions TEXT NOT NULL,
+                category_counts TEXT NOT NULL,
+                history_len INTEGER NOT NULL,
+                history_fingerprint TEXT NOT NULL,
+                llm_category_counts TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def load(self, user_id: str) -> Optional[StoredProfile]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT topics, regions, category_counts, history_len, history_fingerprint, "
+                "llm_category_counts, updated_at FROM profiles WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return StoredProfile(
+            topics=json.loads(row[0]),
+            regions=json.loads(row[1]),
+            category_counts=_decode_counter(row[2]),
+            history_len=row[3],
+            history_fingerprint=row[4],
+            llm_category_counts=_decode_counter(row[5]),
+            updated_at=row[6],
+        )
+
+    def save(self, user_id: str, profile: StoredProfile):
+        profile.updated_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profiles "
+                "(user_id, topics, regions, category_counts, history_len, history_fingerprint, "
+                "llm_category_counts, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    user_id,
+                    json.dumps(profile.topics, ensure_ascii=False),
+                    json.dumps(profile.regions, ensure_ascii=False),
+                    _encode_counter(profile.category_counts),
+                    profile.history_len,
+                    profile.history_fingerprint,
+                    _encode_counter(profile.llm_category_counts),
+                    profile.updated_at,
+                )
+            )
+            self._conn.commit()
+
+    def delete(self, user_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM profiles WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
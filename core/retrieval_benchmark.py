@@ -0,0 +1,376 @@
+"""
+召回基准模块
+职责：用 MIND behaviors.tsv 的曝光记录回放向量召回阶段，衡量召回质量与延迟，结果输出为 JSON 便于跟踪回归
+- 查询：与 NewsRecommender.build_user_vector 相同的用户向量（最近 USER_HISTORY_SIZE 次点击的时间衰减加权均值），
+  与推荐时一样多取 min(历史长度, k) 条再剔除已点击的新闻
+- 质量：recall@k（曝光中被点击的新闻出现在 top-k 中的比例）与 exact_overlap@k（与精确检索 top-k 的重合率）
+- 延迟：单查询顺序执行的 p50 / p95 / p99 与 QPS（只计检索调用本身，查询向量预先算好）
+- 对比：NumPy 精确检索（brute）、本地 IVF（nprobe）、本地 HNSW（m × ef，需 hnswlib）、
+  Qdrant HNSW（m × ef，需 Qdrant 服务）与 Qdrant 精确检索，在多个集合规模下分别测量；
+  规模超过新闻总数时用真实向量加噪声生成干扰向量补齐
+
+用法:
+    python retrieval_benchmark.py --sizes 10000,0 --backends brute,ivf --output retrieval.json
+    python retrieval_benchmark.py --vectors store --backends brute,qdrant --m 8,16,32 --ef 32,64,128
+"""
+
+import json
+import time
+import numpy as np
+import pandas as pd
+from loguru import logger
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from config import Config
+from mind_io import load_news, load_behaviors, parse_impressions
+
+BACKENDS = ("brute", "ivf", "hnsw", "qdrant", "qdrant_exact")
+BENCH_COLLECTION_PREFIX = "bench_retrieval"
+
+
+def news_info_texts(df_news: pd.DataFrame) -> List[str]:
+    """与入库时 news_info 相同格式的嵌入文本"""
+    df = df_news[['category', 'sub_category', 'title', 'abstract']].fillna('')
+    return [
+        f"category:{c} | sub_category:{s} | title:{t} | abstract:{a}"
+        for c, s, t, a in zip(df['category'], df['sub_category'], df['title'], df['abstract'])
+    ]
+
+
+def load_news_vectors(config: Config, df_news: pd.DataFrame, source: str, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    获取新闻向量，返回 (news_id 数组, 归一化向量矩阵)
+    :param source: store（从当前向量存储取回已入库向量）/ embed（用嵌入模型编码）/ random（随机向量，只用于测延迟）
+    """
+    news_ids = df_news['news_id'].astype(str).to_numpy(dtype=object)
+    if source == "random":
+        matrix = np.random.default_rng(seed).standard_normal((len(news_ids), config.EMBEDDING_DIMS)).astype(np.float32)
+    elif source == "embed":
+        from NewsGPT import DeepSeekGPT
+        matrix = np.asarray(DeepSeekGPT(config).get_embeddings(news_info_texts(df_news)), dtype=np.float32)
+    elif source == "store":
+        from db_qdrant import news_point_id
+        from vector_store import create_vector_store
+        store = create_vector_store(config)
+        point_ids = [news_point_id(news_id) for news_id in news_ids]
+        stored: Dict[Any, List[float]] = {}
+        for i in range(0, len(point_ids), 1000):
+            stored.update(store.retrieve_vectors("news_vectors", point_ids[i:i + 1000]))
+        keep = np.array([pid in stored for pid in point_ids], dtype=bool)
+        news_ids = news_ids[keep]
+        matrix = np.asarray([stored[pid] for pid, k in zip(point_ids, keep) if k], dtype=np.float32)
+    else:
+        raise ValueError(f"未知的向量来源: {source}")
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return news_ids, matrix
+
+
+def build_queries(
+    config: Config,
+    df_behaviors: pd.DataFrame,
+    row_of: Dict[str, int],
+    matrix: np.ndarray,
+    num_impressions: int,
+    seed: int = 0
+) -> List[Dict[str, Any]]:
+    """抽样曝光记录并构建查询：用户向量、需剔除的点击历史、曝光中被点击的新闻"""
+    df = df_behaviors.dropna(subset=['click_history', 'impression_lpg'])
+    df = df.sample(frac=1.0, random_state=seed) if num_impressions else df
+    queries = []
+    for history, impressions in zip(df['click_history'], df['impression_lpg']):
+        history = str(history).split()
+        news_ids, labels = parse_impressions(impressions)
+        clicked = [news_id for news_id, label in zip(news_ids, labels) if label == 1 and news_id in row_of]
+        rows = [row_of[news_id] for news_id in history[-config.USER_HISTORY_SIZE:] if news_id in row_of]
+        if not clicked or not rows:
+            continue
+        weights = (config.USER_HISTORY_DECAY ** np.arange(len(rows) - 1, -1, -1)).astype(np.float32)
+        vector = weights @ matrix[rows]
+        queries.append({
+            "vector": vector / max(np.linalg.norm(vector), 1e-12),
+            "history": set(history),
+            "clicked": set(clicked),
+        })
+        if num_impressions and len(queries) >= num_impressions:
+            break
+    return queries
+
+
+def build_collection(
+    news_ids: np.ndarray,
+    matrix: np.ndarray,
+    queries: List[Dict[str, Any]],
+    size: int,
+    seed: int = 0
+) -> Tuple[List[str], np.ndarray]:
+    """
+    构建指定规模的集合：必定包含所有被点击的新闻，其余随机抽取；
+    规模超过新闻总数时，以随机新闻向量加噪声生成干扰向量补齐
+    """
+    rng = np.random.default_rng(seed)
+    row_of = {news_id: row for row, news_id in enumerate(news_ids)}
+    required = sorted({row_of[news_id] for query in queries for news_id in query["clicked"]})
+    size = size or len(news_ids)
+    others = np.setdiff1d(np.arange(len(news_ids)), required)
+    fill = rng.permutation(others)[:max(0, min(size, len(news_ids)) - len(required))]
+    rows = np.concatenate([np.asarray(required, dtype=np.int64), np.sort(fill)])
+    ids = [str(news_ids[row]) for row in rows]
+    vectors = matrix[rows]
+    extra = size - len(rows)
+    if extra > 0:
+        base = matrix[rng.integers(0, len(matrix), extra)]
+        noise = rng.standard_normal(base.shape).astype(np.float32) * (0.5 / np.sqrt(matrix.shape[1]))
+        distractors = base + noise
+        distractors /= np.linalg.norm(distractors, axis=1, keepdims=True)
+        ids += [f"X{i}" for i in range(extra)]
+        vectors = np.vstack([vectors, distractors])
+    return ids, vectors
+
+
+def run_queries(
+    search: Callable[[np.ndarray, int], List[str]],
+    queries: List[Dict[str, Any]],
+    k: int,
+    exact: Optional[List[List[str]]] = None
+) -> Tuple[Dict[str, float], List[List[str]]]:
+    """顺序执行所有查询，返回 (指标, 每个查询剔除历史后的 top-k)"""
+    latencies, results = [], []
+    search(queries[0]["vector"], k)  # 预热
+    for query in queries:
+        limit = k + min(len(query["history"]), k)
+        start = time.perf_counter()
+        found = search(query["vector"], limit)
+        latencies.append(time.perf_counter() - start)
+        results.append([news_id for news_id in found if news_id not in query["history"]][:k])
+
+    recall = [len(query["clicked"] & set(top)) / len(query["clicked"]) for query, top in zip(queries, results)]
+    latency_ms = np.asarray(latencies) * 1000
+    metrics = {
+        "queries": len(queries),
+        f"recall@{k}": round(float(np.mean(recall)), 4),
+        "p50_ms": round(float(np.percentile(latency_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latency_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latency_ms, 99)), 3),
+        "qps": round(len(queries) / float(np.sum(latencies)), 1),
+    }
+    if exact is not None:
+        overlap = [len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(results, exact)]
+        metrics[f"exact_overlap@{k}"] = round(float(np.mean(overlap)), 4)
+    return metrics, results
+
+
+def local_searcher(ids: List[str], vectors: np.ndarray, mode: str, **params) -> Tuple[Callable, float]:
+    """本地索引检索函数与构建耗时（含近似索引构建）"""
+    from local_vector_store import LocalVectorStore
+
+    start = time.perf_counter()
+    store = LocalVectorStore(vectors.shape[1], directory=None, mode=mode, full_scan_threshold=0, **params)
+    for i in range(0, len(ids), 10000):
+        store.add_points("bench", ids[i:i + 10000], [{"news_id": news_id} for news_id in ids[i:i + 10000]], vectors[i:i + 10000])
+    store.search("bench", vectors[0], 1)
+
+    def search(vector: np.ndarray, limit: int) -> List[str]:
+        return [r['payload']['news_id'] for r in store.search("bench", vector, limit)]
+    return search, time.perf_counter() - start
+
+
+def qdrant_collection(store, name: str, ids: List[str], vectors: np.ndarray, m: int, ef_construct: int, timeout: float = 600) -> float:
+    """
+    在 Qdrant 服务上创建基准集合并等待索引完成，返回耗时
+    除 HNSW 参数外沿用 Config 中的集合配置（磁盘存储、量化），小集合也强制建立索引
+    """
+    from qdrant_client.http import models
+    from db_qdrant import news_point_id
+
+    client = store.client
+    start = time.perf_counter()
+    if any(c.name == name for c in client.get_collections().collections):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        **store.collection_config(m=m, ef_construct=ef_construct, full_scan_threshold=1, indexing_threshold=1)
+    )
+    for i in range(0, len(ids), 1000):
+        client.upsert(name, points=models.Batch(
+            ids=[news_point_id(news_id) for news_id in ids[i:i + 1000]],
+            payloads=[{"news_id": news_id} for news_id in ids[i:i + 1000]],
+            vectors=vectors[i:i + 1000].tolist(),
+        ))
+    while time.perf_counter() - start < timeout:
+        info = client.get_collection(name)
+        if info.status == models.CollectionStatus.GREEN and (info.indexed_vectors_count or 0) >= len(ids) * 0.99:
+            break
+        time.sleep(0.5)
+    else:
+        logger.warning(f"等待索引超时: {name}")
+    return time.perf_counter() - start
+
+
+def qdrant_searcher(store, name: str, hnsw_ef: Optional[int] = None, exact: bool = False) -> Callable:
+    client = store.client
+    params = store.search_params(hnsw_ef=hnsw_ef, exact=exact)
+
+    def search(vector: np.ndarray, limit: int) -> List[str]:
+        results = client.search(name, query_vector=vector.tolist(), limit=limit, search_params=params, with_payload=True)
+        return [r.payload['news_id'] for r in results]
+    return search
+
+
+def run_benchmark(
+    config: Config,
+    df_news: pd.DataFrame,
+    df_behaviors: pd.DataFrame,
+    sizes: Sequence[int],
+    backends: Sequence[str],
+    k: int = 10,
+    num_impressions: int = 1000,
+    vectors: str = "store",
+    m_values: Sequence[int] = (16,),
+    ef_values: Sequence[int] = (64,),
+    nprobe_values: Sequence[int] = (16,),
+    ef_construct: int = 100,
+    keep_collections: bool = False,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """在每个集合规模下依次测量各后端与参数组合，返回可直接写成 JSON 的结果"""
+    news_ids, matrix = load_news_vectors(config, df_news, vectors, seed)
+    row_of = {news_id: row for row, news_id in enumerate(news_ids)}
+    queries = build_queries(config, df_behaviors, row_of, matrix, num_impressions, seed)
+    if not queries:
+        raise ValueError("没有可用的曝光记录（需要非空点击历史且至少有一条点击在新闻向量中）")
+    logger.info(f"召回基准 | 新闻向量: {len(news_ids)} | 查询: {len(queries)} | 规模: {list(sizes)} | 后端: {list(backends)}")
+
+    store = None
+    if any(backend.startswith("qdrant") for backend in backends):
+        from db_qdrant import QdrantClientWrapper
+        store = QdrantClientWrapper(config)
+        store.size = int(matrix.shape[1])
+
+    runs = []
+    for size in sizes:
+        ids, collection = build_collection(news_ids, matrix, queries, size, seed)
+
+        def record(backend: str, params: Dict[str, Any], make: Callable[[], Tuple[Callable, float]], exact=None):
+            """测量一个后端 / 参数组合；后端不可用（缺少依赖、服务未启动）时记录错误并继续"""
+            try:
+                search, build_seconds = make()
+                metrics, results = run_queries(search, queries, k, exact)
+            except Exception as e:
+                logger.warning(f"规模 {len(ids)} | {backend} {params} 不可用: {e}")
+                runs.append(dict(size=len(ids), backend=backend, params=params, error=str(e)))
+                return None
+            runs.append(dict(size=len(ids), backend=backend, params=params, build_seconds=round(build_seconds, 3), **metrics))
+            logger.info(f"规模 {len(ids)} | {backend} {params} | {metrics}")
+            return results
+
+        # 精确检索结果作为近似检索的参照
+        exact_search = local_searcher(ids, collection, "exact")
+        if "brute" in backends:
+            exact = record("brute", {}, lambda: exact_search)
+        else:
+            exact = run_queries(exact_search[0], queries, k)[1]
+
+        for nprobe in nprobe_values if "ivf" in backends else []:
+            record("ivf", {"nprobe": nprobe}, lambda: local_searcher(ids, collection, "ivf", ivf_nprobe=nprobe), exact)
+
+        for m in m_values if "hnsw" in backends else []:
+            for ef in ef_values:
+                record("hnsw", {"m": m, "ef": ef},
+                       lambda: local_searcher(ids, collection, "hnsw", hnsw_m=m, hnsw_ef=ef), exact)
+
+        if store is not None:
+            for m in m_values if "qdrant" in backends else m_values[:1]:
+                name = f"{BENCH_COLLECTION_PREFIX}_{len(ids)}_m{m}"
+                try:
+                    build_seconds = qdrant_collection(store, name, ids, collection, m, ef_construct)
+                except Exception as e:
+                    logger.warning(f"规模 {len(ids)} | Qdrant 基准集合创建失败: {e}")
+                    runs.append(dict(size=len(ids), backend="qdrant", params={"m": m}, error=str(e)))
+                    continue
+                if "qdrant_exact" in backends and m == m_values[0]:
+                    record("qdrant_exact", {}, lambda: (qdrant_searcher(store, name, exact=True), build_seconds), exact)
+                for ef in ef_values if "qdrant" in backends else []:
+                    params = {"m": m, "ef_construct": ef_construct, "hnsw_ef": ef, "quantization": config.QDRANT_QUANTIZATION}
+                    record("qdrant", params, lambda: (qdrant_searcher(store, name, hnsw_ef=ef), build_seconds), exact)
+                if not keep_collections:
+                    store.client.delete_collection(name)
+
+    return {
+        "meta": {
+            "k": k,
+            "queries": len(queries),
+            "news_vectors": len(news_ids),
+            "vectors": vectors,
+            "dims": int(matrix.shape[1]),
+            "user_history_size": config.USER_HISTORY_SIZE,
+            "user_history_decay": config.USER_HISTORY_DECAY,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "runs": runs,
+    }
+
+
+def print_summary(result: Dict[str, Any]):
+    k = result["meta"]["k"]
+    print(f"\n📊 召回基准 | 查询: {result['meta']['queries']} | k: {k} | 向量: {result['meta']['vectors']}")
+    print(f"  {'规模':>8} {'后端':<13} {'参数':<40} {'recall':>8} {'重合率':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'QPS':>9}")
+    for run in result["runs"]:
+        params = json.dumps(run["params"], ensure_ascii=False) if run["params"] else "-"
+        if "error" in run:
+            print(f"  {run['size']:>8} {run['backend']:<13} {params:<40} 不可用: {run['error']}")
+            continue
+        overlap = run.get(f"exact_overlap@{k}", "-")
+        print(f"  {run['size']:>8} {run['backend']:<13} {params:<40} {run[f'recall@{k}']:>8} {overlap:>8} "
+              f"{run['p50_ms']:>7}ms {run['p95_ms']:>7}ms {run['p99_ms']:>7}ms {run['qps']:>9}")
+
+
+def main():
+    import argparse
+    from benchmark import make_synthetic_news, make_synthetic_behaviors
+
+    parser = argparse.ArgumentParser(description="向量召回基准：recall@k 与延迟")
+    parser.add_argument("--news", default='MIND/MINDsmall_dev/news.tsv', help="news.tsv 路径")
+    parser.add_argument("--behaviors", default='MIND/MINDsmall_dev/behaviors.tsv', help="behaviors.tsv 路径")
+    parser.add_argument("--synthetic", type=int, default=0, help="使用指定条数的合成数据（配合 --vectors random）")
+    parser.add_argument("--vectors", choices=["store", "embed", "random"], default="store", help="新闻向量来源")
+    parser.add_argument("--sizes", default="0", help="逗号分隔的集合规模（0 表示全部新闻）")
+    parser.add_argument("--backends", default="brute,ivf", help=f"逗号分隔的后端: {','.join(BACKENDS)}")
+    parser.add_argument("--k", type=int, default=10, help="召回条数")
+    parser.add_argument("--impressions", type=int, default=1000, help="回放的曝光记录数（0 表示全部）")
+    parser.add_argument("--m", default="16", help="HNSW m，逗号分隔")
+    parser.add_argument("--ef", default="64", help="HNSW 查询 ef，逗号分隔")
+    parser.add_argument("--ef-construct", type=int, default=100, help="Qdrant HNSW 构建 ef")
+    parser.add_argument("--nprobe", default="16", help="IVF nprobe，逗号分隔")
+    parser.add_argument("--keep-collections", action="store_true", help="保留 Qdrant 上的基准集合")
+    parser.add_argument("--output", default="", help="JSON 结果输出路径（默认只打印）")
+    args = parser.parse_args()
+
+    def ints(value: str) -> List[int]:
+        return [int(v) for v in value.split(",") if v.strip()]
+
+    backends = [b for b in args.backends.split(",") if b]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"未知的后端: {', '.join(sorted(unknown))}")
+
+    config = Config()
+    if args.synthetic:
+        df_news = make_synthetic_news(args.synthetic)
+        df_behaviors = make_synthetic_behaviors(args.synthetic, args.synthetic)
+    else:
+        df_news, df_behaviors = load_news(args.news), load_behaviors(args.behaviors)
+
+    result = run_benchmark(
+        config, df_news, df_behaviors,
+        sizes=ints(args.sizes), backends=backends, k=args.k, num_impressions=args.impressions,
+        vectors=args.vectors, m_values=ints(args.m), ef_values=ints(args.ef), nprobe_values=ints(args.nprobe),
+        ef_construct=args.ef_construct, keep_collections=args.keep_collections,
+    )
+    print_summary(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,26 @@
 职责：专门负责新闻数据的预处理、向量生成和批量入库到Qdrant
 """
 
+import os
+import json
+import time
+import hashlib
 import pandas as pd
-from ast import literal_eval
 from loguru import logger
-from typing import Tuple, List, Dict, Any
+from typing import Tuple, List, Dict, Any, Iterator, Iterable
 from config import Config
-from db_qdrant import QdrantClientWrapper
+from db_qdrant import news_point_id
+from vector_store import create_vector_store, PAYLOAD_INDEX_FIELDS
 from NewsGPT import DeepSeekGPT
-import uuid
+from embedding_engine import EmbeddingEngine
+from mind_io import NEWS_COLUMNS, load_news, iter_news_tsv, parse_entities
+from ingest_pipeline import IngestCheckpoint, IngestManifest, run_pipeline, log_stage_stats
+
+
+def content_hash(values: Iterable[Any]) -> str:
+    """新闻内容哈希（字段值按固定顺序序列化后取 sha1）"""
+    payload = json.dumps(list(values), ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
 
 class NewsDataProcessor:
@@ -19,19 +31,13 @@ class NewsDataProcessor:
     def __init__(self, config: Config = None):
         self.config = config or Config()
         self.gpt = DeepSeekGPT(self.config)
-        self.qdrant = QdrantClientWrapper(self.config)
+        # 嵌入引擎：EMBEDDING_WORKERS > 1 时多进程并行编码，否则等同于 gpt.get_embeddings
+        self.embedder = EmbeddingEngine(self.gpt, num_workers=self.config.EMBEDDING_WORKERS)
+        self.qdrant = create_vector_store(self.config)
     
     def load_news_data(self, file_path: str = 'MIND/MINDsmall_train/news.tsv') -> pd.DataFrame:
         """加载新闻数据"""
-        df = pd.read_csv(
-            file_path,
-            names=[
-                "news_id", "category", "sub_category", "title", "abstract",
-                "url", "title_entities", "abstract_entities"
-            ],
-            sep='\t',
-            header=None
-        )
+        df = load_news(file_path)
         logger.info(f"新闻数据加载完成 | 记录数: {len(df)}")
         return df
     
@@ -40,19 +46,26 @@ class NewsDataProcessor:
         数据预处理
         - 转换实体列表
         - 填充缺失值  
+        - 计算内容哈希（写入 payload，供增量入库比对）
         - 创建新闻信息字符串
         """
         df_news = df_news.copy()
         
-        # 安全转换字符串表示的列表
+        # 安全转换字符串表示的列表（列式缓存中已预先解析，直接复用）
         for col in ['title_entities', 'abstract_entities']:
             if col in df_news.columns:
-                df_news[col] = df_news[col].apply(
-                    lambda x: literal_eval(x) if pd.notna(x) and x.strip() else []
-                )
+                df_news[col] = df_news[col].apply(parse_entities)
         
-        # 填充缺失值并创建新闻信息
-        df_news = df_news.fillna('')
+        # 填充缺失值并创建新闻信息（categorical 列不含缺失值，跳过以免引入新类别）
+        df_news = df_news.fillna({
+            col: '' for col in df_news.columns
+            if not isinstance(df_news[col].dtype, pd.CategoricalDtype)
+        })
+        # 实体已统一解析为列表，原始 TSV 与列式缓存得到的哈希一致
+        hash_columns = [col for col in NEWS_COLUMNS if col in df_news.columns]
+        df_news['content_hash'] = [
+            content_hash(values) for values in zip(*(df_news[col].tolist() for col in hash_columns))
+        ]
         info_parts = ["category", "sub_category", "title", "abstract"]
         
         # 仅包含实际存在的列
@@ -62,7 +75,7 @@ class NewsDataProcessor:
             axis=1
         )
         
-        logger.info(f"数据预处理完成 | 记录数: {len(df_news)}")
+        logger.debug(f"数据预处理完成 | 记录数: {len(df_news)}")
         return df_news, df_news['news_info'].tolist()
     
     def compute_embeddings_batch(
@@ -75,11 +88,11 @@ class NewsDataProcessor:
         
         for i in range(0, len(texts), batch_size):
             batch = texts[i:i + batch_size]
-            embeddings = self.gpt.get_embeddings(batch)
+            embeddings = self.embedder.encode(batch)
             all_embeddings.extend(embeddings)#extend 添加
             logger.info(f"嵌入计算进度: {min(i + batch_size, len(texts))}/{len(texts)}")
         
-        logger.success(f"嵌入计算完成 | 总数: {len(all_embeddings)}")
+        logger.success(f"嵌入计算完成 | 总数: {len(all_embeddings)} | 缓存统计: {self.gpt.embedding_cache.stats()}")
         return all_embeddings
     
     def save_to_qdrant(
@@ -91,7 +104,7 @@ class NewsDataProcessor:
     ) -> bool:
         """将数据批量保存到Qdrant"""
         df_news = df_news.copy()
-        df_news['point_id'] = [str(uuid.uuid5(uuid.NAMESPACE_DNS, str(nid))) for nid in df_news['news_id']]
+        df_news['point_id'] = [news_point_id(nid) for nid in df_news['news_id']]
         ids = df_news['point_id'].tolist()
         
         # 确保集合存在
@@ -123,35 +136,194 @@ class NewsDataProcessor:
         logger.success(f"数据插入完成 | 总数: {total_points} | 集合: {collection_name}")
         return True
     
+    def ensure_payload_indexes(self, collection_name: str):
+        """为类别 / 子类别字段建立 payload 索引（推荐时按类别过滤由向量库直接完成）；失败只影响过滤检索速度"""
+        for field_name in PAYLOAD_INDEX_FIELDS:
+            if not self.qdrant.ensure_payload_index(collection_name, field_name):
+                logger.warning(f"payload 索引不可用，按 {field_name} 过滤的检索将退化为全量扫描")
+    
+    def get_checkpoint(self, file_path: str, collection_name: str) -> IngestCheckpoint:
+        """获取某个源文件写入某个集合的入库检查点"""
+        path = os.path.join(self.config.INGEST_CHECKPOINT_DIR, f"{collection_name}.checkpoint.json")
+        return IngestCheckpoint(path, file_path, collection_name)
+    
+    def get_manifest(self, collection_name: str) -> IngestManifest:
+        """获取集合的入库清单（news_id -> 内容哈希）"""
+        return IngestManifest(os.path.join(self.config.INGEST_CHECKPOINT_DIR, f"{collection_name}.manifest.json"))
+    
+    def load_manifest(self, collection_name: str) -> Dict[str, str]:
+        """读取入库清单；本地清单不存在时从集合 payload 中的 content_hash 重建"""
+        manifest = self.get_manifest(collection_name)
+        if manifest.exists() or not self.qdrant.collection_exists(collection_name):
+            return manifest.load()
+        logger.info(f"本地入库清单不存在，从集合 payload 重建: {collection_name}")
+        hashes = {
+            payload['news_id']: payload.get('content_hash', '')
+            for _, payload in self.qdrant.scroll_payloads(collection_name, ['news_id', 'content_hash'])
+            if 'news_id' in payload
+        }
+        manifest.save(hashes)
+        return hashes
+    
     def process_and_save(
         self,
         file_path: str = 'MIND/MINDsmall_train/news.tsv',
         collection_name: str = "news_vectors",
-        batch_size: int = 500
+        batch_size: int = 500,
+        resume: bool = True
     ) -> bool:
-        """完整的数据处理和入库流程"""
+        """
+        完整的数据处理和入库流程（流式流水线）
+        读取 -> 预处理 -> 嵌入 -> 写入 四个阶段并行，每批写入后更新检查点；
+        resume=True 时从上次最后提交的位置继续，False 时从头开始
+        """
         try:
-            # 1. 加载数据
-            df_news = self.load_news_data(file_path)
+            if not self.qdrant.create_collection(collection_name):
+                return False
+            self.ensure_payload_indexes(collection_name)
             
-            # 2. 预处理
-            df_news, news_info_list = self.preprocess_data(df_news)
+            checkpoint = self.get_checkpoint(file_path, collection_name)
+            start_offset = checkpoint.load_offset() if resume else 0
+            if start_offset and self.qdrant.get_points_count(collection_name) <= 0:
+                start_offset = 0  # 集合已被清空，检查点失效
+            if start_offset:
+                logger.info(f"从检查点续传 | 已提交行数: {start_offset}")
+            committed = start_offset
+            manifest = self.load_manifest(collection_name)
             
-            # 3. 计算嵌入向量
-            embeddings = self.compute_embeddings_batch(news_info_list, batch_size)
+            def upsert(batch: Tuple[pd.DataFrame, List[List[float]]]):
+                nonlocal committed
+                df_batch, embeddings = batch
+                if not self.add_batch(df_batch, embeddings, collection_name):
+                    raise RuntimeError(f"批次写入失败 | 起始行: {df_batch.index[0]}")
+                manifest.update(zip(df_batch['news_id'], df_batch['content_hash']))
+                committed = int(df_batch.index[-1]) + 1
+                checkpoint.save(committed)
             
-            # 4. 保存到Qdrant
-            return self.save_to_qdrant(df_news, embeddings, collection_name, batch_size)
+            start = time.perf_counter()
+            try:
+                stats = run_pipeline(
+                    self.iter_batches(file_path, batch_size, start_offset),
+                    [
+                        ("preprocess", lambda df_batch: self.preprocess_data(df_batch)),
+                        ("embed", lambda batch: (batch[0], self.embedder.encode(batch[1]))),
+                        ("upsert", upsert),
+                    ],
+                    queue_size=self.config.INGEST_QUEUE_SIZE,
+                    count_rows=lambda batch: len(batch[0]) if isinstance(batch, tuple) else len(batch)
+                )
+            finally:
+                self.get_manifest(collection_name).save(manifest)
+            checkpoint.save(committed, completed=True)
+            
+            log_stage_stats(stats, time.perf_counter() - start)
+            logger.success(
+                f"数据入库完成 | 本次写入: {committed - start_offset} | 累计: {committed} | 集合: {collection_name} | "
+                f"缓存统计: {self.gpt.embedding_cache.stats()}"
+            )
+            return True
             
         except Exception as e:
             logger.error(f"数据处理失败: {str(e)}")
             return False
+    
+    def process_delta(
+        self,
+        file_path: str = 'MIND/MINDsmall_train/news.tsv',
+        collection_name: str = "news_vectors",
+        batch_size: int = 500
+    ) -> bool:
+        """
+        增量入库：与入库清单中的内容哈希比对，只嵌入并写入新增或内容变化的新闻，删除新文件中已不存在的新闻
+        """
+        try:
+            if not self.qdrant.create_collection(collection_name):
+                return False
+            self.ensure_payload_indexes(collection_name)
+            
+            start = time.perf_counter()
+            df_news, _ = self.preprocess_data(self.load_news_data(file_path))
+            df_news = df_news.drop_duplicates('news_id').reset_index(drop=True)
+            manifest = self.load_manifest(collection_name)
+            
+            changed = df_news[[manifest.get(nid) != h for nid, h in zip(df_news['news_id'], df_news['content_hash'])]]
+            added = int((~changed['news_id'].isin(manifest.keys())).sum())
+            removed = sorted(set(manifest) - set(df_news['news_id']))
+            logger.info(
+                f"增量比对完成 | 当前: {len(df_news)} | 新增: {added} | 变化: {len(changed) - added} | "
+                f"删除: {len(removed)} | 耗时: {time.perf_counter() - start:.2f}s"
+            )
+            
+            def upsert(batch: Tuple[pd.DataFrame, List[List[float]]]):
+                df_batch, embeddings = batch
+                if not self.add_batch(df_batch, embeddings, collection_name):
+                    raise RuntimeError(f"批次写入失败 | 起始行: {df_batch.index[0]}")
+                manifest.update(zip(df_batch['news_id'], df_batch['content_hash']))
+            
+            try:
+                if len(changed):
+                    stats = run_pipeline(
+                        (changed.iloc[i:i + batch_size] for i in range(0, len(changed), batch_size)),
+                        [
+                            ("embed", lambda df_batch: (df_batch, self.embedder.encode(df_batch['news_info'].tolist()))),
+                            ("upsert", upsert),
+                        ],
+                        queue_size=self.config.INGEST_QUEUE_SIZE,
+                        count_rows=lambda batch: len(batch[0]) if isinstance(batch, tuple) else len(batch)
+                    )
+                    log_stage_stats(stats, time.perf_counter() - start)
+                if removed:
+                    if not self.qdrant.delete_points(collection_name, [news_point_id(nid) for nid in removed]):
+                        raise RuntimeError("删除已下线新闻失败")
+                    for news_id in removed:
+                        manifest.pop(news_id, None)
+            finally:
+                self.get_manifest(collection_name).save(manifest)
+            
+            logger.success(
+                f"增量入库完成 | 写入: {len(changed)} | 删除: {len(removed)} | "
+                f"总耗时: {time.perf_counter() - start:.2f}s | 集合: {collection_name}"
+            )
+            return True
+        
+        except Exception as e:
+            logger.error(f"增量入库失败: {str(e)}")
+            return False
+    
+    def iter_batches(self, file_path: str, batch_size: int, start_offset: int = 0) -> Iterator[pd.DataFrame]:
+        """分块读取新闻 TSV，跳过 start_offset 之前已提交的行（索引为文件中的行偏移）"""
+        for chunk in iter_news_tsv(file_path, batch_size):
+            if chunk.index[-1] < start_offset:
+                continue
+            yield chunk.loc[start_offset:] if chunk.index[0] < start_offset else chunk
+    
+    def add_batch(self, df_batch: pd.DataFrame, embeddings: List[List[float]], collection_name: str) -> bool:
+        """写入一批预处理后的新闻（点ID由 news_id 确定性生成，重复写入是幂等的）"""
+        df_batch = df_batch.copy()
+        df_batch['point_id'] = [news_point_id(nid) for nid in df_batch['news_id']]
+        return self.qdrant.add_points(
+            collection_name=collection_name,
+            ids=df_batch['point_id'].tolist(),
+            vectors=embeddings,
+            payloads=df_batch.to_dict(orient='records')
+        )
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="新闻数据入库")
+    parser.add_argument("--file", default='MIND/MINDsmall_train/news.tsv', help="news.tsv 路径")
+    parser.add_argument("--collection", default="news_vectors", help="Qdrant 集合名")
+    parser.add_argument("--delta", action="store_true", help="增量入库：只写入新增/变化的新闻并删除已移除的新闻")
+    args = parser.parse_args()
+    
     # 执行数据入库
     processor = NewsDataProcessor()
-    success = processor.process_and_save()
+    if args.delta:
+        success = processor.process_delta(args.file, args.collection)
+    else:
+        success = processor.process_and_save(args.file, args.collection)
     
     if success:
         print("✅ 新闻数据入库完成")
@@ -0,0 +1,165 @@
+"""
+共享资源模块
+职责：进程内共享、首次使用时才创建的重量级对象
+- 嵌入模型与嵌入缓存（按模型路径 + 推理后端区分）
+- OpenAI 同步 / 异步客户端（按 API 地址 + 密钥区分）
+- Qdrant 同步 / 异步客户端（按主机 + 端口区分）
+- 大模型请求限流器（同一 API 的所有请求共用一个并发与速率额度）
+- 离线训练的点击率排序模型
+- 离线构建的共同点击近邻表（内存映射）
+多个 DeepSeekGPT / QdrantClientWrapper 实例（入库处理器、推荐器、各个页面）拿到的是同一份对象，
+一个进程内每种资源只加载一次，且只在真正用到时加载
+"""
+
+import threading
+from loguru import logger
+from typing import Any, Callable, Dict, Hashable, Tuple
+from config import Config
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+
+_resources: Dict[Tuple[str, Hashable], Any] = {}
+# 加载失败的资源占位（get_shared 不缓存 None）
+_UNAVAILABLE = object()
+_lock = threading.RLock()
+
+
+def get_shared(kind: str, key: Hashable, factory: Callable[[], Any]) -> Any:
+    """获取共享资源，不存在时调用 factory 创建（同一资源只创建一次）"""
+    resource = _resources.get((kind, key))
+    if resource is None:
+        with _lock:
+            resource = _resources.get((kind, key))
+            if resource is None:
+                resource = factory()
+                _resources[(kind, key)] = resource
+    return resource
+
+
+def loaded_resources() -> Dict[str, int]:
+    """当前已创建的各类资源数量"""
+    counts: Dict[str, int] = {}
+    for kind, _ in list(_resources):
+        counts[kind] = counts.get(kind, 0) + 1
+    return counts
+
+
+def clear_shared():
+    """清空共享资源（测试与基准使用）"""
+    with _lock:
+        _resources.clear()
+
+
+def get_embedding_model(config: Config):
+    from embedding_backend import load_embedding_model
+
+    def load():
+        logger.info(f"加载嵌入模型 | 后端: {config.EMBEDDING_BACKEND}")
+        return load_embedding_model(config.EMBEDDING_MODEL, config.EMBEDDING_BACKEND, config.EMBEDDING_ONNX_DIR)
+
+    key = (config.EMBEDDING_MODEL, config.EMBEDDING_BACKEND, config.EMBEDDING_ONNX_DIR)
+    return get_shared("embedding_model", key, load)
+
+
+def get_embedding_cache(config: Config):
+    """嵌入向量缓存（维度取自 EMBEDDING_DIMS，不加载模型：全部命中缓存的请求不需要模型）"""
+    from embedding_cache import EmbeddingCache
+    from embedding_backend import embedding_model_id
+
+    model_id = embedding_model_id(config.EMBEDDING_MODEL, config.EMBEDDING_BACKEND)
+    return get_shared(
+        "embedding_cache",
+        (model_id, config.EMBEDDING_CACHE_DIR, config.EMBEDDING_CACHE_SIZE),
+        # 键包含模型标识与后端，换模型或后端不会命中旧向量
+        lambda: EmbeddingCache(
+            model_id=model_id,
+            dims=config.EMBEDDING_DIMS,
+            cache_dir=config.EMBEDDING_CACHE_DIR,
+            max_memory_items=config.EMBEDDING_CACHE_SIZE
+        )
+    )
+
+
+def get_openai_client(config: Config):
+    import openai
+    return get_shared(
+        "openai_client",
+        (DEEPSEEK_BASE_URL, config.DEEPSEEK_API_KEY),
+        lambda: openai.OpenAI(api_key=config.DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
+    )
+
+
+def get_async_openai_client(config: Config):
+    import openai
+    return get_shared(
+        "async_openai_client",
+        (DEEPSEEK_BASE_URL, config.DEEPSEEK_API_KEY),
+        lambda: openai.AsyncOpenAI(api_key=config.DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
+    )
+
+
+def get_request_limiter(config: Config):
+    from async_runner import AsyncRateLimiter
+    return get_shared(
+        "request_limiter",
+        (DEEPSEEK_BASE_URL, config.LLM_MAX_CONCURRENCY, config.LLM_RATE_LIMIT),
+        lambda: AsyncRateLimiter(config.LLM_MAX_CONCURRENCY, config.LLM_RATE_LIMIT)
+    )
+
+
+def get_ctr_model(config: Config):
+    """
+    离线训练的点击率模型；模型文件不存在或无法加载时返回 None
+    按路径与 mtime 缓存（不可用的结果也缓存，警告只记录一次），重新训练写入模型文件后自动加载新模型
+    """
+    import os
+    from ctr_model import LogisticCTRModel
+
+    path = config.CTR_MODEL_PATH
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+
+    def load():
+        if mtime is None:
+            logger.warning(f"CTR 模型文件不存在，ctr 排序使用本地加权打分: {path}")
+            return _UNAVAILABLE
+        try:
+            logger.info(f"加载 CTR 模型: {path}")
+            return LogisticCTRModel.load(path)
+        except Exception as e:
+            logger.warning(f"CTR 模型无法加载，ctr 排序使用本地加权打分: {path} | {str(e)}")
+            return _UNAVAILABLE
+
+    model = get_shared("ctr_model", (path, mtime), load)
+    return None if model is _UNAVAILABLE else model
+
+
+def get_coclick_table(config: Config):
+    """离线构建的共同点击近邻表（按 meta.json 的 mtime 区分，重新构建后自动加载新表；目录不存在时抛出 FileNotFoundError）"""
+    import os
+    from coclick import COCLICK_META_FILE, load_coclick
+
+    def load():
+        logger.info(f"加载共同点击近邻表: {config.COCLICK_PATH}")
+        return load_coclick(config.COCLICK_PATH)
+
+    meta_path = os.path.join(config.COCLICK_PATH, COCLICK_META_FILE)
+    version = os.path.getmtime(meta_path) if os.path.exists(meta_path) else None
+    return get_shared("coclick", (config.COCLICK_PATH, version), load)
+
+
+def get_qdrant_client(config: Config):
+    from qdrant_client import QdrantClient
+    return get_shared(
+        "qdrant_client",
+        (config.QDRANT_HOST, config.QDRANT_PORT),
+        lambda: QdrantClient(host=config.QDRANT_HOST, port=config.QDRANT_PORT)
+    )
+
+
+def get_async_qdrant_client(config: Config):
+    from qdrant_client import AsyncQdrantClient
+    return get_shared(
+        "async_qdrant_client",
+        (config.QDRANT_HOST, config.QDRANT_PORT),
+        lambda: AsyncQdrantClient(host=config.QDRANT_HOST, port=config.QDRANT_PORT)
+    )
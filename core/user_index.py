@@ -0,0 +1,73 @@
+"""
+用户行为索引模块
+职责：一次性为 behaviors.tsv 建立 user_id -> 曝光记录连续切片的索引，并预先切分点击历史，
+替代 df_behaviors[df_behaviors['user_id'] == user_id] 这类逐条全表扫描
+"""
+
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+from mind_io import ClickHistories, encode_click_histories
+
+
+class UserBehaviorIndex:
+    """用户行为索引：O(1) 的用户存在性判断、曝光记录定位和点击历史获取"""
+
+    def __init__(self, df_behaviors: pd.DataFrame, histories: Optional[ClickHistories] = None):
+        """
+        :param df_behaviors: 用户行为数据
+        :param histories: 与 df_behaviors 行对齐的偏移编码点击历史（来自列式缓存），为空时现场编码
+        """
+        user_codes, user_ids = pd.factorize(df_behaviors['user_id'].to_numpy(dtype=object), sort=False)
+        self.user_ids = np.asarray(user_ids, dtype=object)
+        self._user_pos = {uid: i for i, uid in enumerate(self.user_ids)}
+
+        # 按用户稳定排序：同一用户的曝光记录在 _rows 中连续，且保持原始先后顺序
+        self._rows = np.argsort(user_codes, kind='stable')
+        counts = np.bincount(user_codes, minlength=len(self.user_ids))
+        self._starts = np.zeros(len(self.user_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._starts[1:])
+
+        # 每个用户取第一条曝光记录的点击历史（与 get_user_history(...).iloc[0] 一致）
+        first_rows = self._rows[self._starts[:-1]]
+        if histories is not None and len(histories) == len(df_behaviors):
+            self._history_vocab = histories.vocab
+            lengths = histories.offsets[first_rows + 1] - histories.offsets[first_rows]
+            self._history_offsets = np.zeros(len(first_rows) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=self._history_offsets[1:])
+            gather = np.repeat(histories.offsets[first_rows] - self._history_offsets[:-1], lengths)
+            self._history_codes = histories.codes[gather + np.arange(self._history_offsets[-1])]
+        else:
+            encoded = encode_click_histories(df_behaviors['click_history'].iloc[first_rows])
+            self._history_vocab = encoded.vocab
+            self._history_offsets = encoded.offsets
+            self._history_codes = encoded.codes
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._user_pos
+
+    def impression_rows(self, user_id: str) -> np.ndarray:
+        """返回用户所有曝光记录在 df_behaviors 中的行号（按原始顺序），用户不存在时为空"""
+        pos = self._user_pos.get(user_id)
+        if pos is None:
+            return np.zeros(0, dtype=np.int64)
+        return self._rows[self._starts[pos]:self._starts[pos + 1]]
+
+    def get_history(self, df_behaviors: pd.DataFrame, user_id: str, sample_size: int = 10) -> pd.DataFrame:
+        """获取用户的行为记录（前 sample_size 条）"""
+        return df_behaviors.iloc[self.impression_rows(user_id)[:sample_size]]
+
+    def histories(self) -> ClickHistories:
+        """每个用户一行的偏移编码点击历史（行顺序与 user_ids 一致）"""
+        return ClickHistories(vocab=self._history_vocab, offsets=self._history_offsets, codes=self._history_codes)
+
+    def click_history(self, user_id: str) -> List[str]:
+        """获取用户点击历史的新闻ID列表，用户不存在或无点击时为空列表"""
+        pos = self._user_pos.get(user_id)
+        if pos is None:
+            return []
+        codes = self._history_codes[self._history_offsets[pos]:self._history_offsets[pos + 1]]
+        return self._history_vocab[codes].tolist()
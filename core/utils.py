@@ -3,13 +3,30 @@
 职责：用户画像分析、推荐算法、向量搜索等核心推荐逻辑
 """
 
+import asyncio
+import os
+import time
+import numpy as np
 import pandas as pd
 from loguru import logger
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Optional, AsyncIterator, Iterator, Iterable
 from collections import Counter
+from itertools import zip_longest
+from qdrant_client.http import models
 from config import Config
 from NewsGPT import DeepSeekGPT
-from db_qdrant import QdrantClientWrapper
+from db_qdrant import news_point_id
+from vector_store import create_vector_store
+from news_catalog import NewsCatalog
+from user_index import UserBehaviorIndex
+from data_store import get_data_store
+from profile_store import ProfileStore, StoredProfile, history_fingerprint, category_drift
+from async_runner import run_sync, iterate_sync
+from fast_ranker import FastRanker, NewsPriors, build_news_priors, candidate_features
+from ctr_model import EntityIndex, ctr_features
+from shared_resources import get_coclick_table, get_ctr_model
+from coclick import CoClickNeighbours, build_coclick
+from candidate_sources import CandidateBudget, CandidateSet, NewsPools, merge_sources, parse_sources, preferred_categories, take
 import re
 
 
@@ -19,67 +36,143 @@ class NewsRecommender:
     def __init__(self, config: Config = None):
         self.config = config or Config()
         self.gpt = DeepSeekGPT(self.config)
-        self.qdrant = QdrantClientWrapper(self.config)
+        # 向量存储（VECTOR_STORE 选择 Qdrant 服务或进程内本地索引）
+        self.qdrant = create_vector_store(self.config)
         self.news_collection = "news_vectors"
+        self.data_store = get_data_store()
+        self.profile_store = ProfileStore(self.config.PROFILE_STORE_PATH) if self.config.PROFILE_STORE_PATH else None
+        self.ranker = FastRanker.from_config(self.config)
+        # 进程内各候选来源累计贡献进候选集合的条数
+        self.candidate_hits: Counter = Counter()
     
     def load_news_data(self, file_path: str = 'MIND/MINDsmall_train/news.tsv') -> pd.DataFrame:
-        """加载新闻数据（只加载，不处理）"""
-        df = pd.read_csv(
-            file_path,
-            names=[
-                "news_id", "category", "sub_category", "title", "abstract",
-                "url", "title_entities", "abstract_entities"
-            ],
-            sep='\t',
-            header=None
-        )
-       # logger.info(f"新闻数据加载完成 | 记录数: {len(df)}")
+        """加载新闻数据（只加载，不处理；进程内共享，文件未变化时不重复解析）"""
+        df = self.data_store.get_news(file_path)
+        self.get_catalog(df)  # 加载时一次性建立目录索引
         return df
     
+    def get_catalog(self, df_news: pd.DataFrame) -> NewsCatalog:
+        """获取新闻目录索引（同一份数据只构建一次）"""
+        return self.data_store.catalog_for(df_news)
+    
     def load_behaviors_data(self, file_path: str = 'MIND/MINDsmall_train/behaviors.tsv') -> pd.DataFrame:
-        """加载用户行为数据"""
-        df = pd.read_csv(
-            file_path,
-            names=[
-                "impression_id", "user_id", "time",
-                "click_history", "impression_lpg"
-            ],
-            sep='\t',
-            header=None
-        )
-        #logger.info(f"用户行为数据加载完成 | 记录数: {len(df)}")
-        return df
+        """加载用户行为数据（进程内共享，文件未变化时不重复解析）"""
+        return self.data_store.get_behaviors(file_path)
+    
+    def get_user_index(self, df_behaviors: pd.DataFrame) -> UserBehaviorIndex:
+        """获取用户行为索引（同一份数据只构建一次）"""
+        return self.data_store.user_index_for(df_behaviors)
+    
+    def user_exists(self, df_behaviors: pd.DataFrame, user_id: str) -> bool:
+        """判断用户是否存在于行为数据中"""
+        return user_id in self.get_user_index(df_behaviors)
     
     def get_user_history(self, df_behaviors: pd.DataFrame, user_id: str, sample_size: int = 10) -> pd.DataFrame:
         """获取特定用户的行为历史"""
-        user_behaviors = df_behaviors[df_behaviors['user_id'] == user_id]
-        return user_behaviors.head(sample_size)
+        return self.get_user_index(df_behaviors).get_history(df_behaviors, user_id, sample_size)
+    
+    def get_click_history(self, df_behaviors: pd.DataFrame, user_id: str) -> List[str]:
+        """获取特定用户的点击历史新闻ID列表"""
+        return self.get_user_index(df_behaviors).click_history(user_id)
     
     def analyze_user_categories(self, df_news: pd.DataFrame, click_history: List[str]) -> Dict[str, Any]:
         """分析用户偏好类别"""
-        category_counter = Counter()
-        
-        for news_id in click_history:
-            news = df_news[df_news['news_id'] == news_id]
-            if not news.empty:
-                category = news['category'].values[0]
-                sub_category = news['sub_category'].values[0]
-                category_counter.update([(category, sub_category)])
+        category_counter = self.count_categories(df_news, click_history)
         
         return {
             "favorite_categories": dict(category_counter.most_common(5)),
             "top_category": category_counter.most_common(1)[0] if category_counter else None
         }
     
+    def count_categories(self, df_news: pd.DataFrame, news_ids: List[str]) -> Counter:
+        """统计一组新闻的 (category, sub_category) 出现次数"""
+        catalog = self.get_catalog(df_news)
+        categories = catalog.column('category', news_ids)
+        sub_categories = catalog.column('sub_category', news_ids)
+        return Counter(zip(categories, sub_categories))
+    
     def generate_user_profile(self, df_news: pd.DataFrame, click_history: List[str]) -> Dict[str, Any]:
         """生成完整用户画像"""
+        topics, regions = self.generate_profile_topics(df_news, click_history)
+        
+        # 分析类别偏好
+        category_analysis = self.analyze_user_categories(df_news, click_history)
+        
+        return {
+            "topics": topics,
+            "regions": regions,
+            "favorite_categories": category_analysis["favorite_categories"],
+            "click_history": click_history[:10]  # 保留最近10个点击
+        }
+    
+    def get_user_profile(self, df_news: pd.DataFrame, user_id: str, click_history: List[str]) -> Dict[str, Any]:
+        """get_user_profile_async 的同步接口"""
+        return run_sync(self.get_user_profile_async(df_news, user_id, click_history))
+    
+    async def get_user_profile_async(self, df_news: pd.DataFrame, user_id: str, click_history: List[str]) -> Dict[str, Any]:
+        """
+        获取用户画像：优先读取持久化画像并增量刷新
+        - 历史只追加时，类别计数只处理新增点击
+        - 仅当画像缺失或类别分布漂移超过阈值时才重新调用大模型（异步客户端）
+        """
+        profile, changed, needs_llm = self._refresh_profile(df_news, user_id, click_history)
+        if needs_llm:
+            profile.topics, profile.regions = await self.generate_profile_topics_async(df_news, click_history)
+        return self._finish_profile(user_id, profile, click_history, changed or needs_llm)
+    
+    def _refresh_profile(self, df_news: pd.DataFrame, user_id: str, click_history: List[str]) -> Tuple[StoredProfile, bool, bool]:
+        """读取已存画像并增量刷新类别计数，返回 (画像, 计数是否变化, 是否需要重新调用大模型)"""
+        profile = self.profile_store.load(user_id) if self.profile_store is not None else None
+        new_clicks = profile.new_clicks(click_history) if profile is not None else None
+        if profile is None:
+            profile = StoredProfile(category_counts=self.count_categories(df_news, click_history))
+        elif new_clicks is None:
+            # 历史不是在已存历史之后追加得到的，全量重算类别计数
+            profile.category_counts = self.count_categories(df_news, click_history)
+        elif new_clicks:
+            profile.category_counts.update(self.count_categories(df_news, new_clicks))
+        
+        drift = category_drift(profile.llm_category_counts, profile.category_counts)
+        needs_llm = not profile.updated_at or drift > self.config.PROFILE_DRIFT_THRESHOLD
+        if needs_llm:
+            logger.info(f"用户 {user_id} 画像需要重新生成 | 漂移: {drift:.2f}")
+            profile.llm_category_counts = Counter(profile.category_counts)
+        return profile, new_clicks != [], needs_llm
+    
+    def _finish_profile(self, user_id: str, profile: StoredProfile, click_history: List[str], changed: bool) -> Dict[str, Any]:
+        """保存有变化的画像，返回推荐流程使用的画像字典"""
+        if changed and self.profile_store is not None:
+            profile.history_len = len(click_history)
+            profile.history_fingerprint = history_fingerprint(click_history)
+            self.profile_store.save(user_id, profile)
+        
+        return {
+            "topics": profile.topics,
+            "regions": profile.regions,
+            "favorite_categories": dict(profile.category_counts.most_common(5)),
+            "click_history": click_history[:10]  # 保留最近10个点击
+        }
+    
+    def generate_profile_topics(self, df_news: pd.DataFrame, click_history: List[str]) -> Tuple[List[str], List[str]]:
+        """generate_profile_topics_async 的同步接口"""
+        return run_sync(self.generate_profile_topics_async(df_news, click_history))
+    
+    async def generate_profile_topics_async(self, df_news: pd.DataFrame, click_history: List[str]) -> Tuple[List[str], List[str]]:
+        """调用大模型根据浏览历史生成兴趣主题和关注地区"""
+        prompt = self._build_profile_prompt(df_news, click_history)
+        user_profile_text = await self.gpt.get_completion_async(prompt, temperature=0.5)
+        #logger.info(f"GPT生成用户画像: {user_profile_text}")
+        return self._parse_profile_topics(user_profile_text)
+    
+    def _build_profile_prompt(self, df_news: pd.DataFrame, click_history: List[str]) -> str:
+        """构建生成用户画像的提示词"""
         # 生成历史记录摘要
         historical_records = []
         #枚举功能：enumerate(..., start=1) 将这 10 条新闻 ID 转换为带序号的元组 (序号, 新闻ID)，序号从 1 开始。
+        catalog = self.get_catalog(df_news)
         for idx, news_id in enumerate(click_history[:10], start=1):
-            news = df_news[df_news['news_id'] == news_id]
-            if not news.empty:
-                row = news.iloc[0]#iloc[0] 用于获取 DataFrame 的第一行数据
+            row = catalog.get(news_id)
+            if row is not None:
                 record = f"{idx}. category:{row['category']} | sub_category:{row['sub_category']} | title:{row['title']}"
                 historical_records.append(record)
         
@@ -100,18 +193,14 @@ class NewsRecommender:
 """
         
         logger.debug(f"生成用户画像提示: {prompt[:200]}...")
-        user_profile_text = self.gpt.get_completion(prompt, temperature=0.5)
-        #logger.info(f"GPT生成用户画像: {user_profile_text}")
-        
-        # 分析类别偏好
-        category_analysis = self.analyze_user_categories(df_news, click_history)
-        
-        return {
-            "topics": self._extract_profile_section(user_profile_text, "topics"),
-            "regions": self._extract_profile_section(user_profile_text, "region"),
-            "favorite_categories": category_analysis["favorite_categories"],
-            "click_history": click_history[:10]  # 保留最近10个点击
-        }
+        return prompt
+    
+    def _parse_profile_topics(self, user_profile_text: str) -> Tuple[List[str], List[str]]:
+        """从大模型回复中解析兴趣主题和关注地区"""
+        return (
+            self._extract_profile_section(user_profile_text, "topics"),
+            self._extract_profile_section(user_profile_text, "region")
+        )
     
     def _extract_profile_section(self, profile: str, section: str) -> List[str]:
         """从GPT生成的用户画像文本中提取特定部分"""
@@ -129,51 +218,574 @@ class NewsRecommender:
             logger.warning(f"无法解析{section}部分: {profile[:100]}...")
             return []
     
-    def vector_search_candidates(self, query_text: str, limit: int = 30) -> List[str]:
+    def vector_search_candidates(self, query_text: str, limit: int = 30, query_filter: Optional[models.Filter] = None) -> List[str]:
+        """vector_search_candidates_async 的同步接口"""
+        return run_sync(self.vector_search_candidates_async(query_text, limit, query_filter))
+    
+    async def vector_search_candidates_async(self, query_text: str, limit: int = 30, query_filter: Optional[models.Filter] = None) -> List[str]:
         """使用向量搜索获取候选新闻"""
         try:
             # 将查询文本转为向量
-            query_vector = self.gpt.get_embeddings([query_text])[0]
-            
-            # 向量搜索
-            results = self.qdrant.search(
-                collection_name=self.news_collection,
-                query_vector=query_vector,
-                limit=limit
-            )
-            
-            # 从payload中提取原始news_id，而不是使用Qdrant的点ID
-            news_ids = []
-            for result in results:
-                if 'payload' in result and 'news_id' in result['payload']:
-                    news_ids.append(result['payload']['news_id'])
-                else:
-                    # 如果payload中没有news_id，记录警告并跳过
-                    logger.warning(f"搜索结果缺少news_id: {result}")
+            query_vector = (await self.gpt.get_embeddings_async([query_text]))[0]
             
+            # 向量搜索（过滤条件由向量库在检索时应用）
+            results = await self.qdrant.search_async(self.news_collection, query_vector, limit=limit, query_filter=query_filter)
+            news_ids = self._extract_news_ids(results)
             logger.info(f"向量搜索成功，返回{len(news_ids)}个候选新闻ID")
             return news_ids
-            
+        
         except Exception as e:
             logger.error(f"向量搜索失败: {str(e)}")
             return []
     
+    def search_by_news_id(self, news_id: str, limit: int = 30, query_filter: Optional[models.Filter] = None) -> List[str]:
+        """search_by_news_id_async 的同步接口"""
+        return run_sync(self.search_by_news_id_async(news_id, limit, query_filter))
+    
+    async def search_by_news_id_async(self, news_id: str, limit: int = 30, query_filter: Optional[models.Filter] = None) -> List[str]:
+        """以已入库新闻的存储向量为查询获取候选新闻（请求路径上无模型推理）"""
+        point_id = news_point_id(news_id)
+        try:
+            if self.config.RETRIEVAL_MODE == "stored_vector":
+                # 取回已存储的向量，再做一次普通向量搜索
+                vectors = await self.qdrant.retrieve_vectors_async(self.news_collection, [point_id])
+                if point_id not in vectors:
+                    logger.warning(f"新闻 {news_id} 不在向量库中")
+                    return []
+                results = await self.qdrant.search_async(
+                    self.news_collection, vectors[point_id], limit=limit + 1, query_filter=query_filter
+                )
+                results = [r for r in results if str(r['id']) != point_id][:limit]
+            else:
+                # 直接按点ID在服务端搜索，一次往返
+                results = await self.qdrant.search_by_id_async(
+                    self.news_collection, point_id, limit=limit, query_filter=query_filter
+                )
+            
+            news_ids = self._extract_news_ids(results)
+            logger.info(f"按点ID搜索成功，返回{len(news_ids)}个候选新闻ID")
+            return news_ids
+        
+        except Exception as e:
+            logger.warning(f"按点ID搜索失败，将回退到文本向量搜索: {str(e)}")
+            return []
+    
+    def get_click_vectors(self, df_news: pd.DataFrame, click_history: List[str]) -> Tuple[List[str], np.ndarray]:
+        """get_click_vectors_async 的同步接口"""
+        return run_sync(self.get_click_vectors_async(df_news, click_history))
+    
+    async def get_click_vectors_async(self, df_news: pd.DataFrame, click_history: List[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        获取最近点击新闻的向量（一次批量取回或一次批量编码）
+        返回 (有向量的新闻ID列表, 对应的 L2 归一化向量矩阵)，顺序与点击顺序一致
+        """
+        recent = click_history[-self.config.USER_HISTORY_SIZE:]
+        if self.config.RETRIEVAL_MODE == "embed":
+            rows = self.get_catalog(df_news).lookup(recent)
+            news_ids = [row['news_id'] for row in rows]
+            vectors = await self.gpt.get_embeddings_async([row['title'] for row in rows]) if rows else []
+        else:
+            point_ids = [news_point_id(news_id) for news_id in recent]
+            stored = await self.qdrant.retrieve_vectors_async(self.news_collection, list(dict.fromkeys(point_ids)))
+            news_ids, vectors = self._pair_stored_vectors(recent, point_ids, stored)
+        return news_ids, self._normalize_rows(vectors, len(news_ids))
+    
+    def _pair_stored_vectors(self, news_ids: List[str], point_ids: List[str], stored: Dict[Any, List[float]]) -> Tuple[List[str], List[List[float]]]:
+        """按点击顺序取出已存储的向量，跳过不在向量库中的新闻"""
+        pairs = [(news_id, stored[pid]) for news_id, pid in zip(news_ids, point_ids) if pid in stored]
+        return [news_id for news_id, _ in pairs], [vector for _, vector in pairs]
+    
+    def _normalize_rows(self, vectors: Any, rows: int) -> np.ndarray:
+        if not rows:
+            return np.zeros((0, 0), dtype=np.float32)
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(rows, -1)
+        if len(matrix):
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return matrix
+    
+    def build_user_vector(self, vectors: np.ndarray) -> np.ndarray:
+        """按时间衰减加权平均点击向量（越近的点击权重越大），返回归一化的用户向量"""
+        weights = self._recency_weights(len(vectors))
+        user_vector = weights @ vectors
+        return user_vector / max(np.linalg.norm(user_vector), 1e-12)
+    
+    def build_interest_vectors(self, df_news: pd.DataFrame, news_ids: List[str], vectors: np.ndarray) -> np.ndarray:
+        """按类别把点击拆分为多个兴趣，每个兴趣取时间衰减加权均值，按兴趣权重从高到低返回"""
+        weights = self._recency_weights(len(vectors))
+        categories = self.get_catalog(df_news).aligned('category', news_ids, fill='')
+        codes, uniques = pd.factorize(categories)
+        # 各兴趣的总权重与加权向量和，全部用矩阵运算一次完成
+        membership = np.zeros((len(uniques), len(vectors)), dtype=np.float32)
+        membership[codes, np.arange(len(vectors))] = weights
+        interest_weights = membership.sum(axis=1)
+        top = np.argsort(-interest_weights)[:self.config.USER_INTERESTS]
+        interest_vectors = membership[top] @ vectors
+        interest_vectors /= np.maximum(np.linalg.norm(interest_vectors, axis=1, keepdims=True), 1e-12)
+        return interest_vectors
+    
+    def user_vector_candidates(
+        self,
+        df_news: pd.DataFrame,
+        click_history: List[str],
+        limit: int = 30,
+        query_filter: Optional[models.Filter] = None
+    ) -> List[str]:
+        """user_vector_candidates_async 的同步接口"""
+        return run_sync(self.user_vector_candidates_async(df_news, click_history, limit, query_filter))
+    
+    async def user_vector_candidates_async(
+        self,
+        df_news: pd.DataFrame,
+        click_history: List[str],
+        limit: int = 30,
+        query_filter: Optional[models.Filter] = None
+    ) -> List[str]:
+        """
+        基于整个点击历史构建用户向量召回候选新闻（单次搜索或一次批量搜索）
+        query_filter 由 candidate_filter 生成时已在检索中排除点击过的新闻，无需多取
+        """
+        try:
+            news_ids, vectors = await self.get_click_vectors_async(df_news, click_history)
+            if not news_ids:
+                logger.warning("点击历史中没有可用的新闻向量")
+                return []
+            
+            # 没有过滤条件时多取一些，用于剔除已点击的新闻
+            search_limit = self._search_limit(click_history, limit, query_filter)
+            query_vectors = self._candidate_query_vectors(df_news, news_ids, vectors)
+            if len(query_vectors) > 1:
+                batches = await self.qdrant.search_batch_async(
+                    self.news_collection, query_vectors.tolist(), limit=search_limit, query_filter=query_filter
+                )
+            else:
+                batches = [await self.qdrant.search_async(
+                    self.news_collection, query_vectors[0].tolist(), limit=search_limit, query_filter=query_filter
+                )]
+            
+            candidate_ids = self._merge_candidates(batches, click_history, limit)
+            logger.info(f"用户向量召回成功，返回{len(candidate_ids)}个候选新闻ID")
+            return candidate_ids
+        
+        except Exception as e:
+            logger.warning(f"用户向量召回失败，将回退到最近点击召回: {str(e)}")
+            return []
+    
+    def _candidate_query_vectors(self, df_news: pd.DataFrame, news_ids: List[str], vectors: np.ndarray) -> np.ndarray:
+        """按 CANDIDATE_QUERY 构建召回查询向量（每行一个查询）"""
+        if self.config.CANDIDATE_QUERY == "interests":
+            return self.build_interest_vectors(df_news, news_ids, vectors)
+        return self.build_user_vector(vectors)[None, :]
+    
+    def _merge_candidates(self, batches: List[List[Dict[str, Any]]], click_history: List[str], limit: int) -> List[str]:
+        """多个查询的结果轮流合并、去重，并剔除已点击的新闻"""
+        clicked = set(click_history)
+        ranked = [self._extract_news_ids(results) for results in batches]
+        merged = [news_id for group in zip_longest(*ranked) for news_id in group if news_id is not None]
+        return [news_id for news_id in dict.fromkeys(merged) if news_id not in clicked][:limit]
+    
+    def candidate_filter(
+        self,
+        click_history: List[str],
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None
+    ) -> Optional[models.Filter]:
+        """召回过滤条件：限定类别 / 子类别（payload 索引字段），排除点击过的新闻；由向量库在检索时应用"""
+        must = []
+        if categories:
+            must.append(models.FieldCondition(key="category", match=models.MatchAny(any=list(categories))))
+        if sub_categories:
+            must.append(models.FieldCondition(key="sub_category", match=models.MatchAny(any=list(sub_categories))))
+        clicked = [news_point_id(news_id) for news_id in dict.fromkeys(click_history)]
+        must_not = [models.HasIdCondition(has_id=clicked)] if clicked else []
+        if not must and not must_not:
+            return None
+        return models.Filter(must=must or None, must_not=must_not or None)
+    
+    def retrieve_candidates(
+        self,
+        df_news: pd.DataFrame,
+        click_history: List[str],
+        limit: int = 30,
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None
+    ) -> List[str]:
+        """retrieve_candidates_async 的同步接口"""
+        return run_sync(self.retrieve_candidates_async(df_news, click_history, limit, categories, sub_categories))
+    
+    async def retrieve_candidates_async(
+        self,
+        df_news: pd.DataFrame,
+        click_history: List[str],
+        limit: int = 30,
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        向量搜索候选新闻（默认由整个点击历史构建用户向量；失败时退回最近一次点击）
+        类别 / 子类别限定与已点击新闻的排除在检索中完成，一次往返即返回 limit 个符合条件的候选
+        """
+        query_filter = self.candidate_filter(click_history, categories, sub_categories)
+        candidate_ids = []
+        if self.config.CANDIDATE_QUERY != "latest":
+            candidate_ids = await self.user_vector_candidates_async(df_news, click_history, limit=limit, query_filter=query_filter)
+        if not candidate_ids and self.config.RETRIEVAL_MODE != "embed":
+            candidate_ids = await self.search_by_news_id_async(click_history[-1], limit=limit, query_filter=query_filter)
+        if not candidate_ids:
+            candidate_ids = await self.vector_search_candidates_async(
+                self._latest_title(df_news, click_history), limit=limit, query_filter=query_filter
+            )
+        return candidate_ids
+    
+    def _search_limit(self, click_history: List[str], limit: int, query_filter: Optional[models.Filter]) -> int:
+        """检索条数：过滤条件已排除点击过的新闻时取 limit 条，否则多取一些用于剔除"""
+        if query_filter is not None and query_filter.must_not:
+            return limit
+        return limit + min(len(set(click_history)), limit)
+    
+    def _latest_title(self, df_news: pd.DataFrame, click_history: List[str]) -> str:
+        latest_news = self.get_catalog(df_news).get(click_history[-1])
+        return latest_news['title'] if latest_news is not None else "新闻"
+    
+    def _recency_weights(self, n: int) -> np.ndarray:
+        """最近一次点击权重为1，往前每次乘以衰减系数"""
+        return (self.config.USER_HISTORY_DECAY ** np.arange(n - 1, -1, -1)).astype(np.float32)
+    
+    def _extract_news_ids(self, results: List[Dict[str, Any]]) -> List[str]:
+        """从搜索结果的payload中提取原始news_id，而不是使用Qdrant的点ID"""
+        news_ids = []
+        for result in results:
+            if 'payload' in result and result['payload'] and 'news_id' in result['payload']:
+                news_ids.append(result['payload']['news_id'])
+            else:
+                # 如果payload中没有news_id，记录警告并跳过
+                logger.warning(f"搜索结果缺少news_id: {result}")
+        return news_ids
+    
+    def generate_candidates(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        click_history: List[str],
+        limit: int = 30,
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None
+    ) -> CandidateSet:
+        """generate_candidates_async 的同步接口"""
+        return run_sync(self.generate_candidates_async(df_news, df_behaviors, click_history, limit, categories, sub_categories))
+    
+    async def generate_candidates_async(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        click_history: List[str],
+        limit: int = 30,
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None,
+        vector_ids: Optional[List[str]] = None
+    ) -> CandidateSet:
+        """
+        多来源候选生成（来源见 candidate_sources）：按 CANDIDATE_SOURCES 的顺序执行，超出 CANDIDATE_BUDGET_MS 后跳过剩余来源；
+        向量来源取 limit 条，其余来源各取 CANDIDATE_SOURCE_LIMIT 条，合并后最多保留 max(CANDIDATE_MAX, limit) 条
+        - 向量检索在后台执行的同时计算本地来源，向量检索最多等到预算用完（超时则跳过）
+        - vector_ids 不为 None 时直接作为向量来源的结果（批量推荐已批量召回）
+        - 本地来源的索引与嵌入模型的首次构建 / 加载在线程池中完成，不阻塞事件循环，也不计入预算
+        """
+        sources = parse_sources(self.config.CANDIDATE_SOURCES)
+        await asyncio.to_thread(self._prepare_sources, sources, df_news, df_behaviors)
+        if "vector" in sources and vector_ids is None and self.config.RETRIEVAL_MODE == "embed":
+            try:
+                await self.gpt.load_embedding_model_async()
+            except Exception as e:
+                logger.warning(f"嵌入模型加载失败: {str(e)}")
+        budget = CandidateBudget(self.config.CANDIDATE_BUDGET_MS)
+        by_source, elapsed, skipped = {}, {}, []
+        vector_task, vector_start = None, time.perf_counter()
+        if "vector" in sources:
+            if vector_ids is not None:
+                by_source["vector"] = vector_ids
+            else:
+                vector_task = asyncio.ensure_future(
+                    self.retrieve_candidates_async(df_news, click_history, limit, categories, sub_categories)
+                )
+        for source in sources:
+            if source == "vector":
+                continue
+            if budget.exhausted():
+                skipped.append(source)
+                continue
+            start = time.perf_counter()
+            by_source[source] = self._local_candidates(source, df_news, df_behaviors, click_history, categories, sub_categories)
+            elapsed[source] = (time.perf_counter() - start) * 1000
+        if vector_task is not None:
+            try:
+                by_source["vector"] = await asyncio.wait_for(vector_task, timeout=budget.remaining())
+                elapsed["vector"] = (time.perf_counter() - vector_start) * 1000
+            except asyncio.TimeoutError:
+                skipped.append("vector")
+                logger.warning(f"向量召回超出候选生成预算（{self.config.CANDIDATE_BUDGET_MS}ms），本次只使用其他来源")
+        return self._finish_candidates(sources, by_source, elapsed, skipped, click_history, limit)
+    
+    def _prepare_sources(self, sources: List[str], df_news: pd.DataFrame, df_behaviors: pd.DataFrame):
+        """取得本地来源的索引（首次使用时构建，属于一次性开销，不计入单次请求的预算）"""
+        try:
+            if "coclick" in sources:
+                self.get_coclick(df_behaviors)
+            if "category_popular" in sources or "fresh" in sources:
+                self.get_news_pools(df_news, df_behaviors)
+        except Exception as e:
+            logger.warning(f"候选来源索引构建失败: {str(e)}")
+    
+    def _local_candidates(
+        self,
+        source: str,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        click_history: List[str],
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None
+    ) -> List[str]:
+        """进程内的候选来源（共同点击近邻、类别热门、新鲜新闻），不需要嵌入推理与向量库"""
+        limit = self.config.CANDIDATE_SOURCE_LIMIT
+        catalog = self.get_catalog(df_news)
+        clicked = set(click_history)
+        try:
+            if source == "coclick":
+                recent = click_history[-self.config.USER_HISTORY_SIZE:]
+                # 多取一些，用于剔除已点击和不符合类别条件的新闻
+                neighbours = self.get_coclick(df_behaviors).neighbours_of(recent, self._recency_weights(len(recent)), limit=limit * 4)
+                return take(neighbours, limit, clicked, catalog, categories, sub_categories)
+            pools = self.get_news_pools(df_news, df_behaviors)
+            if source == "category_popular":
+                preferred = preferred_categories(
+                    self.count_categories(df_news, click_history), self.config.USER_INTERESTS, categories
+                )
+                return take(pools.popular_in(preferred), limit, clicked, catalog, categories, sub_categories)
+            return take(pools.fresh_in(categories), limit, clicked, catalog, categories, sub_categories)
+        except Exception as e:
+            logger.warning(f"候选来源 {source} 失败: {str(e)}")
+            return []
+    
+    def _finish_candidates(
+        self,
+        sources: List[str],
+        by_source: Dict[str, List[str]],
+        elapsed: Dict[str, float],
+        skipped: List[str],
+        click_history: List[str],
+        limit: int
+    ) -> CandidateSet:
+        candidates = merge_sources(by_source, sources, click_history, max(self.config.CANDIDATE_MAX, limit))
+        candidates.elapsed_ms = {source: round(ms, 3) for source, ms in elapsed.items()}
+        candidates.skipped = skipped
+        self.candidate_hits.update(candidates.hits)
+        logger.info(
+            f"候选生成完成 | 候选数: {len(candidates.ids)} | "
+            + " | ".join(f"{source}: {count}" for source, count in candidates.hits.items())
+            + (f" | 超出预算跳过: {', '.join(skipped)}" if skipped else "")
+        )
+        return candidates
+    
+    def get_coclick(self, df_behaviors: pd.DataFrame) -> CoClickNeighbours:
+        """
+        共同点击近邻表（每份行为数据只选择 / 构建一次）：COCLICK_PATH 的离线表正是由这份行为数据的文件
+        （路径与 mtime/大小一致）构建时直接使用（内存映射，进程内共享），否则由其中每个用户的点击历史现场构建
+        """
+        top_k = self.config.COCLICK_TOP_K
+
+        def build(frame: pd.DataFrame) -> CoClickNeighbours:
+            table = self._offline_coclick(frame)
+            return table if table is not None else build_coclick(self.get_user_index(frame).histories(), top_k)
+
+        return self.data_store.derived_for(df_behaviors, f'coclick:{top_k}:{self.config.COCLICK_PATH}', build)
+    
+    def _offline_coclick(self, df_behaviors: pd.DataFrame) -> Optional[CoClickNeighbours]:
+        """与行为数据来源一致的离线近邻表；没有离线表、来源不一致或无法加载时返回 None"""
+        if not self.config.COCLICK_PATH or not os.path.isdir(self.config.COCLICK_PATH):
+            return None
+        source = self.data_store.source_of(df_behaviors)
+        if source is None:
+            return None
+        try:
+            table = get_coclick_table(self.config)
+        except Exception as e:
+            logger.warning(f"共同点击近邻表无法加载，由行为数据现场构建: {str(e)}")
+            return None
+        if table.sources != [source]:
+            logger.info(f"共同点击近邻表不是由当前行为数据构建（或数据文件已变化），由行为数据现场构建: {source['path']}")
+            return None
+        return table
+    
+    def get_news_pools(self, df_news: pd.DataFrame, df_behaviors: pd.DataFrame) -> NewsPools:
+        """热门 / 新鲜新闻候选池（每份行为数据只构建一次）"""
+        catalog = self.get_catalog(df_news)
+        priors = self.get_news_priors(df_behaviors)
+        return self.data_store.derived_for(
+            df_behaviors, f'news_pools:{self.config.RANK_RECENCY_HALF_LIFE}:{id(catalog)}', lambda frame: NewsPools(priors, catalog)
+        )
+    
+    def get_news_priors(self, df_behaviors: pd.DataFrame) -> NewsPriors:
+        """新闻热度 / 新鲜度先验（每份行为数据只统计一次）"""
+        half_life = self.config.RANK_RECENCY_HALF_LIFE
+        return self.data_store.derived_for(
+            df_behaviors, f'news_priors:{half_life}', lambda frame: build_news_priors(frame, half_life)
+        )
+    
+    def rank_candidates(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        click_history: List[str],
+        user_profile: Optional[Dict[str, Any]],
+        candidate_ids: List[str],
+        top_n: int = 5
+    ) -> List[str]:
+        """rank_candidates_async 的同步接口"""
+        return run_sync(self.rank_candidates_async(df_news, df_behaviors, click_history, user_profile, candidate_ids, top_n))
+    
+    async def rank_candidates_async(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        click_history: List[str],
+        user_profile: Optional[Dict[str, Any]],
+        candidate_ids: List[str],
+        top_n: int = 5
+    ) -> List[str]:
+        """
+        按 RANKER 排序候选新闻
+        - fast:   本地加权打分（不需要用户画像，无大模型调用）
+        - ctr:    离线训练的点击率模型对整批候选打分（模型不存在时退回 fast）
+        - hybrid: 本地打分后只把前 RANK_LLM_TOP_K 条交给大模型重排
+        - llm:    全部候选交给大模型排序
+        """
+        ranker = self._ranker_mode()
+        if ranker == "llm":
+            return await self.rank_news_by_profile_async(df_news, user_profile, candidate_ids, top_n)
+        ranked_ids = await self.fast_rank_async(df_news, df_behaviors, click_history, candidate_ids)
+        if ranker == "hybrid":
+            return await self.rank_news_by_profile_async(
+                df_news, user_profile, ranked_ids[:max(top_n, self.config.RANK_LLM_TOP_K)], top_n
+            )
+        return ranked_ids[:top_n]
+    
+    def fast_rank(self, df_news: pd.DataFrame, df_behaviors: pd.DataFrame, click_history: List[str], candidate_ids: List[str]) -> List[str]:
+        """fast_rank_async 的同步接口"""
+        return run_sync(self.fast_rank_async(df_news, df_behaviors, click_history, candidate_ids))
+    
+    async def fast_rank_async(self, df_news: pd.DataFrame, df_behaviors: pd.DataFrame, click_history: List[str], candidate_ids: List[str]) -> List[str]:
+        """
+        本地打分排序全部候选（RANKER=ctr 时用点击率模型，否则用加权打分）：
+        点击向量与候选向量各一次批量取回（两次取回并发执行），特征与分数在候选矩阵上一次算完
+        """
+        candidate_ids = list(dict.fromkeys(candidate_ids))
+        await asyncio.to_thread(self._prepare_ranking, df_news, df_behaviors)
+        try:
+            (_, click_vectors), stored = await asyncio.gather(
+                self.get_click_vectors_async(df_news, click_history),
+                self.qdrant.retrieve_vectors_async(self.news_collection, [news_point_id(news_id) for news_id in candidate_ids])
+            )
+        except Exception as e:
+            logger.warning(f"获取排序向量失败，只按类别偏好与先验排序: {str(e)}")
+            click_vectors, stored = np.zeros((0, 0), dtype=np.float32), {}
+        return self._score_and_rank(df_news, df_behaviors, click_history, candidate_ids, click_vectors, stored)
+    
+    def _score_and_rank(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        click_history: List[str],
+        candidate_ids: List[str],
+        click_vectors: np.ndarray,
+        stored: Dict[Any, List[float]]
+    ) -> List[str]:
+        if not candidate_ids:
+            return []
+        user_vector = self.build_user_vector(click_vectors) if len(click_vectors) else np.zeros(0, dtype=np.float32)
+        candidate_vectors = np.zeros((len(candidate_ids), len(user_vector)), dtype=np.float32)
+        if len(user_vector):
+            rows = [(i, stored[pid]) for i, pid in enumerate(map(news_point_id, candidate_ids)) if pid in stored]
+            if rows:
+                index, vectors = zip(*rows)
+                candidate_vectors[list(index)] = self._normalize_rows(vectors, len(vectors))
+        
+        catalog = self.get_catalog(df_news)
+        categories = catalog.aligned('category', candidate_ids, fill='')
+        sub_categories = catalog.aligned('sub_category', candidate_ids, fill='')
+        category_counts = self.count_categories(df_news, click_history)
+        
+        model = self._ctr_model() if self.config.RANKER == "ctr" else None
+        if model is not None:
+            entity_overlap = self.data_store.derived_for(df_news, 'entity_index', EntityIndex).overlap(click_history, candidate_ids)
+            features = ctr_features(
+                user_vector, candidate_vectors, categories, sub_categories, category_counts, len(click_history), entity_overlap,
+                features=model.features
+            )
+            return self.ranker.rank(candidate_ids, model.predict(features))
+        
+        popularity, recency = self.get_news_priors(df_behaviors).lookup(candidate_ids)
+        features = candidate_features(
+            user_vector, candidate_vectors, categories, sub_categories, category_counts, popularity, recency
+        )
+        return self.ranker.rank(candidate_ids, self.ranker.score(features))
+    
+    def _prepare_ranking(self, df_news: pd.DataFrame, df_behaviors: pd.DataFrame):
+        """取得排序用到的索引（首次使用时构建；异步流程在线程池中调用，不阻塞事件循环）"""
+        if self.config.RANKER == "ctr" and self._ctr_model() is not None:
+            self.data_store.derived_for(df_news, 'entity_index', EntityIndex)
+        else:
+            self.get_news_priors(df_behaviors)
+    
+    def _ctr_model(self):
+        """点击率模型（进程内共享）；模型文件不存在或无法加载时返回 None，由加权打分代替"""
+        return get_ctr_model(self.config)
+    
+    def _ranker_mode(self) -> str:
+        if self.config.RANKER not in ("fast", "ctr", "hybrid", "llm"):
+            raise ValueError(f"未知的排序方式: {self.config.RANKER}，可选: fast, ctr, hybrid, llm")
+        return self.config.RANKER
+    
     def rank_news_by_profile(
         self,
         df_news: pd.DataFrame,
         user_profile: Dict[str, Any],
         candidate_ids: List[str],
         top_n: int = 5
+    ) -> List[str]:
+        """rank_news_by_profile_async 的同步接口"""
+        return run_sync(self.rank_news_by_profile_async(df_news, user_profile, candidate_ids, top_n))
+    
+    async def rank_news_by_profile_async(
+        self,
+        df_news: pd.DataFrame,
+        user_profile: Dict[str, Any],
+        candidate_ids: List[str],
+        top_n: int = 5
     ) -> List[str]:
         """基于用户画像对候选新闻进行排序"""
         #logger.info(f"排序输入: candidate_ids={len(candidate_ids)}, top_n={top_n}")
-        
-        candidate_news = df_news[df_news['news_id'].isin(candidate_ids)]
-        #df_news['news_id'].isin(candidate_ids) 返回的是一个布尔序列（Series
+        candidate_news, prompt = self._build_rank_prompt(df_news, user_profile, candidate_ids, top_n)
         if candidate_news.empty:
             logger.warning("候选新闻为空，返回空列表")
             return []
         
+        response = await self.gpt.get_completion_async(prompt, temperature=0.3)
+      #  logger.info(f"GPT排序结果: {response}")
+        return self._parse_ranking(response, candidate_news, top_n)
+    
+    def _build_rank_prompt(
+        self,
+        df_news: pd.DataFrame,
+        user_profile: Dict[str, Any],
+        candidate_ids: List[str],
+        top_n: int
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """选出候选新闻并构建排序提示词，候选为空时提示词为 None"""
+        # 按候选顺序取出新闻（本地打分后的顺序即大模型看到的顺序，解析失败时的兜底也取排在前面的候选）
+        positions = self.get_catalog(df_news).positions(dict.fromkeys(candidate_ids))
+        candidate_news = df_news.iloc[positions[positions >= 0]]
+        if candidate_news.empty:
+            return candidate_news, None
+        
         #logger.info(f"匹配到的候选新闻数量: {len(candidate_news)}")
         
         # 构建候选新闻列表
@@ -205,9 +817,10 @@ class NewsRecommender:
     
 
         logger.debug(f"新闻排序提示: {prompt[:300]}...")
-        response = self.gpt.get_completion(prompt, temperature=0.3)
-      #  logger.info(f"GPT排序结果: {response}")
-        
+        return candidate_news, prompt
+    
+    def _parse_ranking(self, response: str, candidate_news: pd.DataFrame, top_n: int) -> List[str]:
+        """解析大模型返回的新闻序号，数量不足时用候选顺序补齐"""
         # 解析排序结果
         try:
             # 替换原来的解析方式
@@ -233,64 +846,281 @@ class NewsRecommender:
         df_news: pd.DataFrame,
         df_behaviors: pd.DataFrame,
         user_id: str,
-        top_n: int = 10
+        top_n: int = 10,
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        完整推荐流程（RECOMMEND_ASYNC 开启时在常驻事件循环中执行异步流程，对调用方仍是同步接口）
+        categories / sub_categories 限定推荐的类别 / 子类别（在召回时过滤）
+        """
+        if self.config.RECOMMEND_ASYNC:
+            return run_sync(self.recommend_async(
+                df_news, df_behaviors, user_id, top_n, categories=categories, sub_categories=sub_categories
+            ))
+        return self.recommend_serial(df_news, df_behaviors, user_id, top_n, categories, sub_categories)
+    
+    def recommend_serial(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        user_id: str,
+        top_n: int = 10,
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """串行推荐流程：画像生成、候选召回、排序依次执行（与异步流程共用同一实现，只是不并发）"""
+        return run_sync(self._recommend_async(
+            df_news, df_behaviors, user_id, top_n, categories, sub_categories, concurrent=False
+        ))
+    
+    async def recommend_async(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        user_id: str,
+        top_n: int = 10,
+        timeout: Optional[float] = None,
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        异步推荐流程：画像生成（大模型）与候选召回（嵌入 + Qdrant）互不依赖，并发执行，
+        排序等两者都完成后开始；整个请求受端到端超时约束，超时返回空列表
+        """
+        timeout = self.config.RECOMMEND_TIMEOUT if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(
+                self._recommend_async(df_news, df_behaviors, user_id, top_n, categories, sub_categories),
+                timeout=timeout if timeout and timeout > 0 else None
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"用户 {user_id} 推荐超时（{timeout}s）")
+            return []
+    
+    async def _recommend_async(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        user_id: str,
+        top_n: int,
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None,
+        concurrent: bool = True
     ) -> List[Dict[str, Any]]:
-        """完整推荐流程"""
+        """推荐流程的唯一实现；concurrent 为 False 时画像与候选依次获取（串行基线）"""
         # 1. 获取用户历史
-        user_history = self.get_user_history(df_behaviors, user_id)
-        if user_history.empty:
+        if not self.user_exists(df_behaviors, user_id):
             logger.warning(f"用户 {user_id} 没有历史行为")
             return []
         
-        # 2. 解析点击历史
-        click_history_str = user_history['click_history'].iloc[0]
-        click_history = click_history_str.split() if click_history_str else []
-        
+        # 2. 获取预先切分好的点击历史
+        click_history = self.get_click_history(df_behaviors, user_id)
         if not click_history:
             logger.warning(f"用户 {user_id} 没有点击历史")
             return []
         
-        # 3. 生成用户画像
-        user_profile = self.generate_user_profile(df_news, click_history)
+        # 3 + 4. 获取用户画像与多来源候选（本地打分排序不需要画像），默认并发执行
+        def fetch_candidates():
+            return self.generate_candidates_async(
+                df_news, df_behaviors, click_history, limit=top_n * 3, categories=categories, sub_categories=sub_categories
+            )
+        
+        if concurrent:
+            user_profile, candidates = await asyncio.gather(
+                self._profile_for_ranking_async(df_news, user_id, click_history), fetch_candidates()
+            )
+        else:
+            user_profile = await self._profile_for_ranking_async(df_news, user_id, click_history)
+            candidates = await fetch_candidates()
         
-        # 4. 向量搜索候选新闻（使用最近点击的新闻标题作为查询）
-        latest_news = df_news[df_news['news_id'] == click_history[-1]]
-        query_text = latest_news.iloc[0]['title'] if not latest_news.empty else "新闻"
+        # 5. 如果所有来源都没有候选，使用随机候选
+        candidate_ids = self._fallback_candidates(df_news, candidates.ids, categories, sub_categories)
         
-        candidate_ids = self.vector_search_candidates(query_text, limit=top_n * 3)
+        # 6. 排序（本地打分，可选大模型重排）
+        recommended_ids = await self.rank_candidates_async(df_news, df_behaviors, click_history, user_profile, candidate_ids, top_n)
         
-        # 5. 如果向量搜索失败，使用随机候选
+        # 7. 返回推荐结果
+        result = self.get_catalog(df_news).lookup(recommended_ids)
+        logger.info(f"最终推荐结果数量: {len(result)}")
+        return result
+    
+    async def _profile_for_ranking_async(self, df_news: pd.DataFrame, user_id: str, click_history: List[str]) -> Optional[Dict[str, Any]]:
+        if not self._needs_profile():
+            return None
+        return await self.get_user_profile_async(df_news, user_id, click_history)
+    
+    def _needs_profile(self) -> bool:
+        """只有大模型参与排序时才需要用户画像"""
+        return self._ranker_mode() in ("hybrid", "llm")
+    
+    def _fallback_candidates(
+        self,
+        df_news: pd.DataFrame,
+        candidate_ids: List[str],
+        categories: Optional[List[str]] = None,
+        sub_categories: Optional[List[str]] = None
+    ) -> List[str]:
         if not candidate_ids:
-            candidate_ids = df_news.sample(min(50, len(df_news)))['news_id'].tolist()
-            logger.warning("向量搜索失败，使用随机候选新闻")
+            pool = df_news
+            if categories:
+                pool = pool[pool['category'].isin(categories)]
+            if sub_categories:
+                pool = pool[pool['sub_category'].isin(sub_categories)]
+            candidate_ids = pool.sample(min(50, len(pool)))['news_id'].tolist()
+            logger.warning("候选生成没有结果，使用随机候选新闻")
+        return candidate_ids
+    
+    def recommend_many(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        user_ids: Iterable[str],
+        top_n: int = 10
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        批量推荐（同步接口）：按完成顺序逐个产出 (user_id, 推荐结果)，详见 recommend_many_async
+        最多缓冲一批（BATCH_CHUNK_SIZE 个）未被取走的结果；提前停止迭代时剩余用户的召回与大模型调用随之取消
+        """
+        return iterate_sync(
+            self.recommend_many_async(df_news, df_behaviors, user_ids, top_n),
+            max_buffered=max(1, self.config.BATCH_CHUNK_SIZE)
+        )
+    
+    async def recommend_many_async(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        user_ids: Iterable[str],
+        top_n: int = 10
+    ) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        批量推荐：用户按 BATCH_CHUNK_SIZE 分批
+        - 每批用户的点击向量一次取回（或一次编码），全部召回查询一次批量搜索，下一批的召回与本批的大模型调用重叠
+        - 画像与排序的大模型调用并发执行，由 DeepSeekGPT.request_limiter 限制并发数与请求速率
+        没有点击历史的用户不产出结果
+        """
+        histories = {}
+        for user_id in dict.fromkeys(user_ids):
+            click_history = self.get_click_history(df_behaviors, user_id) if self.user_exists(df_behaviors, user_id) else []
+            if click_history:
+                histories[user_id] = click_history
+            else:
+                logger.warning(f"用户 {user_id} 没有点击历史，跳过")
         
-        # 添加调试日志
-        #logger.info(f"候选新闻数量: {len(candidate_ids)}")
-        #logger.info(f"候选新闻ID前5个: {candidate_ids[:5]}")
+        users = list(histories)
+        chunk_size = max(1, self.config.BATCH_CHUNK_SIZE)
+        chunks = [users[i:i + chunk_size] for i in range(0, len(users), chunk_size)]
+        if not chunks:
+            return
         
-        # 6. 基于用户画像排序
-        recommended_ids = self.rank_news_by_profile(df_news, user_profile, candidate_ids, top_n)
+        def retrieve(chunk: List[str]) -> "asyncio.Task":
+            return asyncio.create_task(
+                self.batch_candidates_async(df_news, {uid: histories[uid] for uid in chunk}, limit=top_n * 3)
+            )
         
-        # 添加调试日志
-        #logger.info(f"推荐新闻ID数量: {len(recommended_ids)}")
-        #logger.info(f"推荐新闻ID: {recommended_ids}")
-       
-        # 7. 返回推荐结果
-        result = []
-        for news_id in recommended_ids:
-            news = df_news[df_news['news_id'] == news_id]
-            if not news.empty:
-                news_info = news.iloc[0]
-                result.append({
-                    'news_id': news_id,
-                    'title': news_info['title'],
-                    'category': news_info['category'],
-                    'sub_category': news_info['sub_category'],
-                    'abstract': news_info['abstract']
-                })
+        pending_retrieval, tasks = retrieve(chunks[0]), []
+        try:
+            for k, chunk in enumerate(chunks):
+                candidates = await pending_retrieval
+                if k + 1 < len(chunks):
+                    pending_retrieval = retrieve(chunks[k + 1])  # 预取下一批候选
+                tasks = [
+                    asyncio.create_task(self._recommend_with_candidates_async(
+                        df_news, df_behaviors, user_id, histories[user_id], candidates.get(user_id, []), top_n
+                    ))
+                    for user_id in chunk
+                ]
+                for task in asyncio.as_completed(tasks):
+                    yield await task
+        finally:
+            # 调用方提前停止迭代（生成器被关闭或取消）时，取消尚未完成的召回与推荐
+            for task in [pending_retrieval, *tasks]:
+                task.cancel()
+    
+    async def batch_candidates_async(
+        self,
+        df_news: pd.DataFrame,
+        histories: Dict[str, List[str]],
+        limit: int = 30
+    ) -> Dict[str, List[str]]:
+        """
+        为一批用户召回候选新闻：所有点击向量一次取回（或一次编码），所有用户的查询一次批量搜索；
+        每个查询带上其用户的召回过滤条件（candidate_filter），已点击的新闻在检索中排除，每个用户都能取满 limit 条
+        """
+        recents = {user_id: history[-self.config.USER_HISTORY_SIZE:] for user_id, history in histories.items()}
+        all_ids = list(dict.fromkeys(news_id for recent in recents.values() for news_id in recent))
+        try:
+            if self.config.RETRIEVAL_MODE == "embed":
+                rows = self.get_catalog(df_news).lookup(all_ids)
+                vectors = await self.gpt.get_embeddings_async([row['title'] for row in rows]) if rows else []
+                table = {row['news_id']: vector for row, vector in zip(rows, vectors)}
+            else:
+                point_ids = [news_point_id(news_id) for news_id in all_ids]
+                stored = await self.qdrant.retrieve_vectors_async(self.news_collection, point_ids)
+                table = {news_id: stored[pid] for news_id, pid in zip(all_ids, point_ids) if pid in stored}
+            
+            owners, queries, filters = [], [], []
+            for user_id, recent in recents.items():
+                news_ids = [news_id for news_id in recent if news_id in table]
+                if not news_ids:
+                    continue
+                vectors = self._normalize_rows([table[news_id] for news_id in news_ids], len(news_ids))
+                if self.config.CANDIDATE_QUERY == "latest":
+                    user_queries = vectors[-1:]
+                else:
+                    user_queries = self._candidate_query_vectors(df_news, news_ids, vectors)
+                user_filter = self.candidate_filter(histories[user_id])
+                owners.extend([user_id] * len(user_queries))
+                queries.extend(user_queries.tolist())
+                filters.extend([user_filter] * len(user_queries))
+            if not queries:
+                return {}
+            
+            batches = await self.qdrant.search_batch_async(self.news_collection, queries, limit=limit, query_filter=filters)
+        except Exception as e:
+            logger.warning(f"批量召回失败，将使用随机候选: {str(e)}")
+            return {}
         
-        logger.info(f"最终推荐结果数量: {len(result)}")
-        return result
+        grouped: Dict[str, List[List[Dict[str, Any]]]] = {}
+        for user_id, results in zip(owners, batches):
+            grouped.setdefault(user_id, []).append(results)
+        candidates = {
+            user_id: self._merge_candidates(user_batches, histories[user_id], limit)
+            for user_id, user_batches in grouped.items()
+        }
+        logger.info(f"批量召回完成 | 用户数: {len(histories)} | 查询数: {len(queries)}")
+        return candidates
+    
+    async def _recommend_with_candidates_async(
+        self,
+        df_news: pd.DataFrame,
+        df_behaviors: pd.DataFrame,
+        user_id: str,
+        click_history: List[str],
+        candidate_ids: List[str],
+        top_n: int
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """已批量向量召回的单用户推荐：合并其他候选来源 + 画像 + 排序，单个用户失败或超时不影响整批"""
+        async def run() -> List[Dict[str, Any]]:
+            user_profile, candidates = await asyncio.gather(
+                self._profile_for_ranking_async(df_news, user_id, click_history),
+                self.generate_candidates_async(df_news, df_behaviors, click_history, limit=top_n * 3, vector_ids=candidate_ids)
+            )
+            ranked_ids = await self.rank_candidates_async(
+                df_news, df_behaviors, click_history, user_profile,
+                self._fallback_candidates(df_news, candidates.ids), top_n
+            )
+            return self.get_catalog(df_news).lookup(ranked_ids)
+        
+        timeout = self.config.RECOMMEND_TIMEOUT
+        try:
+            return user_id, await asyncio.wait_for(run(), timeout=timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            logger.error(f"用户 {user_id} 推荐超时（{timeout}s）")
+        except Exception as e:
+            logger.error(f"用户 {user_id} 推荐失败: {str(e)}")
+        return user_id, []
 
 
 if __name__ == "__main__":
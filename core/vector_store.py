@@ -0,0 +1,158 @@
+"""
+向量存储接口模块
+职责：定义推荐器与入库处理器使用的向量存储接口，并按 Config.VECTOR_STORE 选择实现
+- qdrant: QdrantClientWrapper，连接 QDRANT_HOST:QDRANT_PORT 的 Qdrant 服务
+- local:  LocalVectorStore，进程内索引（内存映射的归一化 float32 矩阵，精确分块矩阵乘 top-k，可选 IVF / HNSW 近似检索）
+两种实现的 search / search_with_filter / add_points 等行为一致：余弦相似度打分、
+结果为 {'id', 'score', 'payload'} 字典列表、过滤条件统一使用 qdrant_client 的 Filter 模型
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Tuple, Union
+from config import Config
+
+PointId = Union[int, str]
+
+# 入库时建立 payload 索引的字段（召回按类别 / 子类别过滤）
+PAYLOAD_INDEX_FIELDS = ("category", "sub_category")
+
+
+def per_query_filters(query_vectors: List[List[float]], query_filter: Any) -> List[Any]:
+    """把 search_batch 的 query_filter 展开为与查询一一对应的列表（单个过滤条件时所有查询共用）"""
+    if not isinstance(query_filter, list):
+        return [query_filter] * len(query_vectors)
+    if len(query_filter) != len(query_vectors):
+        raise ValueError(f"过滤条件数量（{len(query_filter)}）与查询数量（{len(query_vectors)}）不一致")
+    return query_filter
+
+
+class VectorStore(ABC):
+    """向量存储接口；异步方法默认在线程池中调用同步实现，有原生异步客户端的实现可覆盖"""
+
+    @abstractmethod
+    def collection_exists(self, collection_name: str) -> bool:
+        """检查集合是否存在"""
+
+    @abstractmethod
+    def ensure_collection(self, collection_name: str) -> Tuple[bool, str]:
+        """确保集合存在，如不存在则创建；返回 (创建结果, 错误信息)"""
+
+    @abstractmethod
+    def get_points_count(self, collection_name: str) -> int:
+        """获取集合中的点数（出错时返回 -1）"""
+
+    @abstractmethod
+    def list_all_collection_names(self) -> List[str]:
+        """获取所有集合名称"""
+
+    def ensure_payload_index(self, collection_name: str, field_name: str) -> bool:
+        """为 payload 字段建立关键字索引，供过滤检索使用（默认无需显式建立）"""
+        return True
+
+    def create_collection(self, collection_name: str) -> bool:
+        """创建新集合"""
+        success, error = self.ensure_collection(collection_name)
+        if not success:
+            raise RuntimeError(f"集合创建失败: {error}")
+        return success
+
+    @abstractmethod
+    def add_points(self,
+                   collection_name: str,
+                   ids: List[PointId],
+                   payloads: List[Dict[str, Any]],
+                   vectors: List[List[float]]) -> bool:
+        """添加（或按ID覆盖）数据点，返回操作是否成功"""
+
+    @abstractmethod
+    def delete_points(self, collection_name: str, ids: List[PointId], batch_size: int = 1000) -> bool:
+        """按点ID批量删除"""
+
+    @abstractmethod
+    def scroll_payloads(self,
+                        collection_name: str,
+                        fields: List[str],
+                        batch_size: int = 1000) -> Iterator[Tuple[PointId, Dict[str, Any]]]:
+        """遍历集合中所有点的指定 payload 字段"""
+
+    @abstractmethod
+    def search(self,
+               collection_name: str,
+               query_vector: List[float],
+               limit: int = 3) -> List[Dict[str, Any]]:
+        """向量搜索（外部传入向量）"""
+
+    @abstractmethod
+    def search_with_filter(self,
+                           collection_name: str,
+                           query_vector: List[float],
+                           query_filter: Any,
+                           limit: int = 3) -> List[Dict[str, Any]]:
+        """带过滤条件的向量搜索（外部传入向量）"""
+
+    @abstractmethod
+    def search_batch(self,
+                     collection_name: str,
+                     query_vectors: List[List[float]],
+                     limit: int = 3,
+                     query_filter: Any = None) -> List[List[Dict[str, Any]]]:
+        """批量向量搜索，按查询顺序返回各自的结果；query_filter 为列表时与查询一一对应（每个查询各自的过滤条件）"""
+
+    @abstractmethod
+    def retrieve_vectors(self,
+                         collection_name: str,
+                         ids: List[PointId]) -> Dict[PointId, List[float]]:
+        """按点ID批量取回已存储的向量（不存在的ID不出现在结果中）"""
+
+    @abstractmethod
+    def search_by_id(self,
+                     collection_name: str,
+                     point_id: PointId,
+                     limit: int = 3,
+                     query_filter: Any = None) -> List[Dict[str, Any]]:
+        """以已存储点的向量为查询进行搜索（结果不含该点本身），可附加过滤条件"""
+
+    async def search_async(self,
+                           collection_name: str,
+                           query_vector: List[float],
+                           limit: int = 3,
+                           query_filter: Any = None) -> List[Dict[str, Any]]:
+        if query_filter is None:
+            return await asyncio.to_thread(self.search, collection_name, query_vector, limit)
+        return await asyncio.to_thread(self.search_with_filter, collection_name, query_vector, query_filter, limit)
+
+    async def search_batch_async(self,
+                                 collection_name: str,
+                                 query_vectors: List[List[float]],
+                                 limit: int = 3,
+                                 query_filter: Any = None) -> List[List[Dict[str, Any]]]:
+        return await asyncio.to_thread(self.search_batch, collection_name, query_vectors, limit, query_filter)
+
+    async def retrieve_vectors_async(self,
+                                     collection_name: str,
+                                     ids: List[PointId]) -> Dict[PointId, List[float]]:
+        return await asyncio.to_thread(self.retrieve_vectors, collection_name, ids)
+
+    async def search_by_id_async(self,
+                                 collection_name: str,
+                                 point_id: PointId,
+                                 limit: int = 3,
+                                 query_filter: Any = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.search_by_id, collection_name, point_id, limit, query_filter)
+
+
+def create_vector_store(config: Config) -> VectorStore:
+    """按 Config.VECTOR_STORE 创建向量存储（本地索引在进程内共享，入库与推荐使用同一份数据）"""
+    if config.VECTOR_STORE == "qdrant":
+        from db_qdrant import QdrantClientWrapper
+        return QdrantClientWrapper(config)
+    if config.VECTOR_STORE == "local":
+        from local_vector_store import LocalVectorStore
+        from shared_resources import get_shared
+        return get_shared(
+            "local_vector_store",
+            (config.LOCAL_INDEX_DIR, config.LOCAL_INDEX_MODE),
+            lambda: LocalVectorStore.from_config(config)
+        )
+    raise ValueError(f"未知的向量存储: {config.VECTOR_STORE}，可选: qdrant, local")